@@ -1,9 +1,22 @@
 import os
 import sys
 import re
+import sqlite3
 import subprocess
+from datetime import datetime
 
-from jdbrowser.migrator import migrate, rollback, TOKYO_COLORS, color_text
+from jdbrowser.benchmark import run_benchmark
+from jdbrowser.config import read_config
+from jdbrowser.database import (
+    compact_event_log,
+    index_repository_files,
+    project_events,
+    reencode_icons,
+    verify_state,
+)
+from jdbrowser.file_index import scan_repository
+from jdbrowser.migrator import apply_migrations, migrate, rollback, TOKYO_COLORS, color_text
+from jdbrowser.thumbnail_cache import cache_dir, remove_legacy_files, thumbnail_cache
 
 MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "jdbrowser", "migrations")
 
@@ -28,10 +41,160 @@ def add_migration(name: str) -> None:
     subprocess.run(["nvim", path])
 
 
+def rebuild() -> None:
+    """Replay the event log into the state tables and report any drift."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA foreign_keys = ON')
+    apply_migrations(conn)
+    drifted = verify_state(conn)
+    conn.close()
+    if not drifted:
+        print(color_text("✓ state tables match the event log", fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+        return
+    for table in drifted:
+        print(color_text(f"✗ {table} (repaired)", fg=TOKYO_COLORS['red'], bg=TOKYO_COLORS['bg']))
+
+
+def _database_size(conn) -> int:
+    """Return the bytes taken by the database, its write-ahead log included.
+
+    The log is checkpointed first so the main file reflects the latest
+    writes; while the GUI holds a reader the checkpoint may stop short,
+    which is why whatever is left in the log is counted too.
+    """
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    size = os.path.getsize(DB_PATH)
+    wal_path = DB_PATH + '-wal'
+    if os.path.exists(wal_path):
+        size += os.path.getsize(wal_path)
+    return size
+
+
+def compact(archive_path=None) -> None:
+    """Drop superseded events, optionally archiving them, then VACUUM."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA foreign_keys = ON')
+    apply_migrations(conn)
+    size_before = _database_size(conn)
+    try:
+        removed = compact_event_log(conn, archive_path)
+    except RuntimeError as exc:
+        conn.close()
+        print(color_text(f"✗ {exc}", fg=TOKYO_COLORS['red'], bg=TOKYO_COLORS['bg']))
+        return
+    conn.execute('VACUUM')
+    size_after = _database_size(conn)
+    conn.close()
+    for table, rows in sorted(removed.items()):
+        print(color_text(f"  {table}: {rows} rows", fg=TOKYO_COLORS['fg'], bg=TOKYO_COLORS['bg']))
+    line = (
+        f"✓ reclaimed {sum(removed.values())} rows and "
+        f"{size_before - size_after} bytes ({size_before} → {size_after})"
+    )
+    print(color_text(line, fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+    if archive_path:
+        print(color_text(f"  archived to {archive_path}", fg=TOKYO_COLORS['yellow'], bg=TOKYO_COLORS['bg']))
+
+
+def reencode() -> None:
+    """Replace icons stored as raw files with bounded renditions, then VACUUM."""
+    # Icon decoding needs Qt and an application object for its image
+    # plugins, which the other commands do not.
+    from PySide6 import QtCore
+    from jdbrowser.icons import ingest_icon
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA foreign_keys = ON')
+    apply_migrations(conn)
+    size_before = _database_size(conn)
+    reencoded, removed = reencode_icons(conn, ingest_icon)
+    conn.execute('VACUUM')
+    size_after = _database_size(conn)
+    conn.close()
+    line = (
+        f"✓ re-encoded {reencoded} icons, dropped {removed} blobs and reclaimed "
+        f"{size_before - size_after} bytes ({size_before} → {size_after})"
+    )
+    print(color_text(line, fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+
+
+def reindex() -> None:
+    """Index the files and markdown notes of every directory folder for search."""
+    repository_path = read_config()
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA foreign_keys = ON')
+    apply_migrations(conn)
+    project_events(conn)
+    count = index_repository_files(conn, repository_path)
+    conn.close()
+    line = f"✓ indexed {count} files and notes under {repository_path}"
+    print(color_text(line, fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+
+
+def scan(full: bool) -> None:
+    """Bring the repository file index up to date."""
+    repository_path = read_config()
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA foreign_keys = ON')
+    apply_migrations(conn)
+    project_events(conn)
+    changed = scan_repository(conn, repository_path, full=full)
+    conn.close()
+    line = f"✓ re-listed {len(changed)} folders under {repository_path}"
+    print(color_text(line, fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+
+
+def cache_stats() -> None:
+    """Print the size and fill of the thumbnail cache."""
+    stats = thumbnail_cache().stats()
+    lines = [
+        f"  entries: {stats['entries']}",
+        f"  stored: {stats['bytes']} of {stats['max_bytes']} bytes "
+        f"({100 * stats['bytes'] / max(stats['max_bytes'], 1):.1f}%)",
+        f"  file: {stats['file_bytes']} bytes",
+    ]
+    if stats['oldest_use'] is not None:
+        lines.append(f"  least recently used: {datetime.fromtimestamp(stats['oldest_use']):%Y-%m-%d %H:%M:%S}")
+    print(color_text("== Thumbnail cache ==", fg=TOKYO_COLORS['blue'], bg=TOKYO_COLORS['bg']))
+    for line in lines:
+        print(color_text(line, fg=TOKYO_COLORS['fg'], bg=TOKYO_COLORS['bg']))
+
+
+def cache_gc() -> None:
+    """Drop thumbnails of missing or changed files and trim the cache to its budget."""
+    cache = thumbnail_cache()
+    size_before = os.path.getsize(cache.db_path)
+    stale, evicted = cache.gc()
+    legacy = remove_legacy_files(cache_dir())
+    size_after = os.path.getsize(cache.db_path)
+    line = (
+        f"✓ dropped {stale} stale and {evicted} least recently used thumbnails, "
+        f"reclaimed {size_before - size_after} bytes ({size_before} → {size_after})"
+    )
+    print(color_text(line, fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+    if legacy:
+        print(color_text(f"  removed {legacy} old per-file thumbnails", fg=TOKYO_COLORS['yellow'], bg=TOKYO_COLORS['bg']))
+
+
+def bench(events: int) -> None:
+    """Time the projections on a synthetic log and check their query plans."""
+    print(color_text(f"== Projection benchmark ({events} events) ==", fg=TOKYO_COLORS['blue'], bg=TOKYO_COLORS['bg']))
+    timings, problems = run_benchmark(events)
+    for name, seconds in timings.items():
+        line = f"  {name}: {seconds * 1000:.2f} ms"
+        print(color_text(line, fg=TOKYO_COLORS['fg'], bg=TOKYO_COLORS['bg']))
+    for problem in problems:
+        print(color_text(f"✗ {problem}", fg=TOKYO_COLORS['red'], bg=TOKYO_COLORS['bg']))
+    if problems:
+        sys.exit(1)
+    print(color_text("✓ all projection queries use indexes", fg=TOKYO_COLORS['green'], bg=TOKYO_COLORS['bg']))
+
+
 def main() -> None:
     args = sys.argv[1:]
     if not args:
-        print("Usage: db [add NAME|migrate|rollback]")
+        print("Usage: db [add NAME|migrate|rollback|rebuild|compact [--archive PATH]|reencode-icons|reindex-search|scan [--full]|cache-stats|cache-gc|bench [EVENTS]]")
         return
     cmd = args[0]
     if cmd == 'add':
@@ -43,8 +206,33 @@ def main() -> None:
         migrate(DB_PATH)
     elif cmd == 'rollback':
         rollback(DB_PATH)
+    elif cmd == 'rebuild':
+        rebuild()
+    elif cmd == 'compact':
+        archive_path = None
+        if len(args) > 1:
+            if args[1] != '--archive' or len(args) < 3:
+                print("Usage: db compact [--archive PATH]")
+                return
+            archive_path = os.path.abspath(os.path.expanduser(args[2]))
+        compact(archive_path)
+    elif cmd == 'reencode-icons':
+        reencode()
+    elif cmd == 'reindex-search':
+        reindex()
+    elif cmd == 'scan':
+        if len(args) > 1 and args[1] != '--full':
+            print("Usage: db scan [--full]")
+            return
+        scan(len(args) > 1)
+    elif cmd == 'cache-stats':
+        cache_stats()
+    elif cmd == 'cache-gc':
+        cache_gc()
+    elif cmd == 'bench':
+        bench(int(args[1]) if len(args) > 1 else 200_000)
     else:
-        print("Usage: db [add NAME|migrate|rollback]")
+        print("Usage: db [add NAME|migrate|rollback|rebuild|compact [--archive PATH]|reencode-icons|reindex-search|scan [--full]|cache-stats|cache-gc|bench [EVENTS]]")
 
 
 if __name__ == '__main__':
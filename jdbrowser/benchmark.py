@@ -0,0 +1,259 @@
+"""Synthetic event-log benchmark for the state projections.
+
+Builds a throwaway database with a realistic mix of tag, directory and
+icon events, times the full replay against incremental projection and a
+full-text search over a large synthetic file index, and checks the query
+plans of every statement the projections run so that a lost index shows
+up as a failure rather than as a slow GUI.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from .database import project_events, put_blob, rebuild_state, search
+from .migrator import apply_migrations
+
+# Size of the synthetic file index that search is timed against.
+SEARCH_DOCUMENTS = 100_000
+
+
+def _append(cursor, event_type, columns, values):
+    cursor.execute("INSERT INTO events (event_type) VALUES (?)", (event_type,))
+    event_id = cursor.lastrowid
+    names = ", ".join(["event_id"] + [f"[{column}]" for column in columns])
+    marks = ", ".join("?" * (len(values) + 1))
+    cursor.execute(
+        f"INSERT INTO event_{event_type} ({names}) VALUES ({marks})",
+        (event_id, *values),
+    )
+
+
+def populate(conn, events, seed=0):
+    """Append roughly ``events`` synthetic events to an empty database."""
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+    icon = put_blob(cursor, bytes(rng.randrange(256) for _ in range(2048)))
+    areas, ids, exts, directories = [], [], [], []
+    for area in range(10):
+        tag_id = str(uuid.uuid4())
+        areas.append(tag_id)
+        _append(cursor, "create_jd_area_tag", ["tag_id"], [tag_id])
+        _append(cursor, "set_jd_area_tag_order", ["tag_id", "order"], [tag_id, area * 10])
+        _append(cursor, "set_jd_area_tag_label", ["tag_id", "new_label"], [tag_id, f"Area {area}"])
+        for number in range(10):
+            id_tag = str(uuid.uuid4())
+            ids.append(id_tag)
+            _append(cursor, "create_jd_id_tag", ["tag_id"], [id_tag])
+            _append(
+                cursor,
+                "set_jd_id_tag_order",
+                ["tag_id", "parent_uuid", "order"],
+                [id_tag, tag_id, area * 10 + number],
+            )
+            _append(cursor, "set_jd_id_tag_label", ["tag_id", "new_label"], [id_tag, f"Id {number}"])
+    ext_orders = {}
+    written = len(areas) * 3 + len(ids) * 3
+    while written < events:
+        roll = rng.random()
+        if roll < 0.08 or not exts:
+            parent = rng.choice(ids)
+            order = ext_orders.get(parent, 0)
+            ext_orders[parent] = order + 1
+            tag_id = str(uuid.uuid4())
+            exts.append(tag_id)
+            _append(cursor, "create_jd_ext_tag", ["tag_id"], [tag_id])
+            _append(
+                cursor,
+                "set_jd_ext_tag_order",
+                ["tag_id", "parent_uuid", "order"],
+                [tag_id, parent, order],
+            )
+            _append(cursor, "set_jd_ext_tag_label", ["tag_id", "new_label"], [tag_id, f"Ext {order}"])
+            written += 3
+        elif roll < 0.16 or not directories:
+            directory_id = str(uuid.uuid4())
+            _append(cursor, "create_jd_directory", ["directory_id"], [directory_id])
+            _append(
+                cursor,
+                "set_jd_directory_order",
+                ["directory_id", "order"],
+                [directory_id, len(directories) + 1],
+            )
+            directories.append(directory_id)
+            written += 2
+        elif roll < 0.5:
+            _append(
+                cursor,
+                "set_jd_ext_tag_label",
+                ["tag_id", "new_label"],
+                [rng.choice(exts), f"Renamed {written}"],
+            )
+            written += 1
+        elif roll < 0.55:
+            _append(cursor, "set_jd_ext_tag_icon", ["tag_id", "icon_hash"], [rng.choice(exts), icon])
+            written += 1
+        elif roll < 0.65:
+            _append(
+                cursor,
+                "set_jd_directory_label",
+                ["directory_id", "new_label"],
+                [rng.choice(directories), f"Directory {written}"],
+            )
+            written += 1
+        elif roll < 0.9:
+            _append(
+                cursor,
+                "add_directory_tag",
+                ["directory_id", "tag_id"],
+                [rng.choice(directories), rng.choice(exts)],
+            )
+            written += 1
+        elif roll < 0.97:
+            _append(
+                cursor,
+                "remove_directory_tag",
+                ["directory_id", "tag_id"],
+                [rng.choice(directories), rng.choice(exts)],
+            )
+            written += 1
+        elif roll < 0.99:
+            _append(cursor, "delete_jd_directory", ["directory_id"], [rng.choice(directories)])
+            written += 1
+        else:
+            _append(cursor, "delete_jd_ext_tag", ["tag_id"], [rng.choice(exts)])
+            written += 1
+    conn.commit()
+    return exts
+
+
+def populate_search(conn, documents, seed=0):
+    """Add ``documents`` synthetic file and note rows to the search index.
+
+    Returns a word that occurs in many of them.
+    """
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = [
+        "".join(rng.choice(letters) for _ in range(rng.randrange(3, 10)))
+        for _ in range(5000)
+    ]
+    rows = []
+    for number in range(documents):
+        kind = "note" if rng.random() < 0.3 else "file"
+        name = " ".join(rng.choice(words) for _ in range(3))
+        body = " ".join(rng.choice(words) for _ in range(rng.randrange(20, 200)))
+        rows.append((
+            kind,
+            f"directory-{number % 2000}",
+            f"{name}.{'md' if kind == 'note' else 'pdf'}",
+            f"{name}.{'md' if kind == 'note' else 'pdf'}",
+            body if kind == "note" else name,
+        ))
+    conn.executemany(
+        "INSERT INTO search_documents (kind, ref, path, title, body) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    return words[0]
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _traced(conn, func, *args):
+    """Run func and return the DML statements it executed, parameters bound."""
+    statements = []
+
+    def trace(statement):
+        head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if head in ("SELECT", "INSERT", "DELETE", "WITH"):
+            statements.append(statement)
+
+    conn.set_trace_callback(trace)
+    try:
+        func(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return statements
+
+
+def plan_problems(conn, statements, allow_scans):
+    """Return the plan steps that read an event table without an index.
+
+    A temporary B-tree means SQLite had to sort instead of walking an
+    index. Full scans of event tables are only tolerated when allow_scans
+    is set, and even then they must be index-only.
+    """
+    problems = []
+    seen = set()
+    cursor = conn.cursor()
+    for statement in statements:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}")
+        for row in cursor.fetchall():
+            detail = row[-1]
+            if "event_" not in detail and "TEMP B-TREE" not in detail:
+                continue
+            if "TEMP B-TREE" in detail and "UNION" not in detail:
+                problem = detail
+            elif detail.startswith("SCAN") and "event_" in detail:
+                if allow_scans and "COVERING INDEX" in detail:
+                    continue
+                problem = detail
+            else:
+                continue
+            if problem not in seen:
+                seen.add(problem)
+                problems.append(problem)
+    return problems
+
+
+def run_benchmark(events=200_000):
+    """Return (timings, problems) for a synthetic log of ``events`` events."""
+    handle, path = tempfile.mkstemp(prefix="jdbrowser-bench-", suffix=".db")
+    os.close(handle)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        apply_migrations(conn)
+        exts = populate(conn, events)
+        timings = {}
+        timings["full replay"] = _timed(rebuild_state, conn)
+        replay_statements = _traced(conn, rebuild_state, conn)
+
+        cursor = conn.cursor()
+        _append(cursor, "set_jd_ext_tag_label", ["tag_id", "new_label"], [exts[0], "Bench"])
+        _append(cursor, "add_directory_tag", ["directory_id", "tag_id"], [str(uuid.uuid4()), exts[0]])
+        conn.commit()
+        timings["incremental projection"] = _timed(project_events, conn)
+        timings["startup with nothing new"] = _timed(project_events, conn)
+
+        _append(cursor, "set_jd_ext_tag_label", ["tag_id", "new_label"], [exts[1], "Bench"])
+        _append(cursor, "set_jd_ext_tag_icon", ["tag_id", "icon_hash"], [exts[1], put_blob(cursor, b"icon")])
+        _append(cursor, "add_directory_tag", ["directory_id", "tag_id"], [str(uuid.uuid4()), exts[1]])
+        _append(cursor, "delete_jd_ext_tag", ["tag_id"], [exts[2]])
+        conn.commit()
+        incremental_statements = _traced(conn, project_events, conn)
+
+        word = populate_search(conn, SEARCH_DOCUMENTS)
+        timings[f"search ({SEARCH_DOCUMENTS} documents)"] = _timed(search, conn, word)
+        timings["search, two-letter prefix"] = _timed(search, conn, word[:2])
+
+        problems = [
+            f"full replay: {detail}"
+            for detail in plan_problems(conn, replay_statements, allow_scans=True)
+        ]
+        problems += [
+            f"incremental: {detail}"
+            for detail in plan_problems(conn, incremental_statements, allow_scans=False)
+        ]
+        return timings, problems
+    finally:
+        conn.close()
+        os.remove(path)
@@ -1,8 +1,20 @@
 import os
 import configparser
 
-def read_config():
+CONFIG_PATH = os.path.expanduser('~/.config/jdbrowser/config.conf')
+
+# Thumbnail cache budget when the config does not set thumbnail_cache_mb.
+DEFAULT_THUMBNAIL_CACHE_MB = 512
+
+def _read():
     config = configparser.ConfigParser()
-    cfg_path = os.path.expanduser('~/.config/jdbrowser/config.conf')
-    config.read(cfg_path)
-    return config.get('settings', 'repository', fallback=os.getcwd())
\ No newline at end of file
+    config.read(CONFIG_PATH)
+    return config
+
+def read_config():
+    return _read().get('settings', 'repository', fallback=os.getcwd())
+
+def read_thumbnail_cache_bytes():
+    """Return the byte budget of the thumbnail cache."""
+    mb = _read().getint('settings', 'thumbnail_cache_mb', fallback=DEFAULT_THUMBNAIL_CACHE_MB)
+    return mb * 1024 * 1024
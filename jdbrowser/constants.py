@@ -15,3 +15,37 @@ DELETE_BUTTON_COLOR = '#f7768e'
 BREADCRUMB_BG_COLOR = '#bb9af7'
 BREADCRUMB_ACTIVE_COLOR = '#000000'
 BREADCRUMB_INACTIVE_COLOR = '#565f89'
+
+# Mapping of common file extensions to FiraCode Nerd Font icons
+FILE_TYPE_ICONS = {
+    ".txt": "\uf15c",  # nf-fa-file_text_o
+    ".md": "\ue73e",  # nf-oct-markdown
+    ".csv": "\uf1c3",  # nf-fa-file_excel_o
+    ".json": "\ufb25",  # nf-mdi-json
+    ".py": "\ue606",  # nf-dev-python
+    ".sh": "\uf489",  # nf-oct-terminal
+    ".pdf": "\uf1c1",  # nf-fa-file_pdf_o
+    ".zip": "\uf1c6",  # nf-fa-file_archive_o
+    ".mp3": "\uf001",  # nf-fa-music
+    ".wav": "\uf1c7",  # nf-fa-file_audio_o
+    ".html": "\uf13b",  # nf-fa-html5
+    ".css": "\uf13c",  # nf-fa-css3
+    ".js": "\uf3b8",  # nf-dev-javascript
+    ".svg": "\uf1c9",  # nf-fa-file_image_o
+}
+DEFAULT_FILE_ICON = "\uf15b"  # nf-fa-file_o
+
+
+THUMBNAIL_EXTS = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".bmp",
+    ".gif",
+    ".webp",
+    ".mp4",
+    ".mkv",
+    ".avi",
+    ".mov",
+    ".webm",
+}
@@ -1,415 +1,1031 @@
+import hashlib
+import json
+import os
+import pathlib
+import re
+import queue
 import sqlite3
+import threading
 import uuid
+from contextlib import contextmanager
+from graphlib import TopologicalSorter
 from .migrator import apply_migrations
 
 _shared_connection = None
+_reader_pool = None
+_database_path = None
+
+# Open units of work keyed by id(conn), so nested calls join the outer one.
+_active_units = {}
+
+# Read-only connections kept open for worker threads.
+READER_POOL_SIZE = 4
+
+# How long a connection waits on a lock held by another one, in milliseconds.
+BUSY_TIMEOUT_MS = 5000
+
+# What search() can return: tags, directories, and the files and markdown
+# notes inside directory folders.
+SEARCH_KINDS = ('tag', 'directory', 'file', 'note')
+
+# Characters of a markdown note that are indexed for search.
+SEARCH_NOTE_MAX_CHARS = 256 * 1024
 
 
 def setup_database(db_path):
     """Initialize SQLite database tables with triggers and state constraints.
 
     A single SQLite connection is reused across the application so that all
-    pages share the same database handle.
+    pages share the same database handle. It belongs to the GUI thread;
+    worker threads read through read_connection() instead.
     """
-    global _shared_connection
+    global _shared_connection, _reader_pool, _database_path
     if _shared_connection is not None:
         return _shared_connection
-    conn = sqlite3.connect(db_path)
-    conn.execute('PRAGMA foreign_keys = ON')
+    conn = _connect(db_path)
     apply_migrations(conn)
 
-    rebuild_state_jd_area_tags(conn)
-    rebuild_state_jd_area_headers(conn)
-    rebuild_state_jd_id_tags(conn)
-    rebuild_state_jd_id_headers(conn)
-    rebuild_state_jd_ext_tags(conn)
-    rebuild_state_jd_ext_headers(conn)
-    rebuild_state_jd_directories(conn)
-    rebuild_state_directory_tags(conn)
-    conn.commit()
+    # Only the tail of the log written since the last session is replayed;
+    # projections without a checkpoint are rebuilt from scratch.
+    project_events(conn)
     _shared_connection = conn
+    _reader_pool = ReaderPool(db_path)
+    _database_path = db_path
     return _shared_connection
 
-def rebuild_state_jd_area_tags(conn):
-    """Rebuild the state_jd_area_tags table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_area_tags;
+def _connect(db_path):
+    """Open a connection that may write, configured like every other writer."""
+    conn = sqlite3.connect(db_path)
+    # WAL lets the reader pool see the last committed state while the GUI
+    # writes. NORMAL only syncs at checkpoints, which WAL keeps consistent.
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
 
-        INSERT INTO state_jd_area_tags (tag_id, [order], label)
-        SELECT
-            o.tag_id,
-            o.[order],
-            l.new_label
-        FROM (
-            SELECT
-                o.tag_id,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_area_tag_order o
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_area_tag_order
-                GROUP BY tag_id
-            ) latest_order ON o.tag_id = latest_order.tag_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.tag_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_area_tag_label l
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_area_tag_label
-                GROUP BY tag_id
-            ) latest_label ON l.tag_id = latest_label.tag_id AND l.event_id = latest_label.max_event
-        ) l ON o.tag_id = l.tag_id
-        WHERE o.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_area_tag);
-    """)
+def open_write_connection():
+    """Open a private write connection for a worker thread.
 
-    cursor.executescript("""
-        DELETE FROM state_jd_area_tag_icons;
+    SQLite serializes it against the shared connection: units of work start
+    with BEGIN IMMEDIATE and wait up to BUSY_TIMEOUT_MS for the other writer.
+    The caller owns the connection and closes it.
+    """
+    if _database_path is None:
+        raise RuntimeError('setup_database() has not been called')
+    return _connect(_database_path)
 
-        INSERT INTO state_jd_area_tag_icons (tag_id, icon)
-        SELECT
-            i.tag_id,
-            i.icon
-        FROM event_set_jd_area_tag_icon i
-        JOIN (
-            SELECT tag_id, MAX(event_id) AS max_event
-            FROM event_set_jd_area_tag_icon
-            GROUP BY tag_id
-        ) latest ON i.tag_id = latest.tag_id AND i.event_id = latest.max_event
-        WHERE i.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_area_tag);
-    """)
-    conn.commit()
-    rebuild_state_directory_tags(conn)
+class ReaderPool:
+    """A bounded set of read-only connections shared by worker threads."""
 
-def rebuild_state_jd_area_headers(conn):
-    """Rebuild the state_jd_area_headers table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_area_headers;
+    def __init__(self, db_path, size=READER_POOL_SIZE):
+        self.uri = pathlib.Path(db_path).absolute().as_uri() + '?mode=ro'
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
 
-        INSERT INTO state_jd_area_headers (header_id, [order], label)
-        SELECT
-            o.header_id,
-            o.[order],
-            l.new_label
-        FROM (
-            SELECT
-                o.header_id,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_area_header_order o
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_area_header_order
-                GROUP BY header_id
-            ) latest_order ON o.header_id = latest_order.header_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.header_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_area_header_label l
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_area_header_label
-                GROUP BY header_id
-            ) latest_label ON l.header_id = latest_label.header_id AND l.event_id = latest_label.max_event
-        ) l ON o.header_id = l.header_id
-        WHERE o.header_id NOT IN (SELECT header_id FROM event_delete_jd_area_header);
-    """)
-    conn.commit()
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        return conn
 
-def rebuild_state_jd_id_tags(conn):
-    """Rebuild the state_jd_id_tags table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_id_tags;
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, blocking while all of them are in use."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                # End any read transaction so the connection does not pin
+                # an old snapshot and hold back WAL checkpoints.
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
 
-        INSERT INTO state_jd_id_tags (tag_id, parent_uuid, [order], label)
-        SELECT
-            o.tag_id,
-            o.parent_uuid,
-            o.[order],
-            l.new_label
-        FROM (
-            SELECT
-                o.tag_id,
-                o.parent_uuid,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_id_tag_order o
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_id_tag_order
-                GROUP BY tag_id
-            ) latest_order ON o.tag_id = latest_order.tag_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.tag_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_id_tag_label l
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_id_tag_label
-                GROUP BY tag_id
-            ) latest_label ON l.tag_id = latest_label.tag_id AND l.event_id = latest_label.max_event
-        ) l ON o.tag_id = l.tag_id
-        WHERE o.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_id_tag);
-    """)
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
 
-    cursor.executescript("""
-        DELETE FROM state_jd_id_tag_icons;
+def read_connection():
+    """Borrow a read-only connection to the database opened by setup_database().
 
-        INSERT INTO state_jd_id_tag_icons (tag_id, icon)
-        SELECT
-            i.tag_id,
-            i.icon
-        FROM event_set_jd_id_tag_icon i
-        JOIN (
-            SELECT tag_id, MAX(event_id) AS max_event
-            FROM event_set_jd_id_tag_icon
-            GROUP BY tag_id
-        ) latest ON i.tag_id = latest.tag_id AND i.event_id = latest.max_event
-        WHERE i.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_id_tag);
-    """)
-    conn.commit()
-    rebuild_state_directory_tags(conn)
+    Use it as a context manager from a worker thread; the connection goes
+    back to the pool on exit and must not be kept past it.
+    """
+    if _reader_pool is None:
+        raise RuntimeError('setup_database() has not been called')
+    return _reader_pool.connection()
 
-def rebuild_state_jd_id_headers(conn):
-    """Rebuild the state_jd_id_headers table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_id_headers;
+def _replay_jd_entities(conn, level, kind):
+    """Replay the jd_<level> tag or header rows (and tag icons) from the log.
 
-        INSERT INTO state_jd_id_headers (header_id, parent_uuid, [order], label)
+    The latest event per entity is found with an index-only MAX(event_id)
+    per group, then fetched by primary key, so no step has to sort.
+    """
+    cursor = conn.cursor()
+    entity = f'jd_{level}_{kind}'
+    key = f'{kind}_id'
+    parent_column = '' if level == 'area' else 'parent_uuid, '
+    parent_select = '' if level == 'area' else 'o.parent_uuid, '
+    cursor.execute(f"DELETE FROM state_{entity}s")
+    cursor.execute(f"""
+        INSERT INTO state_{entity}s ({key}, {parent_column}[order], label)
         SELECT
-            o.header_id,
-            o.parent_uuid,
-            o.[order],
+            latest.{key},
+            {parent_select}o.[order],
             l.new_label
         FROM (
-            SELECT
-                o.header_id,
-                o.parent_uuid,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_id_header_order o
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_id_header_order
-                GROUP BY header_id
-            ) latest_order ON o.header_id = latest_order.header_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.header_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_id_header_label l
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_id_header_label
-                GROUP BY header_id
-            ) latest_label ON l.header_id = latest_label.header_id AND l.event_id = latest_label.max_event
-        ) l ON o.header_id = l.header_id
-        WHERE o.header_id NOT IN (SELECT header_id FROM event_delete_jd_id_header);
+            SELECT {key}, MAX(event_id) AS event_id
+            FROM event_set_{entity}_order
+            GROUP BY {key}
+        ) latest
+        JOIN event_set_{entity}_order o ON o.event_id = latest.event_id
+        JOIN event_set_{entity}_label l ON l.event_id = (
+            SELECT MAX(event_id) FROM event_set_{entity}_label WHERE {key} = latest.{key}
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM event_delete_{entity} d WHERE d.{key} = latest.{key})
     """)
-    conn.commit()
-
-def rebuild_state_jd_ext_tags(conn):
-    """Rebuild the state_jd_ext_tags table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_ext_tags;
-
-        INSERT INTO state_jd_ext_tags (tag_id, parent_uuid, [order], label)
+    if kind != 'tag':
+        return
+    cursor.execute(f"DELETE FROM state_{entity}_icons")
+    cursor.execute(f"""
+        INSERT INTO state_{entity}_icons ({key}, icon_hash)
         SELECT
-            o.tag_id,
-            o.parent_uuid,
-            o.[order],
-            l.new_label
+            latest.{key},
+            i.icon_hash
         FROM (
-            SELECT
-                o.tag_id,
-                o.parent_uuid,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_ext_tag_order o
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_ext_tag_order
-                GROUP BY tag_id
-            ) latest_order ON o.tag_id = latest_order.tag_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.tag_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_ext_tag_label l
-            JOIN (
-                SELECT tag_id, MAX(event_id) AS max_event
-                FROM event_set_jd_ext_tag_label
-                GROUP BY tag_id
-            ) latest_label ON l.tag_id = latest_label.tag_id AND l.event_id = latest_label.max_event
-        ) l ON o.tag_id = l.tag_id
-        WHERE o.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_ext_tag);
+            SELECT {key}, MAX(event_id) AS event_id
+            FROM event_set_{entity}_icon
+            GROUP BY {key}
+        ) latest
+        JOIN event_set_{entity}_icon i ON i.event_id = latest.event_id
+        WHERE NOT EXISTS (SELECT 1 FROM event_delete_{entity} d WHERE d.{key} = latest.{key})
     """)
 
-    cursor.executescript("""
-        DELETE FROM state_jd_ext_tag_icons;
+def rebuild_state_jd_area_tags(conn):
+    """Rebuild the state_jd_area_tags table from the event log."""
+    _replay_jd_entities(conn, 'area', 'tag')
 
-        INSERT INTO state_jd_ext_tag_icons (tag_id, icon)
-        SELECT
-            i.tag_id,
-            i.icon
-        FROM event_set_jd_ext_tag_icon i
-        JOIN (
-            SELECT tag_id, MAX(event_id) AS max_event
-            FROM event_set_jd_ext_tag_icon
-            GROUP BY tag_id
-        ) latest ON i.tag_id = latest.tag_id AND i.event_id = latest.max_event
-        WHERE i.tag_id NOT IN (SELECT tag_id FROM event_delete_jd_ext_tag);
-    """)
-    conn.commit()
-    rebuild_state_directory_tags(conn)
+def rebuild_state_jd_area_headers(conn):
+    """Rebuild the state_jd_area_headers table from the event log."""
+    _replay_jd_entities(conn, 'area', 'header')
+
+def rebuild_state_jd_id_tags(conn):
+    """Rebuild the state_jd_id_tags table from the event log."""
+    _replay_jd_entities(conn, 'id', 'tag')
+
+def rebuild_state_jd_id_headers(conn):
+    """Rebuild the state_jd_id_headers table from the event log."""
+    _replay_jd_entities(conn, 'id', 'header')
+
+def rebuild_state_jd_ext_tags(conn):
+    """Rebuild the state_jd_ext_tags table from the event log."""
+    _replay_jd_entities(conn, 'ext', 'tag')
 
 def rebuild_state_jd_ext_headers(conn):
     """Rebuild the state_jd_ext_headers table from the event log."""
-    cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_ext_headers;
-
-        INSERT INTO state_jd_ext_headers (header_id, parent_uuid, [order], label)
-        SELECT
-            o.header_id,
-            o.parent_uuid,
-            o.[order],
-            l.new_label
-        FROM (
-            SELECT
-                o.header_id,
-                o.parent_uuid,
-                o.[order],
-                o.event_id
-            FROM event_set_jd_ext_header_order o
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_ext_header_order
-                GROUP BY header_id
-            ) latest_order ON o.header_id = latest_order.header_id AND o.event_id = latest_order.max_event
-        ) o
-        JOIN (
-            SELECT
-                l.header_id,
-                l.new_label,
-                l.event_id
-            FROM event_set_jd_ext_header_label l
-            JOIN (
-                SELECT header_id, MAX(event_id) AS max_event
-                FROM event_set_jd_ext_header_label
-                GROUP BY header_id
-            ) latest_label ON l.header_id = latest_label.header_id AND l.event_id = latest_label.max_event
-        ) l ON o.header_id = l.header_id
-        WHERE o.header_id NOT IN (SELECT header_id FROM event_delete_jd_ext_header);
-    """)
-    conn.commit()
+    _replay_jd_entities(conn, 'ext', 'header')
 
 def rebuild_state_jd_directories(conn):
     """Rebuild the state_jd_directories table from the event log."""
     cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_directories;
-
-        WITH latest_order AS (
-            SELECT
-                o.directory_id,
-                o.[order]
-            FROM event_set_jd_directory_order o
-            JOIN (
-                SELECT directory_id, MAX(event_id) AS max_event
-                FROM event_set_jd_directory_order
-                GROUP BY directory_id
-            ) lo ON o.directory_id = lo.directory_id AND o.event_id = lo.max_event
-        ),
-        latest_label AS (
-            SELECT
-                l.directory_id,
-                l.new_label
-            FROM event_set_jd_directory_label l
-            JOIN (
-                SELECT directory_id, MAX(event_id) AS max_event
-                FROM event_set_jd_directory_label
-                GROUP BY directory_id
-            ) ll ON l.directory_id = ll.directory_id AND l.event_id = ll.max_event
-        )
+    cursor.execute("DELETE FROM state_jd_directories")
+    cursor.execute("""
         INSERT INTO state_jd_directories (directory_id, [order], label)
         SELECT
-            o.directory_id,
+            latest.directory_id,
             o.[order],
             COALESCE(l.new_label, '') AS label
-        FROM latest_order o
-        LEFT JOIN latest_label l ON o.directory_id = l.directory_id
-        WHERE o.directory_id NOT IN (SELECT directory_id FROM event_delete_jd_directory);
+        FROM (
+            SELECT directory_id, MAX(event_id) AS event_id
+            FROM event_set_jd_directory_order
+            GROUP BY directory_id
+        ) latest
+        JOIN event_set_jd_directory_order o ON o.event_id = latest.event_id
+        LEFT JOIN event_set_jd_directory_label l ON l.event_id = (
+            SELECT MAX(event_id) FROM event_set_jd_directory_label
+            WHERE directory_id = latest.directory_id
+        )
+        WHERE NOT EXISTS (
+            SELECT 1 FROM event_delete_jd_directory d WHERE d.directory_id = latest.directory_id
+        )
     """)
 
-    cursor.executescript("""
-        DELETE FROM state_jd_directory_icons;
-
-        INSERT INTO state_jd_directory_icons (directory_id, icon)
+    cursor.execute("DELETE FROM state_jd_directory_icons")
+    cursor.execute("""
+        INSERT INTO state_jd_directory_icons (directory_id, icon_hash)
         SELECT
-            i.directory_id,
-            i.icon
-        FROM event_set_jd_directory_icon i
-        JOIN (
-            SELECT directory_id, MAX(event_id) AS max_event
+            latest.directory_id,
+            i.icon_hash
+        FROM (
+            SELECT directory_id, MAX(event_id) AS event_id
             FROM event_set_jd_directory_icon
             GROUP BY directory_id
-        ) latest ON i.directory_id = latest.directory_id AND i.event_id = latest.max_event
-        WHERE i.directory_id NOT IN (SELECT directory_id FROM event_delete_jd_directory);
+        ) latest
+        JOIN event_set_jd_directory_icon i ON i.event_id = latest.event_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM event_delete_jd_directory d WHERE d.directory_id = latest.directory_id
+        )
     """)
-    conn.commit()
-
 
 def rebuild_state_directory_tags(conn):
     """Rebuild the state_jd_directory_tags table from the event log."""
     cursor = conn.cursor()
-    cursor.executescript("""
-        DELETE FROM state_jd_directory_tags;
+    cursor.execute("DELETE FROM state_jd_directory_tags")
+    cursor.execute("""
+        INSERT INTO state_jd_directory_tags (directory_id, tag_id)
+        SELECT a.directory_id, a.tag_id
+        FROM (
+            SELECT directory_id, tag_id, MAX(event_id) AS event_id
+            FROM event_add_directory_tag
+            GROUP BY directory_id, tag_id
+        ) a
+        WHERE a.event_id > COALESCE((
+                SELECT MAX(event_id) FROM event_remove_directory_tag r
+                WHERE r.directory_id = a.directory_id AND r.tag_id = a.tag_id
+            ), 0)
+          AND NOT EXISTS (
+              SELECT 1 FROM event_delete_jd_directory d WHERE d.directory_id = a.directory_id
+          )
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_ext_tag d WHERE d.tag_id = a.tag_id)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_id_tag d WHERE d.tag_id = a.tag_id)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_area_tag d WHERE d.tag_id = a.tag_id)
+    """)
+
+# Code, ancestors and labels of every tag whose ancestors all exist, derived
+# from the tag state tables. {where} narrows each level to some tag ids.
+_TAG_PATHS_SELECT = """
+    SELECT a.tag_id, 'area', printf('%02d', a.[order]), NULL, NULL, a.label, a.label
+    FROM state_jd_area_tags a
+    {where_area}
+    UNION ALL
+    SELECT i.tag_id, 'id', printf('%02d.%02d', a.[order], i.[order]), a.tag_id, NULL,
+           i.label, a.label || ' / ' || i.label
+    FROM state_jd_id_tags i
+    JOIN state_jd_area_tags a ON a.tag_id = i.parent_uuid
+    {where_id}
+    UNION ALL
+    SELECT e.tag_id, 'ext', printf('%02d.%02d+%04d', a.[order], i.[order], e.[order]),
+           a.tag_id, i.tag_id, e.label, a.label || ' / ' || i.label || ' / ' || e.label
+    FROM state_jd_ext_tags e
+    JOIN state_jd_id_tags i ON i.tag_id = e.parent_uuid
+    JOIN state_jd_area_tags a ON a.tag_id = i.parent_uuid
+    {where_ext}
+"""
+
+_TAG_PATHS_INSERT = """
+    INSERT INTO state_jd_tag_paths
+        (tag_id, level, code, area_uuid, id_uuid, label, full_label)
+"""
+
+def rebuild_state_jd_tag_paths(conn):
+    """Rebuild the state_jd_tag_paths table from the tag state tables."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM state_jd_tag_paths")
+    cursor.execute(
+        _TAG_PATHS_INSERT
+        + _TAG_PATHS_SELECT.format(where_area='', where_id='', where_ext='')
+    )
 
+def rebuild_state(conn):
+    """Replay the whole event log into every state table.
+
+    This is the repair path; regular writes go through project_events().
+    """
+    _replay_state(conn)
+    conn.commit()
+
+def _replay_state(conn):
+    """Run every full rebuild once and reset the checkpoints without committing."""
+    for name in PROJECTION_ORDER:
+        rebuild, _project = PROJECTIONS[name]
+        rebuild(conn)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COALESCE(MAX(event_id), 0) FROM events')
+    _set_projection_checkpoints(cursor, PROJECTIONS, cursor.fetchone()[0])
+
+STATE_TABLES = (
+    'state_jd_area_tags',
+    'state_jd_area_headers',
+    'state_jd_area_tag_icons',
+    'state_jd_id_tags',
+    'state_jd_id_headers',
+    'state_jd_id_tag_icons',
+    'state_jd_ext_tags',
+    'state_jd_ext_headers',
+    'state_jd_ext_tag_icons',
+    'state_jd_directories',
+    'state_jd_directory_icons',
+    'state_jd_directory_tags',
+    'state_jd_tag_paths',
+)
+
+def _snapshot_state(conn):
+    """Return the sorted contents of every state table keyed by table name."""
+    cursor = conn.cursor()
+    snapshot = {}
+    for table in STATE_TABLES:
+        cursor.execute(f'SELECT * FROM {table}')
+        snapshot[table] = sorted(cursor.fetchall(), key=repr)
+    return snapshot
+
+def verify_state(conn):
+    """Rebuild all state from scratch and return the tables that had drifted."""
+    before = _snapshot_state(conn)
+    rebuild_state(conn)
+    after = _snapshot_state(conn)
+    return [table for table in STATE_TABLES if before[table] != after[table]]
+
+def _event_tables(cursor):
+    """Return the names of the per-type event payload tables."""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'event\\_%' ESCAPE '\\' ORDER BY name"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def _collect_superseded_events(cursor):
+    """Fill temp.superseded_events with events no projection depends on."""
+    cursor.execute(
+        'CREATE TEMP TABLE IF NOT EXISTS superseded_events (event_id INTEGER PRIMARY KEY)'
+    )
+    cursor.execute('DELETE FROM superseded_events')
+    entities = []
+    for level in ('area', 'id', 'ext'):
+        entities.append((f'jd_{level}_tag', 'tag_id', ('order', 'label', 'icon')))
+        entities.append((f'jd_{level}_header', 'header_id', ('order', 'label')))
+    entities.append(('jd_directory', 'directory_id', ('order', 'label', 'icon')))
+    for entity, key, attributes in entities:
+        for attribute in attributes:
+            # Only the latest value per live entity survives; deleted
+            # entities keep nothing but their create and delete events.
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO superseded_events (event_id)
+                SELECT event_id
+                FROM (
+                    SELECT
+                        event_id,
+                        {key},
+                        ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY event_id DESC) AS position
+                    FROM event_set_{entity}_{attribute}
+                ) ranked
+                WHERE position > 1
+                   OR {key} IN (SELECT {key} FROM event_delete_{entity})
+            """)
+    cursor.execute("""
         WITH tag_actions AS (
             SELECT directory_id, tag_id, event_id, 1 AS is_add FROM event_add_directory_tag
             UNION ALL
             SELECT directory_id, tag_id, event_id, 0 AS is_add FROM event_remove_directory_tag
         ),
-        latest AS (
-            SELECT directory_id, tag_id, MAX(event_id) AS max_event
+        ranked AS (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (PARTITION BY directory_id, tag_id ORDER BY event_id DESC) AS position
             FROM tag_actions
-            GROUP BY directory_id, tag_id
         )
+        INSERT OR IGNORE INTO superseded_events (event_id)
+        SELECT event_id
+        FROM ranked
+        WHERE position > 1
+           OR is_add = 0
+           OR directory_id IN (SELECT directory_id FROM event_delete_jd_directory)
+           OR tag_id IN (
+               SELECT tag_id FROM event_delete_jd_ext_tag
+               UNION SELECT tag_id FROM event_delete_jd_id_tag
+               UNION SELECT tag_id FROM event_delete_jd_area_tag
+           )
+    """)
+
+def _archive_superseded_events(cursor, tables):
+    """Copy the superseded rows of tables into the attached archive database."""
+    for table in tables:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0')
+        cursor.execute(f'PRAGMA archive.table_info({table})')
+        archived = {row[1] for row in cursor.fetchall()}
+        cursor.execute(f'PRAGMA main.table_info({table})')
+        columns = [row[1] for row in cursor.fetchall()]
+        for column in columns:
+            if column not in archived:
+                cursor.execute(f'ALTER TABLE archive.{table} ADD COLUMN [{column}]')
+        column_list = ', '.join(f'[{column}]' for column in columns)
+        cursor.execute(f"""
+            INSERT INTO archive.{table} ({column_list})
+            SELECT {column_list} FROM main.{table}
+            WHERE event_id IN (SELECT event_id FROM temp.superseded_events)
+        """)
+
+def _icon_event_tables(cursor):
+    """Return the event tables that reference blobs through icon_hash."""
+    return [
+        table for table in _event_tables(cursor)
+        if table.startswith('event_set_') and table.endswith('_icon')
+    ]
+
+def _archive_blobs(cursor):
+    """Copy the blobs referenced by archived icon events into the archive."""
+    cursor.execute(
+        'CREATE TABLE IF NOT EXISTS archive.blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL)'
+    )
+    for table in _icon_event_tables(cursor):
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO archive.blobs (hash, data)
+            SELECT b.hash, b.data
+            FROM main.{table} e
+            JOIN main.blobs b ON b.hash = e.icon_hash
+            WHERE e.event_id IN (SELECT event_id FROM temp.superseded_events)
+        """)
+
+def _collect_garbage_blobs(cursor):
+    """Delete blobs no icon event refers to and return how many went."""
+    references = ' AND '.join(
+        f'NOT EXISTS (SELECT 1 FROM {table} WHERE icon_hash = blobs.hash)'
+        for table in _icon_event_tables(cursor)
+    )
+    cursor.execute(f'DELETE FROM blobs WHERE {references}')
+    return cursor.rowcount
+
+def compact_event_log(conn, archive_path=None):
+    """Fold the event log down to the events the projections still need.
+
+    What remains for every live entity is its create event plus the latest
+    order, label and icon event, which together form its snapshot. Deleted
+    entities keep only their create and delete events, and each
+    directory/tag pair keeps only its latest add. Icon blobs no surviving
+    event refers to are dropped as well. When archive_path is given the
+    removed rows, and the blobs their icon events point at, are copied
+    there first.
+
+    The compacted log is replayed before committing. If the state tables
+    would differ, everything is rolled back and RuntimeError is raised.
+    Returns the number of removed rows per table.
+    """
+    rebuild_state(conn)
+    before = _snapshot_state(conn)
+    cursor = conn.cursor()
+    tables = _event_tables(cursor)
+    if archive_path:
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+    try:
+        _collect_superseded_events(cursor)
+        if archive_path:
+            _archive_superseded_events(cursor, ['events'] + tables)
+            _archive_blobs(cursor)
+        removed = {}
+        for table in tables + ['events']:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE event_id IN (SELECT event_id FROM temp.superseded_events)'
+            )
+            if cursor.rowcount > 0:
+                removed[table] = cursor.rowcount
+        unreferenced = _collect_garbage_blobs(cursor)
+        if unreferenced > 0:
+            removed['blobs'] = unreferenced
+        _replay_state(conn)
+        if _snapshot_state(conn) != before:
+            conn.rollback()
+            raise RuntimeError('Compaction would change the projected state; rolled back')
+        conn.commit()
+    finally:
+        cursor.execute('DROP TABLE IF EXISTS temp.superseded_events')
+        if archive_path:
+            cursor.execute('DETACH DATABASE archive')
+    return removed
+
+def reencode_icons(conn, ingest):
+    """Replace every icon stored before ingest with its ingested rendition.
+
+    ingest maps raw icon bytes to (rendition, source_hash), or to None when
+    they cannot be decoded, which leaves that icon as it is. Icon events are
+    pointed at the new blob in place, since the picture they describe does
+    not change, then the state is replayed and blobs left unreferenced are
+    dropped.
+    Returns the number of re-encoded icons and of removed blobs.
+    """
+    cursor = conn.cursor()
+    tables = _icon_event_tables(cursor)
+    pending = ' UNION '.join(
+        f'SELECT icon_hash FROM {table} WHERE source_hash IS NULL AND icon_hash IS NOT NULL'
+        for table in tables
+    )
+    cursor.execute(pending)
+    hashes = [row[0] for row in cursor.fetchall()]
+    reencoded = 0
+    try:
+        for old_hash in hashes:
+            cursor.execute('SELECT data FROM blobs WHERE hash = ?', (old_hash,))
+            result = ingest(cursor.fetchone()[0])
+            if result is None:
+                continue
+            rendition, source_hash = result
+            new_hash = put_blob(cursor, rendition)
+            for table in tables:
+                cursor.execute(
+                    f'UPDATE {table} SET icon_hash = ?, source_hash = ? '
+                    'WHERE icon_hash = ? AND source_hash IS NULL',
+                    (new_hash, source_hash, old_hash),
+                )
+            reencoded += 1
+        _replay_state(conn)
+        removed = _collect_garbage_blobs(cursor)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return reencoded, removed
+
+def _projection_checkpoints(cursor):
+    """Return the last projected event_id of each projection by name."""
+    cursor.execute('SELECT projection, event_id FROM projection_checkpoints')
+    return dict(cursor.fetchall())
+
+def _set_projection_checkpoints(cursor, projections, event_id):
+    cursor.executemany(
+        'INSERT OR REPLACE INTO projection_checkpoints (projection, event_id) VALUES (?, ?)',
+        [(projection, event_id) for projection in projections],
+    )
+
+def _touched_ids(cursor, since, columns, *tables):
+    """Return the distinct key tuples written to any of tables after since."""
+    query = ' UNION '.join(
+        f'SELECT {columns} FROM {table} WHERE event_id > ?' for table in tables
+    )
+    cursor.execute(query, (since,) * len(tables))
+    return cursor.fetchall()
+
+def _project_jd_entities(cursor, since, level, kind):
+    """Re-derive the jd_<level> tag or header rows touched after since."""
+    entity = f'jd_{level}_{kind}'
+    key = f'{kind}_id'
+    parent_column = '' if level == 'area' else 'parent_uuid, '
+    parent_select = '' if level == 'area' else 'o.parent_uuid, '
+    ids = _touched_ids(
+        cursor,
+        since,
+        key,
+        f'event_set_{entity}_order',
+        f'event_set_{entity}_label',
+        f'event_delete_{entity}',
+    )
+    if ids:
+        # Drop every touched row before inserting so swapped orders never
+        # collide with the UNIQUE constraint mid-way through the batch.
+        cursor.executemany(f'DELETE FROM state_{entity}s WHERE {key} = ?', ids)
+        cursor.executemany(f"""
+            INSERT INTO state_{entity}s ({key}, {parent_column}[order], label)
+            SELECT o.{key}, {parent_select}o.[order], l.new_label
+            FROM event_set_{entity}_order o, event_set_{entity}_label l
+            WHERE o.event_id = (
+                SELECT MAX(event_id) FROM event_set_{entity}_order WHERE {key} = ?1
+            )
+              AND l.event_id = (
+                SELECT MAX(event_id) FROM event_set_{entity}_label WHERE {key} = ?1
+            )
+              AND NOT EXISTS (SELECT 1 FROM event_delete_{entity} WHERE {key} = ?1)
+        """, ids)
+    if kind != 'tag':
+        return
+    ids = _touched_ids(
+        cursor, since, key, f'event_set_{entity}_icon', f'event_delete_{entity}'
+    )
+    if ids:
+        cursor.executemany(f'DELETE FROM state_{entity}_icons WHERE {key} = ?', ids)
+        cursor.executemany(f"""
+            INSERT INTO state_{entity}_icons ({key}, icon_hash)
+            SELECT {key}, icon_hash
+            FROM event_set_{entity}_icon
+            WHERE event_id = (
+                SELECT MAX(event_id) FROM event_set_{entity}_icon WHERE {key} = ?1
+            )
+              AND NOT EXISTS (SELECT 1 FROM event_delete_{entity} WHERE {key} = ?1)
+        """, ids)
+
+def _project_jd_directories(cursor, since):
+    """Re-derive the directory and directory icon rows touched after since."""
+    ids = _touched_ids(
+        cursor,
+        since,
+        'directory_id',
+        'event_set_jd_directory_order',
+        'event_set_jd_directory_label',
+        'event_delete_jd_directory',
+    )
+    if ids:
+        cursor.executemany('DELETE FROM state_jd_directories WHERE directory_id = ?', ids)
+        cursor.executemany("""
+            INSERT INTO state_jd_directories (directory_id, [order], label)
+            SELECT
+                o.directory_id,
+                o.[order],
+                COALESCE((
+                    SELECT new_label FROM event_set_jd_directory_label
+                    WHERE directory_id = ?1
+                    ORDER BY event_id DESC LIMIT 1
+                ), '')
+            FROM event_set_jd_directory_order o
+            WHERE o.event_id = (
+                SELECT MAX(event_id) FROM event_set_jd_directory_order WHERE directory_id = ?1
+            )
+              AND NOT EXISTS (SELECT 1 FROM event_delete_jd_directory WHERE directory_id = ?1)
+        """, ids)
+    ids = _touched_ids(
+        cursor, since, 'directory_id', 'event_set_jd_directory_icon', 'event_delete_jd_directory'
+    )
+    if ids:
+        cursor.executemany('DELETE FROM state_jd_directory_icons WHERE directory_id = ?', ids)
+        cursor.executemany("""
+            INSERT INTO state_jd_directory_icons (directory_id, icon_hash)
+            SELECT directory_id, icon_hash
+            FROM event_set_jd_directory_icon
+            WHERE event_id = (
+                SELECT MAX(event_id) FROM event_set_jd_directory_icon WHERE directory_id = ?1
+            )
+              AND NOT EXISTS (SELECT 1 FROM event_delete_jd_directory WHERE directory_id = ?1)
+        """, ids)
+
+def _project_directory_tags(cursor, since):
+    """Re-derive the directory/tag pairs touched after since."""
+    cursor.execute("""
+        DELETE FROM state_jd_directory_tags
+        WHERE directory_id IN (
+            SELECT directory_id FROM event_delete_jd_directory WHERE event_id > ?
+        )
+    """, (since,))
+    for level in ('area', 'id', 'ext'):
+        cursor.execute(f"""
+            DELETE FROM state_jd_directory_tags
+            WHERE tag_id IN (SELECT tag_id FROM event_delete_jd_{level}_tag WHERE event_id > ?)
+        """, (since,))
+    pairs = _touched_ids(
+        cursor,
+        since,
+        'directory_id, tag_id',
+        'event_add_directory_tag',
+        'event_remove_directory_tag',
+    )
+    if not pairs:
+        return
+    cursor.executemany(
+        'DELETE FROM state_jd_directory_tags WHERE directory_id = ? AND tag_id = ?',
+        pairs,
+    )
+    cursor.executemany("""
         INSERT INTO state_jd_directory_tags (directory_id, tag_id)
-        SELECT a.directory_id, a.tag_id
-        FROM tag_actions a
-        JOIN latest l ON a.directory_id = l.directory_id
-                     AND a.tag_id = l.tag_id
-                     AND a.event_id = l.max_event
-        WHERE a.is_add = 1
-          AND a.directory_id NOT IN (SELECT directory_id FROM event_delete_jd_directory)
-          AND a.tag_id NOT IN (
-              SELECT tag_id FROM event_delete_jd_ext_tag
-              UNION SELECT tag_id FROM event_delete_jd_id_tag
-              UNION SELECT tag_id FROM event_delete_jd_area_tag
-          );
+        SELECT ?1, ?2
+        WHERE COALESCE((
+                SELECT MAX(event_id) FROM event_add_directory_tag
+                WHERE directory_id = ?1 AND tag_id = ?2
+            ), 0) > COALESCE((
+                SELECT MAX(event_id) FROM event_remove_directory_tag
+                WHERE directory_id = ?1 AND tag_id = ?2
+            ), 0)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_directory WHERE directory_id = ?1)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_ext_tag WHERE tag_id = ?2)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_id_tag WHERE tag_id = ?2)
+          AND NOT EXISTS (SELECT 1 FROM event_delete_jd_area_tag WHERE tag_id = ?2)
+    """, pairs)
+
+def _touched_tag_paths(cursor, since):
+    """Return the tags touched after since and their descendants as a JSON array.
+
+    Moving or relabelling a tag changes the path of everything below it.
+    Reads the tag state tables, so it must run after the tag projections.
+    Returns None when no tag was touched.
+    """
+    touched = set()
+    for level in ('area', 'id', 'ext'):
+        entity = f'jd_{level}_tag'
+        touched.update(tag_id for tag_id, in _touched_ids(
+            cursor,
+            since,
+            'tag_id',
+            f'event_set_{entity}_order',
+            f'event_set_{entity}_label',
+            f'event_delete_{entity}',
+        ))
+    if not touched:
+        return None
+    cursor.execute("""
+        WITH affected(tag_id) AS (
+            SELECT value FROM json_each(?1)
+            UNION
+            SELECT child.tag_id FROM state_jd_id_tags child
+            JOIN affected ON child.parent_uuid = affected.tag_id
+            UNION
+            SELECT child.tag_id FROM state_jd_ext_tags child
+            JOIN affected ON child.parent_uuid = affected.tag_id
+        )
+        SELECT json_group_array(tag_id) FROM affected
+    """, (json.dumps(sorted(touched)),))
+    return cursor.fetchone()[0]
+
+def _project_jd_tag_paths(cursor, since):
+    """Re-derive the paths of the tags touched after since and their descendants."""
+    ids = _touched_tag_paths(cursor, since)
+    if ids is None:
+        return
+    cursor.execute(
+        "DELETE FROM state_jd_tag_paths WHERE tag_id IN (SELECT value FROM json_each(?))",
+        (ids,),
+    )
+    where = 'WHERE {}.tag_id IN (SELECT value FROM json_each(?1))'
+    cursor.execute(
+        _TAG_PATHS_INSERT
+        + _TAG_PATHS_SELECT.format(
+            where_area=where.format('a'),
+            where_id=where.format('i'),
+            where_ext=where.format('e'),
+        ),
+        (ids,),
+    )
+
+# Tag and directory rows of search_documents. {where} narrows them to some
+# ids. Directories are also found by their folder name.
+_SEARCH_TAGS_INSERT = """
+    INSERT INTO search_documents (kind, ref, title, body)
+    SELECT 'tag', tag_id, label, code || ' ' || full_label
+    FROM state_jd_tag_paths
+    {where}
+"""
+
+_SEARCH_DIRECTORIES_INSERT = """
+    WITH d AS (
+        SELECT directory_id, label, printf('%016d', [order]) AS digits
+        FROM state_jd_directories
+        {where}
+    )
+    INSERT INTO search_documents (kind, ref, title, body)
+    SELECT 'directory', directory_id, label,
+           substr(digits, 1, 4) || '_' || substr(digits, 5, 4) || '_'
+           || substr(digits, 9, 4) || '_' || substr(digits, 13, 4)
+    FROM d
+"""
+
+def rebuild_search_labels(conn):
+    """Rebuild the tag and directory rows of the search index.
+
+    File and note rows of directories that no longer exist are dropped too;
+    the others are left to index_directory_files().
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM search_documents WHERE kind IN ('tag', 'directory')")
+    cursor.execute("""
+        DELETE FROM search_documents
+        WHERE kind IN ('file', 'note')
+          AND ref NOT IN (SELECT directory_id FROM state_jd_directories)
     """)
-    conn.commit()
+    cursor.execute(_SEARCH_TAGS_INSERT.format(where=''))
+    cursor.execute(_SEARCH_DIRECTORIES_INSERT.format(where=''))
+
+def _project_search_labels(cursor, since):
+    """Re-index the tags and directories touched after since."""
+    ids = _touched_tag_paths(cursor, since)
+    if ids is not None:
+        cursor.execute(
+            "DELETE FROM search_documents "
+            "WHERE kind = 'tag' AND ref IN (SELECT value FROM json_each(?))",
+            (ids,),
+        )
+        cursor.execute(
+            _SEARCH_TAGS_INSERT.format(
+                where='WHERE tag_id IN (SELECT value FROM json_each(?))'
+            ),
+            (ids,),
+        )
+    directories = _touched_ids(
+        cursor,
+        since,
+        'directory_id',
+        'event_set_jd_directory_order',
+        'event_set_jd_directory_label',
+        'event_delete_jd_directory',
+    )
+    if not directories:
+        return
+    ids = json.dumps([directory_id for directory_id, in directories])
+    cursor.execute(
+        "DELETE FROM search_documents "
+        "WHERE kind = 'directory' AND ref IN (SELECT value FROM json_each(?))",
+        (ids,),
+    )
+    cursor.execute(
+        "DELETE FROM search_documents WHERE kind IN ('file', 'note') AND ref IN ("
+        "SELECT directory_id FROM event_delete_jd_directory WHERE event_id > ?)",
+        (since,),
+    )
+    cursor.execute(
+        _SEARCH_DIRECTORIES_INSERT.format(
+            where='WHERE directory_id IN (SELECT value FROM json_each(?))'
+        ),
+        (ids,),
+    )
+
+# Each projection pairs its full replay with its incremental applier. The
+# names double as keys in the projection_checkpoints table.
+PROJECTIONS = {
+    'jd_area_tags': (
+        rebuild_state_jd_area_tags,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'area', 'tag'),
+    ),
+    'jd_area_headers': (
+        rebuild_state_jd_area_headers,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'area', 'header'),
+    ),
+    'jd_id_tags': (
+        rebuild_state_jd_id_tags,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'id', 'tag'),
+    ),
+    'jd_id_headers': (
+        rebuild_state_jd_id_headers,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'id', 'header'),
+    ),
+    'jd_ext_tags': (
+        rebuild_state_jd_ext_tags,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'ext', 'tag'),
+    ),
+    'jd_ext_headers': (
+        rebuild_state_jd_ext_headers,
+        lambda cursor, since: _project_jd_entities(cursor, since, 'ext', 'header'),
+    ),
+    'jd_directories': (rebuild_state_jd_directories, _project_jd_directories),
+    'directory_tags': (rebuild_state_directory_tags, _project_directory_tags),
+    'jd_tag_paths': (rebuild_state_jd_tag_paths, _project_jd_tag_paths),
+    'search_labels': (rebuild_search_labels, _project_search_labels),
+}
+
+def _entity_events(entity, *attributes):
+    return {f'delete_{entity}', *(f'set_{entity}_{attribute}' for attribute in attributes)}
+
+# Event types each projection folds in. A write only re-runs the projections
+# fed by the event types it appended; deleting a tag or a directory also
+# drops the directory_tags pairs it leaves behind.
+PROJECTION_SOURCES = {
+    'jd_area_tags': _entity_events('jd_area_tag', 'order', 'label', 'icon'),
+    'jd_area_headers': _entity_events('jd_area_header', 'order', 'label'),
+    'jd_id_tags': _entity_events('jd_id_tag', 'order', 'label', 'icon'),
+    'jd_id_headers': _entity_events('jd_id_header', 'order', 'label'),
+    'jd_ext_tags': _entity_events('jd_ext_tag', 'order', 'label', 'icon'),
+    'jd_ext_headers': _entity_events('jd_ext_header', 'order', 'label'),
+    'jd_directories': _entity_events('jd_directory', 'order', 'label', 'icon'),
+    'directory_tags': {
+        'add_directory_tag',
+        'remove_directory_tag',
+        'delete_jd_directory',
+        'delete_jd_area_tag',
+        'delete_jd_id_tag',
+        'delete_jd_ext_tag',
+    },
+}
+
+# Projections that read another projection's state tables. They run after
+# their upstream projections and whenever one of those runs.
+PROJECTION_DEPENDENCIES = {
+    'jd_tag_paths': ('jd_area_tags', 'jd_id_tags', 'jd_ext_tags'),
+    'search_labels': ('jd_tag_paths', 'jd_directories'),
+}
+
+PROJECTION_ORDER = tuple(
+    TopologicalSorter(
+        {name: PROJECTION_DEPENDENCIES.get(name, ()) for name in PROJECTIONS}
+    ).static_order()
+)
+
+_EVENT_PROJECTIONS = {}
+for _name, _event_types in PROJECTION_SOURCES.items():
+    for _event_type in _event_types:
+        _EVENT_PROJECTIONS.setdefault(_event_type, set()).add(_name)
+
+def _with_dependents(names):
+    """Return names plus every projection downstream of them."""
+    result = set(names)
+    for name in PROJECTION_ORDER:
+        if result.intersection(PROJECTION_DEPENDENCIES.get(name, ())):
+            result.add(name)
+    return result
+
+def project_events(conn):
+    """Apply the events appended since the last projection to the state tables.
+
+    Only the rows of entities touched by the new events are re-derived, so the
+    cost follows the size of the change rather than the size of the log. When
+    every checkpoint already equals MAX(event_id) this is a no-op.
+    """
+    if _project_pending(conn):
+        conn.commit()
+
+def _latest_event_id(cursor):
+    cursor.execute('SELECT COALESCE(MAX(event_id), 0) FROM events')
+    return cursor.fetchone()[0]
+
+def _project_pending(conn, dirty=None, start=None):
+    """Project outstanding events without committing; return True if any.
+
+    dirty, when given, names the projections fed by the events appended
+    after event id start. Projections that were current at start and are
+    neither dirty nor downstream of a dirty one only have their checkpoint
+    moved. Everything else runs once, in dependency order.
+    """
+    cursor = conn.cursor()
+    latest = _latest_event_id(cursor)
+    checkpoints = _projection_checkpoints(cursor)
+    stale = [
+        name for name in PROJECTION_ORDER
+        if name not in checkpoints or checkpoints[name] < latest
+    ]
+    if not stale:
+        return False
+    if dirty is not None:
+        dirty = _with_dependents(dirty)
+    for name in stale:
+        rebuild, project = PROJECTIONS[name]
+        if name not in checkpoints:
+            rebuild(conn)
+        elif dirty is None or name in dirty or checkpoints[name] < start:
+            project(cursor, checkpoints[name])
+    _set_projection_checkpoints(cursor, stale, latest)
+    return True
+
+def put_blob(cursor, data):
+    """Store data under its SHA-256 unless it is already there; return the hash."""
+    digest = hashlib.sha256(data).hexdigest()
+    cursor.execute('INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)', (digest, data))
+    return digest
+
+class UnitOfWork:
+    """Event appends collected into a single transaction.
+
+    Each append marks the projections its event type feeds as dirty, so
+    the outermost unit projects them all in one pass when it commits.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.depth = 0
+        self.start = None
+        self.dirty = set()
+
+    def append(self, event_type, **payload):
+        """Append an event_type event with the given columns and return its id."""
+        self.cursor.execute('INSERT INTO events (event_type) VALUES (?)', (event_type,))
+        event_id = self.cursor.lastrowid
+        columns = ', '.join(['event_id'] + [f'[{name}]' for name in payload])
+        placeholders = ', '.join('?' * (len(payload) + 1))
+        self.cursor.execute(
+            f'INSERT INTO event_{event_type} ({columns}) VALUES ({placeholders})',
+            (event_id, *payload.values()),
+        )
+        self.dirty.update(_EVENT_PROJECTIONS.get(event_type, ()))
+        return event_id
+
+    def put_blob(self, data):
+        """Store data in the blob table and return its content hash."""
+        return put_blob(self.cursor, data)
+
+@contextmanager
+def unit_of_work(conn):
+    """Batch event appends into one transaction with one projection pass.
+
+    The outermost unit opens the transaction, projects every appended event
+    and commits once on exit, or rolls everything back if the block raises.
+    Nested units on the same connection join the outer one through a
+    savepoint, so helpers such as create_jd_ext_tag() compose into larger
+    changes. State tables are only brought up to date when the outermost
+    unit exits.
+    """
+    unit = _active_units.get(id(conn))
+    if unit is not None:
+        unit.depth += 1
+        savepoint = f'unit_of_work_{unit.depth}'
+        unit.cursor.execute(f'SAVEPOINT {savepoint}')
+        try:
+            yield unit
+        except BaseException:
+            unit.cursor.execute(f'ROLLBACK TO {savepoint}')
+            raise
+        finally:
+            unit.cursor.execute(f'RELEASE {savepoint}')
+            unit.depth -= 1
+        return
+    unit = UnitOfWork(conn)
+    _active_units[id(conn)] = unit
+    try:
+        if not conn.in_transaction:
+            unit.cursor.execute('BEGIN IMMEDIATE')
+        unit.start = _latest_event_id(unit.cursor)
+        yield unit
+        _project_pending(conn, unit.dirty, unit.start)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        del _active_units[id(conn)]
 
 def create_jd_ext_tag(conn, parent_uuid, order, label):
     """Create a new jd_ext tag and return its tag_id, or None on conflict."""
@@ -421,37 +1037,16 @@ def create_jd_ext_tag(conn, parent_uuid, order, label):
     if cursor.fetchone():
         return None
     tag_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_ext_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_ext_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, tag_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_ext_tag_label (event_id, tag_id, new_label) VALUES (?, ?, ?)",
-        (event_id, tag_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_ext_tag', tag_id=tag_id)
+        uow.append('set_jd_ext_tag_order', tag_id=tag_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_ext_tag_label', tag_id=tag_id, new_label=label)
     return tag_id
 
 def delete_jd_ext_tag(conn, tag_id):
     """Delete an existing jd_ext tag."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_ext_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_ext_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_ext_tag', tag_id=tag_id)
 
 def create_jd_directory(conn, order, label):
     """Create a new directory and return its directory_id, or None on conflict."""
@@ -463,59 +1058,90 @@ def create_jd_directory(conn, order, label):
     if cursor.fetchone():
         return None
     directory_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_directory')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_directory (event_id, directory_id) VALUES (?, ?)",
-        (event_id, directory_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_directory_order (event_id, directory_id, [order]) VALUES (?, ?, ?)',
-        (event_id, directory_id, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_directory_label (event_id, directory_id, new_label) VALUES (?, ?, ?)",
-        (event_id, directory_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_directory', directory_id=directory_id)
+        uow.append('set_jd_directory_order', directory_id=directory_id, order=order)
+        uow.append('set_jd_directory_label', directory_id=directory_id, new_label=label)
     return directory_id
 
 def delete_jd_directory(conn, directory_id):
     """Delete an existing directory."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_directory')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_directory (event_id, directory_id) VALUES (?, ?)",
-        (event_id, directory_id),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_directory', directory_id=directory_id)
 
 def add_directory_tag(conn, directory_id, tag_uuid):
     """Associate a directory with a tag."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('add_directory_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_add_directory_tag (event_id, directory_id, tag_id) VALUES (?, ?, ?)",
-        (event_id, directory_id, tag_uuid),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('add_directory_tag', directory_id=directory_id, tag_id=tag_uuid)
 
 def remove_directory_tag(conn, directory_id, tag_uuid):
     """Remove an association between a directory and a tag."""
+    with unit_of_work(conn) as uow:
+        uow.append('remove_directory_tag', directory_id=directory_id, tag_id=tag_uuid)
+
+def set_jd_directory_icon(conn, directory_id, icon_data, source_hash):
+    """Store icon_data as the icon of a directory."""
+    with unit_of_work(conn) as uow:
+        uow.append(
+            'set_jd_directory_icon',
+            directory_id=directory_id,
+            icon_hash=uow.put_blob(icon_data),
+            source_hash=source_hash,
+        )
+
+def load_directory_tags(conn, directory_ids):
+    """Return {directory_id: [(tag_id, label, order, parent_uuid), ...]}.
+
+    The tags of all directory_ids come back from a single query, each list
+    sorted by tag order. Directories without tags map to an empty list.
+    """
+    directory_ids = list(directory_ids)
+    tags = {directory_id: [] for directory_id in directory_ids}
+    if not directory_ids:
+        return tags
     cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('remove_directory_tag')")
-    event_id = cursor.lastrowid
     cursor.execute(
-        "INSERT INTO event_remove_directory_tag (event_id, directory_id, tag_id) VALUES (?, ?, ?)",
-        (event_id, directory_id, tag_uuid),
+        """
+        SELECT dt.directory_id,
+               dt.tag_id,
+               COALESCE(ext.label, id.label, area.label) AS label,
+               COALESCE(ext.[order], id.[order], area.[order]) AS [order],
+               COALESCE(ext.parent_uuid, id.parent_uuid) AS parent_uuid
+        FROM json_each(?) j
+        JOIN state_jd_directory_tags dt ON dt.directory_id = j.value
+        LEFT JOIN state_jd_ext_tags ext ON dt.tag_id = ext.tag_id
+        LEFT JOIN state_jd_id_tags id ON dt.tag_id = id.tag_id
+        LEFT JOIN state_jd_area_tags area ON dt.tag_id = area.tag_id
+        ORDER BY dt.directory_id, [order]
+        """,
+        (json.dumps(directory_ids),),
     )
-    conn.commit()
+    for directory_id, *tag in cursor.fetchall():
+        tags[directory_id].append(tuple(tag))
+    return tags
+
+def load_blobs(conn, hashes, cached=None):
+    """Return {hash: data} for hashes.
+
+    Blobs found in cached, a dict returned by an earlier call, are reused;
+    the rest come from a single query.
+    """
+    cached = cached or {}
+    blobs = {}
+    missing = []
+    for digest in set(hashes):
+        if digest in cached:
+            blobs[digest] = cached[digest]
+        else:
+            missing.append(digest)
+    if missing:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT b.hash, b.data FROM json_each(?) j JOIN blobs b ON b.hash = j.value",
+            (json.dumps(missing),),
+        )
+        blobs.update(cursor.fetchall())
+    return blobs
 
 def create_jd_ext_header(conn, parent_uuid, order, label):
     """Create a new jd_ext header and return its header_id, or None on conflict."""
@@ -527,25 +1153,10 @@ def create_jd_ext_header(conn, parent_uuid, order, label):
     if cursor.fetchone():
         return None
     header_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_ext_header')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_ext_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_ext_header_order (event_id, header_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, header_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_ext_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_ext_header', header_id=header_id)
+        uow.append('set_jd_ext_header_order', header_id=header_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_ext_header_label', header_id=header_id, new_label=label)
     return header_id
 
 def update_jd_ext_header(conn, header_id, parent_uuid, order, label):
@@ -557,31 +1168,15 @@ def update_jd_ext_header(conn, header_id, parent_uuid, order, label):
     )
     if cursor.fetchone():
         return False
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_ext_header_order (event_id, header_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, header_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_ext_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('set_jd_ext_header_order', header_id=header_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_ext_header_label', header_id=header_id, new_label=label)
     return True
 
 def delete_jd_ext_header(conn, header_id):
     """Delete an existing jd_ext header."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_ext_header')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_ext_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_ext_header', header_id=header_id)
 
 def create_jd_area_tag(conn, order, label):
     """Create a new jd_area tag and return its tag_id, or None if order conflict."""
@@ -590,25 +1185,10 @@ def create_jd_area_tag(conn, order, label):
     if cursor.fetchone():
         return None
     tag_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_area_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_area_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_tag_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_area_tag_order (event_id, tag_id, [order]) VALUES (?, ?, ?)',
-        (event_id, tag_id, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_tag_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_area_tag_label (event_id, tag_id, new_label) VALUES (?, ?, ?)",
-        (event_id, tag_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_area_tag', tag_id=tag_id)
+        uow.append('set_jd_area_tag_order', tag_id=tag_id, order=order)
+        uow.append('set_jd_area_tag_label', tag_id=tag_id, new_label=label)
     return tag_id
 
 def create_jd_area_header(conn, order, label):
@@ -618,25 +1198,10 @@ def create_jd_area_header(conn, order, label):
     if cursor.fetchone():
         return None
     header_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_area_header')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_area_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_area_header_order (event_id, header_id, [order]) VALUES (?, ?, ?)',
-        (event_id, header_id, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_area_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_area_header', header_id=header_id)
+        uow.append('set_jd_area_header_order', header_id=header_id, order=order)
+        uow.append('set_jd_area_header_label', header_id=header_id, new_label=label)
     return header_id
 
 def update_jd_area_header(conn, header_id, order, label):
@@ -648,42 +1213,20 @@ def update_jd_area_header(conn, header_id, order, label):
     )
     if cursor.fetchone():
         return False
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_area_header_order (event_id, header_id, [order]) VALUES (?, ?, ?)',
-        (event_id, header_id, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_area_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_area_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('set_jd_area_header_order', header_id=header_id, order=order)
+        uow.append('set_jd_area_header_label', header_id=header_id, new_label=label)
     return True
 
 def delete_jd_area_header(conn, header_id):
     """Delete an existing jd_area header."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_area_header')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_area_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_area_header', header_id=header_id)
 
 def delete_jd_area_tag(conn, tag_id):
     """Delete an existing jd_area tag."""
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_area_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_area_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_area_tag', tag_id=tag_id)
 
 def create_jd_id_tag(conn, parent_uuid, order, label):
     """Create a new jd_id tag and return its tag_id, or None if order conflict."""
@@ -695,25 +1238,10 @@ def create_jd_id_tag(conn, parent_uuid, order, label):
     if cursor.fetchone():
         return None
     tag_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_id_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_id_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_tag_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_id_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, tag_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_tag_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_id_tag_label (event_id, tag_id, new_label) VALUES (?, ?, ?)",
-        (event_id, tag_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_id_tag', tag_id=tag_id)
+        uow.append('set_jd_id_tag_order', tag_id=tag_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_id_tag_label', tag_id=tag_id, new_label=label)
     return tag_id
 
 def create_jd_id_header(conn, parent_uuid, order, label):
@@ -726,25 +1254,10 @@ def create_jd_id_header(conn, parent_uuid, order, label):
     if cursor.fetchone():
         return None
     header_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO events (event_type) VALUES ('create_jd_id_header')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_create_jd_id_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_id_header_order (event_id, header_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, header_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_id_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('create_jd_id_header', header_id=header_id)
+        uow.append('set_jd_id_header_order', header_id=header_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_id_header_label', header_id=header_id, new_label=label)
     return header_id
 
 def update_jd_id_header(conn, header_id, parent_uuid, order, label):
@@ -756,39 +1269,172 @@ def update_jd_id_header(conn, header_id, parent_uuid, order, label):
     )
     if cursor.fetchone():
         return False
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_header_order')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        'INSERT INTO event_set_jd_id_header_order (event_id, header_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)',
-        (event_id, header_id, parent_uuid, order),
-    )
-    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_id_header_label')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_set_jd_id_header_label (event_id, header_id, new_label) VALUES (?, ?, ?)",
-        (event_id, header_id, label),
-    )
-    conn.commit()
+    with unit_of_work(conn) as uow:
+        uow.append('set_jd_id_header_order', header_id=header_id, parent_uuid=parent_uuid, order=order)
+        uow.append('set_jd_id_header_label', header_id=header_id, new_label=label)
     return True
 
 def delete_jd_id_header(conn, header_id):
     """Delete an existing jd_id header."""
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_id_header', header_id=header_id)
+
+def delete_jd_id_tag(conn, tag_id):
+    """Delete an existing jd_id tag."""
+    with unit_of_work(conn) as uow:
+        uow.append('delete_jd_id_tag', tag_id=tag_id)
+
+def search(conn, query, kinds=None, limit=50):
+    """Return the best matches for query as (kind, ref, path, title) rows.
+
+    Every word of query has to match the start of a word in a document's
+    title or body; title matches rank higher. Single characters only match
+    titles, since nearly every body has a word starting with any letter.
+    ref is the tag_id or directory_id, and for files and notes path is
+    relative to the directory's folder. kinds narrows the result to some
+    of SEARCH_KINDS.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    match = ' '.join(
+        f'{{title}} : "{word}"*' if len(word) == 1 else f'"{word}"*' for word in words
+    )
+    kind_join = kind_filter = ''
+    params = [match]
+    if kinds is not None:
+        kinds = list(kinds)
+        if not kinds:
+            return []
+        kind_join = 'JOIN search_documents d ON d.doc_id = search_index.rowid'
+        kind_filter = f"AND d.kind IN ({', '.join('?' * len(kinds))})"
+        params += kinds
+    params.append(limit)
     cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_id_header')")
-    event_id = cursor.lastrowid
+    # Rank on the index alone and only then fetch the winning documents.
+    cursor.execute(f"""
+        WITH best AS (
+            SELECT search_index.rowid AS doc_id,
+                   bm25(search_index, 10.0, 1.0) AS score
+            FROM search_index
+            {kind_join}
+            WHERE search_index MATCH ? {kind_filter}
+            ORDER BY score
+            LIMIT ?
+        )
+        SELECT d.kind, d.ref, d.path, d.title
+        FROM best
+        JOIN search_documents d ON d.doc_id = best.doc_id
+        ORDER BY best.score
+    """, params)
+    return cursor.fetchall()
+
+def directory_folder(order):
+    """Return the folder name of a directory, XXXX_XXXX_XXXX_XXXX."""
+    digits = f"{order:016d}"
+    return "_".join(digits[i:i + 4] for i in range(0, 16, 4))
+
+def _file_document(directory_id, folder, path, name):
+    """Return the search_documents row of the file at path within folder."""
+    if not name.lower().endswith('.md'):
+        return ('file', directory_id, path, name, path)
+    try:
+        with open(os.path.join(folder, path), encoding='utf-8', errors='replace') as f:
+            body = f.read(SEARCH_NOTE_MAX_CHARS)
+    except OSError:
+        body = ''
+    return ('note', directory_id, path, name, body)
+
+def _index_directory_files(cursor, directory_id, folder):
+    rows = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            path = os.path.relpath(os.path.join(root, name), folder)
+            rows.append(_file_document(directory_id, folder, path, name))
     cursor.execute(
-        "INSERT INTO event_delete_jd_id_header (event_id, header_id) VALUES (?, ?)",
-        (event_id, header_id),
+        "DELETE FROM search_documents WHERE kind IN ('file', 'note') AND ref = ?",
+        (directory_id,),
     )
+    cursor.executemany(
+        'INSERT INTO search_documents (kind, ref, path, title, body) VALUES (?, ?, ?, ?, ?)',
+        rows,
+    )
+    return len(rows)
+
+def index_directory_files(conn, directory_id, folder):
+    """Replace the file and note rows of directory_id with what folder holds.
+
+    Hidden files and folders are skipped. Markdown notes are indexed with
+    their text, other files by name and relative path.
+    """
+    count = _index_directory_files(conn.cursor(), directory_id, folder)
     conn.commit()
+    return count
 
-def delete_jd_id_tag(conn, tag_id):
-    """Delete an existing jd_id tag."""
+def update_directory_files(conn, directory_id, folder, listed, removed):
+    """Update the file and note rows of directory_id for part of folder.
+
+    listed holds subfolders of folder whose entries changed, and removed
+    paths that are gone, both relative to folder with "/" separators and
+    "" for folder itself. The rows of the files directly in each listed
+    subfolder are replaced from disk; those of removed paths, and of
+    everything below them, are dropped. The rest of folder is not read.
+    Returns the number of file and note rows written.
+    """
     cursor = conn.cursor()
-    cursor.execute("INSERT INTO events (event_type) VALUES ('delete_jd_id_tag')")
-    event_id = cursor.lastrowid
-    cursor.execute(
-        "INSERT INTO event_delete_jd_id_tag (event_id, tag_id) VALUES (?, ?)",
-        (event_id, tag_id),
+    for path in removed:
+        if not path:
+            cursor.execute(
+                "DELETE FROM search_documents WHERE kind IN ('file', 'note') AND ref = ?",
+                (directory_id,),
+            )
+            continue
+        cursor.execute(
+            "DELETE FROM search_documents WHERE kind IN ('file', 'note') AND ref = ? "
+            "AND (path = ? OR substr(path, 1, ?) = ?)",
+            (directory_id, path, len(path) + 1, path + '/'),
+        )
+    rows = []
+    for sub in listed:
+        prefix = sub + '/' if sub else ''
+        # Files directly in sub: below the prefix, without a further "/".
+        cursor.execute(
+            "DELETE FROM search_documents WHERE kind IN ('file', 'note') AND ref = ? "
+            "AND substr(path, 1, ?) = ? AND instr(substr(path, ?), '/') = 0",
+            (directory_id, len(prefix), prefix, len(prefix) + 1),
+        )
+        if any(part.startswith('.') for part in prefix.split('/')[:-1]):
+            continue
+        try:
+            with os.scandir(os.path.join(folder, sub)) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue
+                    rows.append(
+                        _file_document(directory_id, folder, prefix + entry.name, entry.name)
+                    )
+        except OSError:
+            continue
+    cursor.executemany(
+        'INSERT INTO search_documents (kind, ref, path, title, body) VALUES (?, ?, ?, ?, ?)',
+        rows,
     )
     conn.commit()
+    return len(rows)
+
+def index_repository_files(conn, repository_path):
+    """Re-index the folder of every directory under repository_path.
+
+    Returns the number of file and note rows written.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT directory_id, [order] FROM state_jd_directories')
+    count = 0
+    for directory_id, order in cursor.fetchall():
+        folder = os.path.join(repository_path, directory_folder(order))
+        count += _index_directory_files(conn.cursor(), directory_id, folder)
+    conn.commit()
+    return count
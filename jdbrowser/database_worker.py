@@ -0,0 +1,148 @@
+"""Database work off the GUI thread.
+
+A single DatabaseWorker runs submitted jobs in order on its own QThread.
+Queries borrow a read-only connection from the pool in database.py; writes
+go through a write connection owned by the worker thread. Every job hands
+back a DatabaseFuture whose signals fire on the GUI thread, so pages can
+render placeholders right away and fill them in when the data arrives.
+"""
+
+import queue
+import traceback
+
+from PySide6 import QtCore
+
+from . import database
+
+_worker = None
+
+
+class DatabaseFuture(QtCore.QObject):
+    """Pending result of a job, delivered on the GUI thread."""
+
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self._cancelled = False
+        self._done = False
+        self._result = None
+        self._error = None
+
+    def then(self, callback, errback=None):
+        """Connect callback to the result and errback (or a traceback) to errors."""
+        self.finished.connect(callback)
+        self.failed.connect(errback or _report_error)
+        return self
+
+    def cancel(self):
+        """Drop the result. A job that has not started yet is skipped."""
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """Return the result of a finished job, raising its error if it failed."""
+        if not self._done:
+            raise RuntimeError('job has not finished')
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _report_error(error):
+    traceback.print_exception(error)
+
+
+class _JobThread(QtCore.QThread):
+    jobDone = QtCore.Signal(object, object, object)
+
+    def __init__(self, jobs):
+        super().__init__()
+        self.jobs = jobs
+
+    def run(self):
+        write_conn = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            future, write, func, args = job
+            result = error = None
+            if not future.cancelled():
+                try:
+                    if write:
+                        if write_conn is None:
+                            write_conn = database.open_write_connection()
+                        result = func(write_conn, *args)
+                    else:
+                        with database.read_connection() as conn:
+                            result = func(conn, *args)
+                except Exception as exc:
+                    error = exc
+            self.jobDone.emit(future, result, error)
+            # The future is a QObject of the GUI thread; make sure the last
+            # reference to it is dropped there and not here.
+            job = future = result = error = None
+        if write_conn is not None:
+            write_conn.close()
+
+
+class DatabaseWorker(QtCore.QObject):
+    """Runs database jobs in submission order on a dedicated thread."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = queue.Queue()
+        self._thread = _JobThread(self._jobs)
+        self._thread.jobDone.connect(self._deliver, QtCore.Qt.QueuedConnection)
+        self._thread.start()
+
+    def query(self, func, *args):
+        """Run func(conn, *args) on a read-only connection."""
+        return self._submit(False, func, args)
+
+    def write(self, func, *args):
+        """Run func(conn, *args) on the worker's write connection.
+
+        func is typically one of the write helpers in database.py, which
+        append their events in a unit of work and project them on commit.
+        """
+        return self._submit(True, func, args)
+
+    def _submit(self, write, func, args):
+        future = DatabaseFuture()
+        self._jobs.put((future, write, func, args))
+        return future
+
+    def _deliver(self, future, result, error):
+        if future.cancelled():
+            return
+        future._done = True
+        future._result = result
+        future._error = error
+        if error is None:
+            future.finished.emit(result)
+        else:
+            future.failed.emit(error)
+
+    def stop(self):
+        """Finish the queued jobs, then stop the thread."""
+        self._jobs.put(None)
+        self._thread.wait()
+
+
+def database_worker():
+    """Return the application's DatabaseWorker, starting it on first use."""
+    global _worker
+    if _worker is None:
+        _worker = DatabaseWorker()
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_worker.stop)
+    return _worker
@@ -4,6 +4,7 @@ from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPus
 from PySide6.QtGui import QPixmap, QPainter, QPainterPath, QIntValidator
 from PySide6.QtCore import Qt, QSettings, QTimer
 from ..constants import *
+from ..icons import ingest_icon_file
 
 
 class EditTagDialog(QDialog):
@@ -11,6 +12,7 @@ class EditTagDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Edit Tag Label and Icon")
         self.icon_data = icon_data
+        self.icon_source_hash = None
         self.level = level
         self.order = order
         self.setStyleSheet(f'''
@@ -179,10 +181,11 @@ class EditTagDialog(QDialog):
         if file_dialog.exec():
             file_path = file_dialog.selectedFiles()[0]
             settings.setValue("last_thumbnail_dir", os.path.dirname(file_path))
-            pixmap = QPixmap(file_path)
-            if not pixmap.isNull():
-                with open(file_path, 'rb') as f:
-                    self.icon_data = f.read()
+            icon = ingest_icon_file(file_path)
+            if icon:
+                self.icon_data, self.icon_source_hash = icon
+                pixmap = QPixmap()
+                pixmap.loadFromData(self.icon_data)
                 rounded_pixmap = QPixmap(240, 150)
                 rounded_pixmap.fill(Qt.transparent)
                 painter = QPainter(rounded_pixmap)
@@ -201,6 +204,10 @@ class EditTagDialog(QDialog):
     def get_icon_data(self):
         return self.icon_data
 
+    def get_icon_source_hash(self):
+        """Hash of the file picked in this dialog, or None if the icon is unchanged."""
+        return self.icon_source_hash
+
     def get_order(self):
         try:
             return int(self.prefix_input.text()) if self.prefix_input.text() else None
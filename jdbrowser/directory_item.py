@@ -9,6 +9,7 @@ from .constants import (
     TAG_COLOR,
 )
 from .flow_layout import FlowLayout
+from .renditions import icon_tile
 
 
 class DirectoryItem(QtWidgets.QWidget):
@@ -37,26 +38,10 @@ class DirectoryItem(QtWidgets.QWidget):
         layout.setSpacing(10)
 
         if icon_data:
-            pixmap = QtGui.QPixmap()
-            pixmap.loadFromData(icon_data)
+            pixmap = icon_tile(icon_data, 240, 150, 5)
             if not pixmap.isNull():
                 self.icon = QtWidgets.QLabel()
-                rounded_pixmap = QtGui.QPixmap(240, 150)
-                rounded_pixmap.fill(QtCore.Qt.transparent)
-                painter = QtGui.QPainter(rounded_pixmap)
-                painter.setRenderHint(QtGui.QPainter.Antialiasing)
-                path = QtGui.QPainterPath()
-                path.addRoundedRect(0, 0, 240, 150, 5, 5)
-                painter.setClipPath(path)
-                scaled = pixmap.scaled(
-                    240,
-                    150,
-                    QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                    QtCore.Qt.TransformationMode.SmoothTransformation,
-                )
-                painter.drawPixmap(0, 0, scaled)
-                painter.end()
-                self.icon.setPixmap(rounded_pixmap)
+                self.icon.setPixmap(pixmap)
                 self.icon.setFixedSize(240, 150)
                 self.icon.setStyleSheet("background-color: transparent;")
             else:
@@ -119,63 +104,18 @@ class DirectoryItem(QtWidgets.QWidget):
 
         The prefix should reflect the tag's position in the JD hierarchy. For
         an ext tag this is ``[area.id+ext]``, for an id tag ``[area.id]`` and
-        for an area tag ``[area]``. Previously this method attempted to derive
-        the prefix from a single ``order`` value which only represented the
-        tag's local order within its parent, resulting in prefixes like
-        ``[00.00+0000]``. Instead we look up the complete hierarchy in the
-        database using the ``tag_id``.
+        for an area tag ``[area]``. The code is precomputed for every tag in
+        ``state_jd_tag_paths``, so this is a single lookup by ``tag_id``.
         """
 
         cursor = self.page.conn.cursor()
-
-        # Try ext tag: ext -> id -> area
-        cursor.execute(
-            "SELECT parent_uuid, [order] FROM state_jd_ext_tags WHERE tag_id = ?",
-            (tag_id,),
-        )
-        row = cursor.fetchone()
-        if row:
-            id_uuid, ext_order = row
-            cursor.execute(
-                "SELECT parent_uuid, [order] FROM state_jd_id_tags WHERE tag_id = ?",
-                (id_uuid,),
-            )
-            id_row = cursor.fetchone()
-            if id_row:
-                area_uuid, id_order = id_row
-                cursor.execute(
-                    "SELECT [order] FROM state_jd_area_tags WHERE tag_id = ?",
-                    (area_uuid,),
-                )
-                area_row = cursor.fetchone()
-                area_order = area_row[0] if area_row else 0
-                return f"[{area_order:02d}.{id_order:02d}+{ext_order:04d}]"
-
-        # Try id tag: id -> area
-        cursor.execute(
-            "SELECT parent_uuid, [order] FROM state_jd_id_tags WHERE tag_id = ?",
-            (tag_id,),
-        )
-        row = cursor.fetchone()
-        if row:
-            area_uuid, id_order = row
-            cursor.execute(
-                "SELECT [order] FROM state_jd_area_tags WHERE tag_id = ?",
-                (area_uuid,),
-            )
-            area_row = cursor.fetchone()
-            area_order = area_row[0] if area_row else 0
-            return f"[{area_order:02d}.{id_order:02d}]"
-
-        # Try area tag
         cursor.execute(
-            "SELECT [order] FROM state_jd_area_tags WHERE tag_id = ?",
+            "SELECT code FROM state_jd_tag_paths WHERE tag_id = ?",
             (tag_id,),
         )
         row = cursor.fetchone()
         if row:
-            area_order = row[0]
-            return f"[{area_order:02d}]"
+            return f"[{row[0]}]"
 
         # Fallback if tag not found
         return "[00.00+0000]"
@@ -1,5 +1,7 @@
-from difflib import get_close_matches
+import re
 from PySide6 import QtWidgets, QtCore, QtGui
+from .database_worker import database_worker
+from .fuzzy import FuzzyMatcher
 from .constants import (
     TEXT_COLOR,
     TAG_COLOR,
@@ -87,8 +89,9 @@ class ExtTagSearchOverlay(QtWidgets.QFrame):
         self.item_height = QtGui.QFontMetrics(QtGui.QFont("FiraCode Nerd Font", 18)).height() + 16
         self.max_results = 5
 
-        self.all_labels = []
         self.label_map = {}
+        self.matcher = FuzzyMatcher([])
+        self._labels_future = None
 
         self.input.textChanged.connect(self.update_results)
         self.input.installEventFilter(self)
@@ -109,21 +112,33 @@ class ExtTagSearchOverlay(QtWidgets.QFrame):
             self.move(x, y)
 
     def _load_labels(self):
-        cursor = self.conn.cursor()
+        if self._labels_future is not None:
+            self._labels_future.cancel()
+        self._labels_future = database_worker().query(self._fetch_labels)
+        self._labels_future.then(self._labels_loaded)
+
+    @staticmethod
+    def _fetch_labels(conn):
+        cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT e.tag_id, e.parent_uuid, i.parent_uuid, a.[order], i.[order], e.[order], e.label
-            FROM state_jd_ext_tags e
-            JOIN state_jd_id_tags i ON e.parent_uuid = i.tag_id
-            JOIN state_jd_area_tags a ON i.parent_uuid = a.tag_id
+            SELECT tag_id, code, id_uuid, area_uuid, label
+            FROM state_jd_tag_paths
+            WHERE level = 'ext'
             """
         )
         rows = cursor.fetchall()
         display_rows = []
-        for tag_id, id_uuid, area_uuid, jd_area, jd_id, jd_ext, label in rows:
-            display = f"[{jd_area:02d}.{jd_id:02d}+{jd_ext:04d}] {label}"
+        for tag_id, code, id_uuid, area_uuid, label in rows:
+            jd_area, jd_id, jd_ext = (int(part) for part in re.split(r"[.+]", code))
+            display = f"[{code}] {label}"
             display_rows.append((display, tag_id, jd_area, jd_id, jd_ext, id_uuid, area_uuid))
-        self._set_labels(display_rows)
+        return display_rows
+
+    def _labels_loaded(self, rows):
+        self._labels_future = None
+        self._set_labels(rows)
+        self.update_results(self.input.text())
 
     def _set_labels(self, rows):
         self.label_map = {
@@ -132,13 +147,11 @@ class ExtTagSearchOverlay(QtWidgets.QFrame):
                 rows, key=lambda s: s[0].lower()
             )
         }
-        self.all_labels = list(self.label_map.keys())
+        self.matcher = FuzzyMatcher(self.label_map.keys())
 
     def update_results(self, text):
         if text:
-            matches_lower = get_close_matches(
-                text.lower(), self.all_labels, n=self.max_results, cutoff=0
-            )
+            matches_lower = self.matcher.match(text.lower(), self.max_results)
             results = [self.label_map[m] for m in matches_lower]
         else:
             results = list(self.label_map.values())[: self.max_results]
@@ -0,0 +1,302 @@
+"""Persistent index of the files under the repository root.
+
+scan_repository() walks the repository and records every file and folder
+in the repository_files table: its size, mtime, inode and the parsed
+``[N-XXXX YYYY-MM-DD HH.MM.SS]`` prefix of its name. A folder is only
+listed again when its own mtime changed since the last scan, which is the
+case whenever an entry was added, removed or renamed in it. Unchanged
+folders cost one stat, so re-scans follow the size of the change.
+Symlinked folders are recorded but not descended into.
+
+Editing a file in place does not touch its folder's mtime; pass
+full=True to re-list every folder and pick those changes up as well.
+
+A DirectorySnapshot is one listing of a single folder, taken from the
+index or with one scandir, that a page shares between everything that
+needs the folder's contents until the folder's mtime changes.
+"""
+
+import bisect
+import os
+import re
+import time
+
+from .database import directory_folder, update_directory_files
+
+PREFIX_PATTERN = re.compile(
+    r"\[(\d+)-([A-Za-z]{4}) (\d{4}-\d{2}-\d{2} \d{2}\.\d{2}\.\d{2})\]"
+)
+
+FOLDER_PATTERN = re.compile(r"(?:\d{4}_){3}\d{4}")
+
+# Filesystems update folder mtimes from a coarse clock, so a change made
+# within this long of a listing can leave the mtime as it was. Listings of
+# folders changed that recently are not trusted to stay current.
+RACY_NS = 2_000_000_000
+
+
+def _is_racy(mtime_ns, listed_ns):
+    return mtime_ns + RACY_NS >= listed_ns
+
+
+def relative_path(root, path):
+    """Return path relative to root with "/" separators, or None if outside it."""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if rel == os.curdir:
+        return ""
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        return None
+    return rel.replace(os.sep, "/")
+
+
+def _join(parent, name):
+    return f"{parent}/{name}" if parent else name
+
+
+def _entry_row(parent, entry):
+    """Return the repository_files row of a DirEntry, or None to skip it."""
+    try:
+        is_dir = entry.is_dir()
+        if not is_dir and not entry.is_file():
+            return None
+        st = entry.stat()
+    except OSError:
+        return None
+    m = PREFIX_PATTERN.match(entry.name)
+    number, code, timestamp = m.groups() if m else (None, None, None)
+    return (
+        _join(parent, entry.name),
+        parent,
+        entry.name,
+        int(is_dir),
+        st.st_size,
+        st.st_mtime_ns,
+        st.st_ino,
+        number,
+        code,
+        timestamp,
+    )
+
+
+def _remove_tree(cursor, path):
+    """Forget path and everything below it."""
+    if not path:
+        cursor.execute("DELETE FROM repository_files")
+        cursor.execute("DELETE FROM repository_dirs")
+        return
+    pattern = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+    for table in ("repository_files", "repository_dirs"):
+        cursor.execute(
+            f"DELETE FROM {table} WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+            (path, pattern),
+        )
+
+
+def _scan(cursor, root, start, full):
+    """Update the index below start.
+
+    Returns the folders that were re-listed and the paths that were
+    forgotten because they are gone.
+    """
+    changed = []
+    removed = []
+    pending = [start]
+    while pending:
+        rel = pending.pop()
+        full_path = os.path.join(root, rel)
+        listed_ns = time.time_ns()
+        try:
+            mtime_ns = os.stat(full_path).st_mtime_ns
+        except OSError:
+            _remove_tree(cursor, rel)
+            removed.append(rel)
+            continue
+        cursor.execute("SELECT mtime_ns FROM repository_dirs WHERE path = ?", (rel,))
+        row = cursor.fetchone()
+        if row and row[0] == mtime_ns and not full:
+            cursor.execute(
+                "SELECT path FROM repository_files WHERE parent = ? AND is_dir = 1",
+                (rel,),
+            )
+            pending.extend(
+                path for path, in cursor.fetchall()
+                if not os.path.islink(os.path.join(root, path))
+            )
+            continue
+
+        cursor.execute(
+            "SELECT name, is_dir, size, mtime_ns, inode FROM repository_files WHERE parent = ?",
+            (rel,),
+        )
+        known = {name: rest for name, *rest in cursor.fetchall()}
+        rows = []
+        try:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    row = _entry_row(rel, entry)
+                    if row is not None:
+                        rows.append(row)
+        except OSError:
+            _remove_tree(cursor, rel)
+            removed.append(rel)
+            continue
+        for row in rows:
+            name, is_dir = row[2], row[3]
+            if known.pop(name, None) != [is_dir, *row[4:7]]:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO repository_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+            if is_dir and not os.path.islink(os.path.join(root, row[0])):
+                pending.append(row[0])
+        for name in known:
+            _remove_tree(cursor, _join(rel, name))
+            removed.append(_join(rel, name))
+        # A racy listing is recorded with an mtime that never matches, so
+        # the next scan lists the folder again.
+        cursor.execute(
+            "INSERT OR REPLACE INTO repository_dirs (path, mtime_ns) VALUES (?, ?)",
+            (rel, -1 if _is_racy(mtime_ns, listed_ns) else mtime_ns),
+        )
+        changed.append(rel)
+    return changed, removed
+
+
+def scan_repository(conn, root, start="", full=False):
+    """Bring the index of root up to date, below start if given.
+
+    The search rows of the files in re-listed folders, and of removed
+    paths, are updated as well; nothing else of a directory's folder is
+    read again. Returns the re-listed folders, relative to root.
+    """
+    cursor = conn.cursor()
+    changed, removed = _scan(cursor, root, start, full)
+    conn.commit()
+    # {directory folder: (re-listed subfolders, removed paths)}
+    folders = {}
+    for paths, position in ((changed, 0), (removed, 1)):
+        for path in paths:
+            folder, _, sub = path.partition("/")
+            if FOLDER_PATTERN.fullmatch(folder):
+                folders.setdefault(folder, ([], []))[position].append(sub)
+    if folders:
+        cursor.execute("SELECT directory_id, [order] FROM state_jd_directories")
+        for directory_id, order in cursor.fetchall():
+            folder = directory_folder(order)
+            if folder in folders:
+                listed, gone = folders[folder]
+                update_directory_files(
+                    conn, directory_id, os.path.join(root, folder), listed, gone
+                )
+    return changed
+
+
+class DirectorySnapshot:
+    """The entries of one folder, sorted by lowercase name.
+
+    entries holds (name, is_dir) pairs; only files and folders are listed,
+    so broken links and the like are left out. headers holds the positions
+    of the ``.2do`` header files within entries. Stat results are fetched
+    on first use and cached, from the DirEntry when the snapshot was
+    scanned.
+
+    A snapshot stays valid while the folder's mtime is unchanged; check
+    is_stale() before reusing one.
+    """
+
+    def __init__(self, path, mtime_ns, listed_ns, entries, dir_entries=None):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.listed_ns = listed_ns
+        self.entries = entries
+        self.headers = [
+            index
+            for index, (name, is_dir) in enumerate(entries)
+            if not is_dir and name.lower().endswith(".2do")
+        ]
+        self._keys = [name.lower() for name, _is_dir in entries]
+        self._dir_entries = dir_entries or {}
+        self._stats = {}
+
+    @classmethod
+    def scan(cls, path):
+        """List path from disk. A missing folder gives an empty snapshot."""
+        listed_ns = time.time_ns()
+        entries = []
+        dir_entries = {}
+        try:
+            # The mtime is read first, so a change during the scan leaves
+            # the snapshot stale rather than silently incomplete.
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        if not is_dir and not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    entries.append((entry.name, is_dir))
+                    dir_entries[entry.name] = entry
+        except OSError:
+            return cls(path, None, listed_ns, [])
+        entries.sort(key=lambda entry: entry[0].lower())
+        return cls(path, mtime_ns, listed_ns, entries, dir_entries)
+
+    def is_stale(self):
+        """Return True if the folder may have changed since the snapshot."""
+        if self.mtime_ns is None or _is_racy(self.mtime_ns, self.listed_ns):
+            return True
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime_ns
+        except OSError:
+            return True
+
+    def stat(self, name):
+        """Return the stat result of entry name, or None if it is gone."""
+        if name not in self._stats:
+            entry = self._dir_entries.get(name)
+            try:
+                if entry is not None:
+                    self._stats[name] = entry.stat()
+                else:
+                    self._stats[name] = os.stat(os.path.join(self.path, name))
+            except OSError:
+                return None
+        return self._stats[name]
+
+    def header_names(self):
+        return [self.entries[index][0] for index in self.headers]
+
+    def header_before(self, name):
+        """Return the last header sorting before name, or None."""
+        position = bisect.bisect_left(self._keys, name.lower())
+        index = bisect.bisect_left(self.headers, position) - 1
+        return self.entries[self.headers[index]][0] if index >= 0 else None
+
+
+def list_directory(conn, root, path):
+    """Return a DirectorySnapshot of path from the index.
+
+    Returns None when path is outside root or its folder changed since it
+    was last scanned; the caller then scans it from disk.
+    """
+    rel = relative_path(root, path)
+    if rel is None:
+        return None
+    listed_ns = time.time_ns()
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("SELECT mtime_ns FROM repository_dirs WHERE path = ?", (rel,))
+    row = cursor.fetchone()
+    if not row or row[0] != mtime_ns:
+        return None
+    cursor.execute("SELECT name, is_dir FROM repository_files WHERE parent = ?", (rel,))
+    entries = sorted(
+        ((name, bool(is_dir)) for name, is_dir in cursor.fetchall()),
+        key=lambda entry: entry[0].lower(),
+    )
+    return DirectorySnapshot(path, mtime_ns, listed_ns, entries)
@@ -0,0 +1,409 @@
+"""Model, delegate and view behind the file list of a directory page.
+
+Rows are described by keys, as built by JdDirectoryPage._row_keys:
+("dir", name), ("file", name), ("header", name) and
+("markdown", name, mtime_ns). The model holds only the keys and the
+thumbnails of recently painted rows, and the delegate paints folder, file
+and header rows directly, so a row costs no widgets. Thumbnails are
+requested when a row is first painted, so only rows scrolled into view
+load one. Inline markdown previews are the exception: they hold
+clickable links and can be edited in place, so the page sets them as
+index widgets.
+
+Item data roles, matching the QListWidget items they replace:
+
+- Qt.UserRole: the name, or "header" / "markdown" for those rows
+- Qt.UserRole + 1: the absolute path of folder, file and markdown rows
+- Qt.UserRole + 2: "dir" or "file"
+"""
+
+import os
+import re
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from PySide6 import QtWidgets, QtCore, QtGui
+
+from .constants import (
+    BUTTON_COLOR,
+    DEFAULT_FILE_ICON,
+    DELETE_BUTTON_COLOR,
+    FILE_TYPE_ICONS,
+    SLATE_COLOR,
+    TAG_COLOR,
+    TEXT_COLOR,
+    THUMBNAIL_EXTS,
+)
+from .file_index import PREFIX_PATTERN
+from .renditions import render_tile
+
+ICON_WIDTH = 120
+ICON_HEIGHT = 75
+ROW_HEIGHT = ICON_HEIGHT + 4
+# Corner radius of file thumbnails and glyph tiles.
+THUMBNAIL_RADIUS = 10
+
+# Thumbnails kept in memory; older ones are dropped and loaded again from
+# the disk cache when their row is painted.
+THUMBNAIL_CACHE_SIZE = 512
+
+_glyph_pixmaps: dict[str, QtGui.QPixmap] = {}
+
+
+def rounded_pixmap(pixmap: QtGui.QPixmap) -> QtGui.QPixmap:
+    """Fit pixmap into an icon-sized tile with rounded corners."""
+    if pixmap.isNull():
+        return pixmap
+    return QtGui.QPixmap.fromImage(
+        render_tile(
+            pixmap.toImage(), ICON_WIDTH, ICON_HEIGHT, THUMBNAIL_RADIUS, centered=True
+        )
+    )
+
+
+def _glyph_pixmap(char: str) -> QtGui.QPixmap:
+    """Return the icon tile for a Nerd Font glyph; "" gives a blank tile."""
+    pixmap = _glyph_pixmaps.get(char)
+    if pixmap is None:
+        pixmap = QtGui.QPixmap(ICON_WIDTH, ICON_HEIGHT)
+        pixmap.fill(QtGui.QColor(SLATE_COLOR))
+        if char:
+            painter = QtGui.QPainter(pixmap)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            painter.setFont(QtGui.QFont("FiraCode Nerd Font", 48))
+            painter.setPen(QtGui.QColor(TEXT_COLOR))
+            painter.drawText(pixmap.rect(), QtCore.Qt.AlignmentFlag.AlignCenter, char)
+            painter.end()
+            pixmap = rounded_pixmap(pixmap)
+        _glyph_pixmaps[char] = pixmap
+    return pixmap
+
+
+def header_label(name: str) -> str:
+    """Return the text shown for a .2do header file."""
+    return re.sub(r"^\[[^\]]*\]\s*", "", os.path.splitext(name)[0]).strip()
+
+
+class FileListModel(QtCore.QAbstractListModel):
+    """The rows of one folder, as keys."""
+
+    # Emitted the first time a row needing a thumbnail is painted; the
+    # thumbnail comes back through set_thumbnail().
+    thumbnailRequested = QtCore.Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.path = ""
+        self._keys: list[tuple] = []
+        self._rows: dict[str, int] = {}
+        self._size_hints: dict[tuple, QtCore.QSize] = {}
+        self._dimmed: set[str] = set()
+        self._thumbnails: OrderedDict[str, QtGui.QPixmap] = OrderedDict()
+        self._requested: set[str] = set()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def key(self, row: int) -> tuple | None:
+        return self._keys[row] if 0 <= row < len(self._keys) else None
+
+    def keys(self) -> list[tuple]:
+        return list(self._keys)
+
+    def full_path(self, name: str) -> str:
+        return os.path.abspath(os.path.join(self.path, name))
+
+    def flags(self, index):
+        key = self.key(index.row()) if index.isValid() else None
+        if key is None:
+            return QtCore.Qt.NoItemFlags
+        if key[0] == "header":
+            return QtCore.Qt.ItemIsEnabled
+        if key[0] == "markdown":
+            return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        return (
+            QtCore.Qt.ItemIsEnabled
+            | QtCore.Qt.ItemIsSelectable
+            | QtCore.Qt.ItemIsDragEnabled
+        )
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        key = self.key(index.row()) if index.isValid() else None
+        if key is None:
+            return None
+        kind, name = key[0], key[1]
+        if role == QtCore.Qt.UserRole:
+            return kind if kind in ("header", "markdown") else name
+        if role == QtCore.Qt.UserRole + 1:
+            return None if kind == "header" else self.full_path(name)
+        if role == QtCore.Qt.UserRole + 2:
+            return kind if kind in ("dir", "file") else None
+        if role == QtCore.Qt.DisplayRole:
+            if kind == "header":
+                return header_label(name)
+            return None if kind == "markdown" else name
+        if role == QtCore.Qt.DecorationRole and kind in ("dir", "file"):
+            return self._icon(kind, name)
+        if role == QtCore.Qt.ForegroundRole and kind in ("dir", "file"):
+            if not PREFIX_PATTERN.match(name):
+                return QtGui.QColor(DELETE_BUTTON_COLOR)
+            return QtGui.QColor(TAG_COLOR if kind == "dir" else TEXT_COLOR)
+        if role == QtCore.Qt.SizeHintRole and kind == "markdown":
+            return self._size_hints.get(key)
+        return None
+
+    def is_dimmed(self, row: int) -> bool:
+        key = self.key(row)
+        return key is not None and key[0] in ("dir", "file") and key[1] in self._dimmed
+
+    def _icon(self, kind: str, name: str) -> QtGui.QPixmap:
+        if kind == "dir":
+            return _glyph_pixmap("\uf07b")  # nf-fa-folder
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in THUMBNAIL_EXTS:
+            return _glyph_pixmap(FILE_TYPE_ICONS.get(ext, DEFAULT_FILE_ICON))
+        path = self.full_path(name)
+        pixmap = self._thumbnails.get(path)
+        if pixmap is not None:
+            self._thumbnails.move_to_end(path)
+            return pixmap
+        if path not in self._requested:
+            self._requested.add(path)
+            self.thumbnailRequested.emit(path)
+        return _glyph_pixmap("")
+
+    def set_thumbnail(self, path: str, pixmap: QtGui.QPixmap) -> None:
+        self._thumbnails[path] = pixmap
+        self._thumbnails.move_to_end(path)
+        while len(self._thumbnails) > THUMBNAIL_CACHE_SIZE:
+            evicted, _pixmap = self._thumbnails.popitem(last=False)
+            self._requested.discard(evicted)
+        if os.path.dirname(path) == os.path.abspath(self.path):
+            row = self._rows.get(os.path.basename(path))
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def set_size_hint(self, row: int, size: QtCore.QSize) -> None:
+        """Record the size of the index widget shown on a markdown row."""
+        key = self.key(row)
+        if key is not None:
+            self._size_hints[key] = size
+
+    def set_dimmed(self, names) -> None:
+        """Paint the folder and file rows named in names faded."""
+        self._dimmed = set(names)
+        if self._keys:
+            self.dataChanged.emit(self.index(0), self.index(len(self._keys) - 1))
+
+    def set_rows(self, path: str, keys: list[tuple]) -> None:
+        """Show the rows of another folder."""
+        self.beginResetModel()
+        self.path = path
+        self._keys = list(keys)
+        self._size_hints = {}
+        self._dimmed = set()
+        self._requested = set()
+        self._reindex()
+        self.endResetModel()
+
+    def apply_keys(self, keys: list[tuple]) -> list[int]:
+        """Turn the rows into the rows for keys, touching only those that differ.
+
+        A run of rows replaced by rows of the same kind is a rename; those
+        rows are changed in place, so a renamed selected row stays
+        selected. Returns the rows, numbered as in keys, that were inserted
+        or changed.
+        """
+        old_keys = list(self._keys)
+        changed = []
+        matcher = SequenceMatcher(None, old_keys, keys, autojunk=False)
+        # Apply from the bottom up so earlier row numbers stay valid.
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            changed.extend(range(j1, j2))
+            reused = 0
+            if tag == "replace":
+                while (
+                    i1 + reused < i2
+                    and j1 + reused < j2
+                    and old_keys[i1 + reused][0] == keys[j1 + reused][0]
+                ):
+                    reused += 1
+                if reused:
+                    self._keys[i1:i1 + reused] = keys[j1:j1 + reused]
+                    self.dataChanged.emit(self.index(i1), self.index(i1 + reused - 1))
+            start = i1 + reused
+            if i2 > start:
+                self.beginRemoveRows(QtCore.QModelIndex(), start, i2 - 1)
+                del self._keys[start:i2]
+                self.endRemoveRows()
+            if j2 > j1 + reused:
+                self.beginInsertRows(
+                    QtCore.QModelIndex(), start, start + j2 - j1 - reused - 1
+                )
+                self._keys[start:start] = keys[j1 + reused:j2]
+                self.endInsertRows()
+        # Requests for removed rows are cancelled by the page, so a row
+        # coming back must ask again.
+        self._requested &= {
+            self.full_path(key[1]) for key in self._keys if key[0] == "file"
+        }
+        self._reindex()
+        return sorted(changed)
+
+    def _reindex(self) -> None:
+        self._rows = {
+            key[1]: row for row, key in enumerate(self._keys) if key[0] == "file"
+        }
+
+
+class FileListDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints folder, file and header rows of a FileListModel."""
+
+    def _header_font(self, font: QtGui.QFont) -> QtGui.QFont:
+        font = QtGui.QFont(font)
+        font.setPointSize(int(font.pointSize() * 0.75))
+        font.setBold(True)
+        return font
+
+    def sizeHint(self, option, index):
+        key = index.model().key(index.row())
+        width = option.rect.width()
+        if key is None:
+            return QtCore.QSize(width, 0)
+        if key[0] == "header":
+            height = QtGui.QFontMetrics(self._header_font(option.font)).height() + 4
+            return QtCore.QSize(width, height)
+        if key[0] == "markdown":
+            size = index.data(QtCore.Qt.SizeHintRole)
+            return size if size is not None else QtCore.QSize(width, 0)
+        return QtCore.QSize(width, ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        key = model.key(index.row())
+        if key is None or key[0] == "markdown":
+            return
+        painter.save()
+        rect = option.rect
+        if key[0] == "header":
+            painter.fillRect(rect, QtGui.QColor(BUTTON_COLOR))
+            font = self._header_font(option.font)
+            painter.setFont(font)
+            painter.setPen(QtGui.QColor("black"))
+            text_rect = rect.adjusted(5, 0, -5, 0)
+            text = QtGui.QFontMetrics(font).elidedText(
+                index.data(QtCore.Qt.DisplayRole),
+                QtCore.Qt.TextElideMode.ElideRight,
+                text_rect.width(),
+            )
+            painter.drawText(
+                text_rect,
+                QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignVCenter,
+                text,
+            )
+            painter.restore()
+            return
+        # The hover and selection background comes from the view's
+        # QListView::item style sheet rules.
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawPrimitive(
+            QtWidgets.QStyle.PrimitiveElement.PE_PanelItemViewItem,
+            option,
+            painter,
+            option.widget,
+        )
+        if model.is_dimmed(index.row()):
+            painter.setOpacity(0.4)
+        icon_rect = QtCore.QRect(rect.left(), rect.top() + 2, ICON_WIDTH, ICON_HEIGHT)
+        painter.drawPixmap(icon_rect, index.data(QtCore.Qt.DecorationRole))
+        text_rect = QtCore.QRect(
+            icon_rect.right() + 11, rect.top(), rect.right() - icon_rect.right() - 10, rect.height()
+        )
+        painter.setFont(option.font)
+        painter.setPen(index.data(QtCore.Qt.ForegroundRole))
+        text = option.fontMetrics.elidedText(
+            index.data(QtCore.Qt.DisplayRole),
+            QtCore.Qt.TextElideMode.ElideRight,
+            text_rect.width(),
+        )
+        painter.drawText(
+            text_rect,
+            QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignVCenter,
+            text,
+        )
+        painter.restore()
+
+
+class FileListView(QtWidgets.QListView):
+    """List view over a FileListModel.
+
+    count(), currentRow() and setCurrentRow() behave like QListWidget's,
+    which keeps the page's navigation code row-based.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_model = FileListModel(self)
+        self.setModel(self.file_model)
+        self.setItemDelegate(FileListDelegate(self))
+
+    def count(self) -> int:
+        return self.file_model.rowCount()
+
+    def currentRow(self) -> int:
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row: int) -> None:
+        """Make row current; a negative row clears the current row."""
+        if row < 0:
+            self.setCurrentIndex(QtCore.QModelIndex())
+        else:
+            self.setCurrentIndex(self.file_model.index(row))
+
+    def visible_rows(self) -> range:
+        """Return the rows at least partly inside the viewport, top to bottom."""
+        rect = self.viewport().rect()
+        first = self._row_near(rect.top(), 1)
+        if first is None:
+            return range(0)
+        last = self._row_near(rect.bottom(), -1)
+        return range(first, (self.count() - 1 if last is None else last) + 1)
+
+    def _row_near(self, y: int, step: int) -> int | None:
+        # Rows are separated by the view's spacing, so y may fall between
+        # two of them.
+        x = self.viewport().rect().center().x()
+        for offset in range(2 * self.spacing() + 2):
+            index = self.indexAt(QtCore.QPoint(x, y + step * offset))
+            if index.isValid():
+                return index.row()
+        return None
+
+    def set_row_widget(self, row: int, widget: QtWidgets.QWidget) -> None:
+        """Show widget over row, sizing the row to fit it."""
+        index = self.file_model.index(row)
+        self.file_model.set_size_hint(row, widget.sizeHint())
+        self.setIndexWidget(index, widget)
+        self.itemDelegate().sizeHintChanged.emit(index)
+
+    def startDrag(self, actions: QtCore.Qt.DropActions) -> None:
+        indexes = self.selectedIndexes()
+        if not indexes:
+            return
+        index = indexes[0]
+        path = index.data(QtCore.Qt.UserRole + 1)
+        if not path:
+            super().startDrag(actions)
+            return
+        drag = QtGui.QDrag(self)
+        mime = QtCore.QMimeData()
+        mime.setText(path)
+        mime.setUrls([QtCore.QUrl.fromLocalFile(path)])
+        drag.setMimeData(mime)
+        pixmap = self.viewport().grab(self.visualRect(index))
+        if not pixmap.isNull():
+            drag.setPixmap(pixmap)
+        drag.exec(QtCore.Qt.CopyAction)
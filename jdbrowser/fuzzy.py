@@ -0,0 +1,123 @@
+"""Fuzzy label matching for the search overlays.
+
+A FuzzyMatcher indexes a list of labels once, when an overlay opens, and
+then answers a query per keystroke. A label matches a query in one of
+these tiers, best first:
+
+0. the label equals the query
+1. the label starts with the query
+2. a word of the label starts with the query
+3. the label contains the query
+4. the label contains the query's characters in order
+5. the label shares at least one trigram with the query
+
+Within tiers 1-3 an earlier match ranks higher. Within tier 4 a tighter
+match ranks higher, one that skips fewer characters between the first and
+last matched character. Tier 5 ranks by the share of the query's trigrams
+found in the label. Remaining ties go to the shorter label, then to the
+label that sorts first, so the order never depends on hashing.
+
+Labels matching none of the tiers are never returned. Matching is case
+sensitive; the overlays lowercase both sides.
+"""
+
+import heapq
+from collections import Counter
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _subsequence_span(query, label):
+    """Return (skipped, start) of the leftmost in-order match, or None."""
+    start = pos = label.find(query[0])
+    if start < 0:
+        return None
+    for char in query[1:]:
+        pos = label.find(char, pos + 1)
+        if pos < 0:
+            return None
+    return pos + 1 - start - len(query), start
+
+
+class FuzzyMatcher:
+    """Ranks a fixed list of labels against queries typed one key at a time."""
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self._chars = {}
+        self._trigram_postings = {}
+        for index, label in enumerate(self.labels):
+            for char in set(label):
+                self._chars.setdefault(char, set()).add(index)
+            for trigram in _trigrams(label):
+                self._trigram_postings.setdefault(trigram, []).append(index)
+        self._last_query = ""
+        self._last_matches = None
+
+    def _subsequence_matches(self, query):
+        """Return the indices of labels containing query as a subsequence.
+
+        When query extends the previous query, only the previous matches
+        can still match, so only they are checked again.
+        """
+        extends = self._last_query and query.startswith(self._last_query)
+        if extends and self._last_matches is not None:
+            candidates = self._last_matches
+        else:
+            postings = [self._chars.get(char, set()) for char in set(query)]
+            postings.sort(key=len)
+            candidates = set.intersection(*postings) if postings else set()
+        matches = [
+            index for index in candidates
+            if _subsequence_span(query, self.labels[index]) is not None
+        ]
+        self._last_query = query
+        self._last_matches = matches
+        return matches
+
+    def _rank(self, query, index):
+        label = self.labels[index]
+        if label == query:
+            return (0, 0, 0)
+        pos = label.find(query)
+        if pos == 0:
+            return (1, 0, 0)
+        if pos > 0:
+            word_start = pos
+            while word_start > 0 and label[word_start - 1].isalnum():
+                word_start = label.find(query, word_start + 1)
+            if word_start > 0:
+                return (2, word_start, 0)
+            return (3, pos, 0)
+        skipped, start = _subsequence_span(query, label)
+        return (4, skipped, start)
+
+    def match(self, query, limit):
+        """Return up to limit labels matching query, best first."""
+        if not query:
+            return self.labels[:limit]
+        ranked = [
+            (*self._rank(query, index), len(self.labels[index]), self.labels[index], index)
+            for index in self._subsequence_matches(query)
+        ]
+        best = heapq.nsmallest(limit, ranked)
+        if len(best) < limit:
+            best += self._trigram_matches(query, limit - len(best), {key[-1] for key in ranked})
+        return [key[-2] for key in best]
+
+    def _trigram_matches(self, query, limit, exclude):
+        query_trigrams = _trigrams(query)
+        if not query_trigrams:
+            return []
+        shared = Counter()
+        for trigram in query_trigrams:
+            for index in self._trigram_postings.get(trigram, ()):
+                if index not in exclude:
+                    shared[index] += 1
+        ranked = (
+            (5, -count / len(query_trigrams), 0, len(self.labels[index]), self.labels[index], index)
+            for index, count in shared.items()
+        )
+        return heapq.nsmallest(limit, ranked)
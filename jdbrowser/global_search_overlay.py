@@ -0,0 +1,248 @@
+from PySide6 import QtWidgets, QtCore, QtGui
+import jdbrowser
+from .database import search
+from .database_worker import database_worker
+from .constants import (
+    TEXT_COLOR,
+    TAG_COLOR,
+    HIGHLIGHT_COLOR,
+    HOVER_COLOR,
+    SLATE_COLOR,
+)
+
+KIND_ICONS = {
+    "tag": "\uf02b",  # nf-fa-tag
+    "directory": "\uf07b",  # nf-fa-folder
+    "file": "\uf15b",  # nf-fa-file_o
+    "note": "\ue73e",  # nf-oct-markdown
+}
+
+
+class GlobalSearchOverlay(QtWidgets.QFrame):
+    """Overlay search box over the full-text index of tags, directories and files."""
+
+    resultSelected = QtCore.Signal(str, str, str)
+    closed = QtCore.Signal()
+
+    def __init__(self, parent, conn):
+        super().__init__(parent)
+        self.conn = conn
+        self.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.setFixedWidth(800)
+        self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
+        self.setStyleSheet("background: transparent;")
+
+        self._input_style_core = (
+            f"background-color: {SLATE_COLOR};"
+            f" color: {TEXT_COLOR};"
+            f" border: 2px solid {HIGHLIGHT_COLOR};"
+            " border-top-left-radius: 10px;"
+            " border-top-right-radius: 10px;"
+            " padding: 12px;"
+            " font-family: 'FiraCode Nerd Font';"
+            " font-size: 24px;"
+        )
+        self.input_style_no_results = (
+            "QLineEdit {"
+            + self._input_style_core
+            + " border-bottom-left-radius: 10px; border-bottom-right-radius: 10px;}"
+        )
+        self.input_style_with_results = (
+            "QLineEdit {"
+            + self._input_style_core
+            + " border-bottom: none; border-bottom-left-radius: 0; border-bottom-right-radius: 0;}"
+        )
+
+        self.list_style = f"""
+            QListWidget {{
+                background-color: {SLATE_COLOR};
+                color: {TEXT_COLOR};
+                border: 2px solid {HIGHLIGHT_COLOR};
+                border-top: none;
+                border-bottom-left-radius: 10px;
+                border-bottom-right-radius: 10px;
+                outline: none;
+                font-family: 'FiraCode Nerd Font';
+                font-size: 18px;
+            }}
+            QListWidget::item {{
+                padding: 8px 4px;
+            }}
+            QListWidget::item:hover {{
+                background-color: {HOVER_COLOR};
+            }}
+            QListWidget::item:selected {{
+                background-color: {TAG_COLOR};
+                color: {TEXT_COLOR};
+            }}
+        """
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.input = QtWidgets.QLineEdit()
+        self.input.setStyleSheet(self.input_style_no_results)
+        layout.addWidget(self.input)
+
+        self.list = QtWidgets.QListWidget()
+        self.list.setStyleSheet(self.list_style)
+        self.list.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.list.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.list.hide()
+        self.list.itemClicked.connect(self._item_clicked)
+        layout.addWidget(self.list)
+
+        self.item_height = QtGui.QFontMetrics(QtGui.QFont("FiraCode Nerd Font", 18)).height() + 16
+        self.max_results = 10
+
+        self._search_future = None
+
+        self.input.textChanged.connect(self.update_results)
+        self.input.installEventFilter(self)
+
+    def open(self):
+        self.input.clear()
+        self.update_results("")
+        self.reposition()
+        self.show()
+        self.input.setFocus()
+
+    def reposition(self):
+        parent = self.parent()
+        if parent:
+            x = (parent.width() - self.width()) // 2
+            y = 80
+            self.move(x, y)
+
+    def update_results(self, text):
+        # Every keystroke replaces the pending query, so a slow search for an
+        # old prefix never overwrites the results of the current one.
+        if self._search_future is not None:
+            self._search_future.cancel()
+            self._search_future = None
+        if not text.strip():
+            self._show_results([])
+            return
+        self._search_future = database_worker().query(search, text, None, self.max_results)
+        self._search_future.then(self._results_loaded)
+
+    def _results_loaded(self, rows):
+        self._search_future = None
+        self._show_results(rows)
+
+    def _show_results(self, rows):
+        self.list.clear()
+        if rows:
+            for kind, ref, path, title in rows:
+                text = path if kind in ("file", "note") else title
+                item = QtWidgets.QListWidgetItem(f"{KIND_ICONS.get(kind, '')}  {text}")
+                item.setData(QtCore.Qt.UserRole, (kind, ref, path))
+                self.list.addItem(item)
+            count = len(rows)
+            self.list.setFixedHeight(min(count, self.max_results) * self.item_height)
+            self.list.show()
+            self.input.setStyleSheet(self.input_style_with_results)
+            self.list.setCurrentRow(0)
+        else:
+            self.list.hide()
+            self.input.setStyleSheet(self.input_style_no_results)
+        self.adjustSize()
+
+    def move_selection(self, delta):
+        count = self.list.count()
+        if count == 0:
+            return
+        row = (self.list.currentRow() + delta) % count
+        self.list.setCurrentRow(row)
+
+    def select_current(self):
+        item = self.list.currentItem()
+        if item:
+            self.resultSelected.emit(*item.data(QtCore.Qt.UserRole))
+        self.close_overlay()
+
+    def _item_clicked(self, item):
+        if item:
+            self.resultSelected.emit(*item.data(QtCore.Qt.UserRole))
+        self.close_overlay()
+
+    def close_overlay(self):
+        if self._search_future is not None:
+            self._search_future.cancel()
+            self._search_future = None
+        self.hide()
+        self.closed.emit()
+
+    def eventFilter(self, obj, event):
+        if obj is self.input and event.type() == QtCore.QEvent.KeyPress:
+            key = event.key()
+            mods = event.modifiers()
+            if (
+                key in (QtCore.Qt.Key_Down, QtCore.Qt.Key_Tab)
+                and not (mods & QtCore.Qt.ShiftModifier)
+            ) or (key == QtCore.Qt.Key_J and mods & QtCore.Qt.ControlModifier):
+                self.move_selection(1)
+                return True
+            if (
+                key in (QtCore.Qt.Key_Up, QtCore.Qt.Key_Backtab)
+                or (key == QtCore.Qt.Key_Tab and mods & QtCore.Qt.ShiftModifier)
+                or (key == QtCore.Qt.Key_K and mods & QtCore.Qt.ControlModifier)
+            ):
+                self.move_selection(-1)
+                return True
+            if key in (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter):
+                self.select_current()
+                return True
+            if key == QtCore.Qt.Key_Escape:
+                self.close_overlay()
+                return True
+        return super().eventFilter(obj, event)
+
+
+def open_search_result(conn, kind, ref, path):
+    """Navigate to the page showing a search result.
+
+    Tags open the level below them, like descending into them does.
+    Directories, files and notes open their directory page.
+    """
+    if kind != "tag":
+        from .jd_directory_page import JdDirectoryPage
+
+        jdbrowser.navigate_to(JdDirectoryPage(ref))
+        return
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT level, code, area_uuid, id_uuid FROM state_jd_tag_paths WHERE tag_id = ?",
+        (ref,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return
+    level, code, area_uuid, id_uuid = row
+    jd_area = int(code[0:2])
+    if level == "area":
+        from .jd_id_page import JdIdPage
+
+        new_page = JdIdPage(parent_uuid=ref, jd_area=jd_area)
+    elif level == "id":
+        from .jd_ext_page import JdExtPage
+
+        new_page = JdExtPage(
+            parent_uuid=ref,
+            jd_area=jd_area,
+            jd_id=int(code[3:5]),
+            grandparent_uuid=area_uuid,
+        )
+    else:
+        from .jd_directory_list_page import JdDirectoryListPage
+
+        new_page = JdDirectoryListPage(
+            parent_uuid=ref,
+            jd_area=jd_area,
+            jd_id=int(code[3:5]),
+            jd_ext=int(code[6:10]),
+            grandparent_uuid=id_uuid,
+            great_grandparent_uuid=area_uuid,
+        )
+    jdbrowser.navigate_to(new_page)
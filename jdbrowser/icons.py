@@ -0,0 +1,53 @@
+"""Ingest of user-picked icons.
+
+Icons are stored as a bounded, pre-scaled PNG rendition rather than the
+picked file itself, so a multi-megabyte camera JPEG becomes a small image
+that item widgets can decode and draw cheaply. The picked file is decoded
+at the rendition's size rather than in full, and turned upright by its EXIF
+orientation. The SHA-256 of the original bytes is kept next to the
+rendition to tell where it came from.
+"""
+
+import hashlib
+
+from PySide6 import QtCore
+
+from .renditions import read_image
+
+# Twice the largest tile an icon is drawn at (240x150), so HiDPI screens
+# still get a downscale rather than an upscale.
+ICON_MAX_WIDTH = 480
+ICON_MAX_HEIGHT = 300
+
+
+def encode_icon(image):
+    """Return PNG bytes of image shrunk to fit the icon bounds."""
+    if image.width() > ICON_MAX_WIDTH or image.height() > ICON_MAX_HEIGHT:
+        image = image.scaled(
+            ICON_MAX_WIDTH,
+            ICON_MAX_HEIGHT,
+            QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+            QtCore.Qt.TransformationMode.SmoothTransformation,
+        )
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def ingest_icon(data):
+    """Return (rendition, source_hash) for image bytes, or None if they do not decode."""
+    image = read_image(data, ICON_MAX_WIDTH, ICON_MAX_HEIGHT)
+    if image.isNull():
+        return None
+    return encode_icon(image), hashlib.sha256(data).hexdigest()
+
+
+def ingest_icon_file(path):
+    """Read path and ingest it like ingest_icon(); None if unreadable."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return ingest_icon(data)
@@ -1,17 +1,22 @@
 import os
 import re
+from functools import partial
 from PySide6 import QtWidgets, QtGui, QtCore
+from shiboken6 import isValid
 import jdbrowser
 from .directory_item import DirectoryItem
 from .recent_directory_item import RecentDirectoryItem
+from .skeleton_item import SkeletonItem
 from .database import (
     setup_database,
-    rebuild_state_jd_directories,
+    unit_of_work,
     create_jd_directory,
     add_directory_tag,
     remove_directory_tag,
-    rebuild_state_directory_tags,
+    load_directory_tags,
 )
+from .database_worker import database_worker
+from .file_index import DirectorySnapshot, list_directory
 from .dialogs import EditTagDialog, SimpleEditTagDialog, RemoveDirectoryTagDialog
 from .constants import *
 from .config import read_config
@@ -19,6 +24,10 @@ from .search_line_edit import SearchLineEdit
 from .tag_search_overlay import TagSearchOverlay
 from .ext_tag_search_overlay import ExtTagSearchOverlay
 from .directory_search_overlay import DirectorySearchOverlay
+from .global_search_overlay import GlobalSearchOverlay, open_search_result
+
+# Rows shown while the directory list is loading for the first time.
+SKELETON_ROWS = 3
 
 class JdDirectoryListPage(QtWidgets.QWidget):
     def __init__(
@@ -89,12 +98,14 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         self.remove_tag_overlay = None
         self.ext_tag_overlay = None
         self.directory_overlay = None
+        self.global_search_overlay = None
         self.recent_items = []
         self.recent_wrapper = None
         self.recent_frame = None
         self.untagged_items = []
         self.untagged_wrapper = None
         self.untagged_frame = None
+        self._load_future = None
 
         self._setup_ui()
         self._setup_shortcuts()
@@ -126,18 +137,7 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             grandparent_uuid=self.great_grandparent_uuid,
         )
         # Ensure the item we descended from becomes selected when returning
-        target_tag_id = self.parent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.parent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def ascend_to_id(self):
@@ -146,36 +146,14 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         new_page = JdIdPage(
             parent_uuid=self.great_grandparent_uuid, jd_area=self.current_jd_area
         )
-        target_tag_id = self.grandparent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.grandparent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def ascend_to_area(self):
         from .jd_area_page import JdAreaPage
 
         new_page = JdAreaPage()
-        target_tag_id = self.great_grandparent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.great_grandparent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def descend_level(self):
@@ -362,9 +340,7 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         self.vlayout.setContentsMargins(5, 5, 5, 5)
         self.vlayout.setSpacing(5)
 
-        self._load_directories()
-        if self.items:
-            self.set_selection(0)
+        self._load_directories(partial(self._restore_selection, 0))
 
         # Search input box
         self.search_input = SearchLineEdit(self)
@@ -420,61 +396,48 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         self.untagged_wrapper = None
         self.untagged_frame = None
 
-    def _load_directories(self):
-        self._clear_items()
-        self.selected_index = None
-        cursor = self.conn.cursor()
+    def _load_directories(self, on_loaded=None):
+        """Reload the directory rows on the database worker.
+
+        The current items stay up until the rows arrive; on the first load
+        skeleton rows stand in for them. on_loaded runs once the new items
+        are built, typically to restore the selection.
+        """
+        if self._load_future is not None:
+            self._load_future.cancel()
+        if not self.items:
+            self._clear_items()
+            for _ in range(SKELETON_ROWS):
+                self.vlayout.addWidget(SkeletonItem())
+            self.vlayout.addStretch(1)
+        self._load_future = database_worker().query(self._fetch_directories)
+        self._load_future.then(partial(self._directories_loaded, on_loaded))
+
+    def _fetch_directories(self, conn):
+        """Return the tagged, recent and untagged rows; runs on the worker."""
+        cursor = conn.cursor()
+
 
         cursor.execute(
             """
-            SELECT d.directory_id, d.label, d.[order], i.icon
+            SELECT d.directory_id, d.label, d.[order], b.data
             FROM state_jd_directories d
             JOIN state_jd_directory_tags dt ON d.directory_id = dt.directory_id
             LEFT JOIN state_jd_directory_icons i ON d.directory_id = i.directory_id
+            LEFT JOIN blobs b ON b.hash = i.icon_hash
             WHERE dt.tag_id = ?
             ORDER BY d.[order]
             """,
             (self.parent_uuid,),
         )
-        rows = cursor.fetchall()
-        for row in rows:
-            directory_id, label, order, icon_data = row
-            icon_data = icon_data or self._fallback_icon(order)
-            cursor.execute(
-                """
-                SELECT dt.tag_id,
-                       COALESCE(ext.label, id.label, area.label) AS label,
-                       COALESCE(ext.[order], id.[order], area.[order]) AS [order],
-                       COALESCE(ext.parent_uuid, id.parent_uuid) AS parent_uuid
-                FROM state_jd_directory_tags dt
-                LEFT JOIN state_jd_ext_tags ext ON dt.tag_id = ext.tag_id
-                LEFT JOIN state_jd_id_tags id ON dt.tag_id = id.tag_id
-                LEFT JOIN state_jd_area_tags area ON dt.tag_id = area.tag_id
-                WHERE dt.directory_id = ?
-                ORDER BY [order]
-                """,
-                (directory_id,),
-            )
-            tag_rows = cursor.fetchall()
-            tags = [tuple(t) for t in tag_rows]
-            index = len(self.items)
-            item = DirectoryItem(directory_id, label, order, icon_data, self, index, tags)
-            item.updateLabel(self.show_prefix)
-            self.vlayout.addWidget(item)
-            self.items.append(item)
-        self.main_count = len(self.items)
-        self._load_recent_directories()
-        self._load_untagged_directories()
-        self.vlayout.addStretch(1)
-
-    def _load_recent_directories(self):
-        cursor = self.conn.cursor()
+        tagged = cursor.fetchall()
         cursor.execute(
             """
-            SELECT e.directory_id, d.label, d.[order], i.icon
+            SELECT e.directory_id, d.label, d.[order], b.data
             FROM event_create_jd_directory e
             JOIN state_jd_directories d ON e.directory_id = d.directory_id
             LEFT JOIN state_jd_directory_icons i ON d.directory_id = i.directory_id
+            LEFT JOIN blobs b ON b.hash = i.icon_hash
             LEFT JOIN state_jd_directory_tags t ON d.directory_id = t.directory_id
                 AND t.tag_id = ?
             WHERE t.tag_id IS NULL
@@ -483,7 +446,72 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             """,
             (self.parent_uuid,),
         )
-        rows = cursor.fetchall()
+        recent = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT e.directory_id, d.label, d.[order], b.data
+            FROM event_create_jd_directory e
+            JOIN state_jd_directories d ON e.directory_id = d.directory_id
+            LEFT JOIN state_jd_directory_icons i ON d.directory_id = i.directory_id
+            LEFT JOIN blobs b ON b.hash = i.icon_hash
+            LEFT JOIN state_jd_directory_tags t ON d.directory_id = t.directory_id
+            WHERE t.directory_id IS NULL
+            ORDER BY e.event_id DESC
+            LIMIT 5
+            """
+        )
+        untagged = cursor.fetchall()
+        tags = load_directory_tags(
+            conn, [row[0] for row in tagged] + [row[0] for row in recent]
+        )
+
+        def with_tags(rows):
+            return [
+                (
+                    directory_id,
+                    label,
+                    order,
+                    icon_data or self._fallback_icon(order),
+                    tags.get(directory_id, []),
+                )
+                for directory_id, label, order, icon_data in rows
+            ]
+
+        return with_tags(tagged), with_tags(recent), with_tags(untagged)
+
+    def _directories_loaded(self, on_loaded, rows):
+        if not isValid(self):
+            return
+        self._load_future = None
+        tagged, recent, untagged = rows
+        self._clear_items()
+        self.selected_index = None
+        for directory_id, label, order, icon_data, tags in tagged:
+            index = len(self.items)
+            item = DirectoryItem(directory_id, label, order, icon_data, self, index, tags)
+            item.updateLabel(self.show_prefix)
+            self.vlayout.addWidget(item)
+            self.items.append(item)
+        self.main_count = len(self.items)
+        self._build_recent_directories(recent)
+        self._build_untagged_directories(untagged)
+        self.vlayout.addStretch(1)
+        if on_loaded:
+            on_loaded()
+
+    def _restore_selection(self, index):
+        """Select index, clamped to the last item, once the list is rebuilt."""
+        if not self.items or index is None:
+            return
+        self.set_selection(min(index, len(self.items) - 1))
+
+    def _select_directory(self, directory_id):
+        for i, item in enumerate(self.items):
+            if item.directory_id == directory_id:
+                self.set_selection(i)
+                break
+
+    def _build_recent_directories(self, rows):
         if not rows:
             return
         self.recent_items = []
@@ -507,25 +535,7 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         v_layout = QtWidgets.QVBoxLayout(self.recent_frame)
         v_layout.setContentsMargins(10, 10, 10, 10)
         v_layout.setSpacing(5)
-        for directory_id, label, order, icon_data in rows:
-            icon_data = icon_data or self._fallback_icon(order)
-            cursor.execute(
-                """
-                SELECT dt.tag_id,
-                       COALESCE(ext.label, id.label, area.label) AS label,
-                       COALESCE(ext.[order], id.[order], area.[order]) AS [order],
-                       COALESCE(ext.parent_uuid, id.parent_uuid) AS parent_uuid
-                FROM state_jd_directory_tags dt
-                LEFT JOIN state_jd_ext_tags ext ON dt.tag_id = ext.tag_id
-                LEFT JOIN state_jd_id_tags id ON dt.tag_id = id.tag_id
-                LEFT JOIN state_jd_area_tags area ON dt.tag_id = area.tag_id
-                WHERE dt.directory_id = ?
-                ORDER BY [order]
-                """,
-                (directory_id,),
-            )
-            tag_rows = cursor.fetchall()
-            tags = [tuple(t) for t in tag_rows]
+        for directory_id, label, order, icon_data, tags in rows:
             index = len(self.items)
             item = RecentDirectoryItem(
                 directory_id, label, order, icon_data, self, index, tags
@@ -540,21 +550,7 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         )
         QtCore.QTimer.singleShot(0, self._update_recent_width)
 
-    def _load_untagged_directories(self):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            SELECT e.directory_id, d.label, d.[order], i.icon
-            FROM event_create_jd_directory e
-            JOIN state_jd_directories d ON e.directory_id = d.directory_id
-            LEFT JOIN state_jd_directory_icons i ON d.directory_id = i.directory_id
-            LEFT JOIN state_jd_directory_tags t ON d.directory_id = t.directory_id
-            WHERE t.directory_id IS NULL
-            ORDER BY e.event_id DESC
-            LIMIT 5
-            """
-        )
-        rows = cursor.fetchall()
+    def _build_untagged_directories(self, rows):
         if not rows:
             return
         self.untagged_items = []
@@ -578,11 +574,10 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         v_layout = QtWidgets.QVBoxLayout(self.untagged_frame)
         v_layout.setContentsMargins(10, 10, 10, 10)
         v_layout.setSpacing(5)
-        for directory_id, label, order, icon_data in rows:
-            icon_data = icon_data or self._fallback_icon(order)
+        for directory_id, label, order, icon_data, tags in rows:
             index = len(self.items)
             item = RecentDirectoryItem(
-                directory_id, label, order, icon_data, self, index, []
+                directory_id, label, order, icon_data, self, index, tags
             )
             item.updateLabel(self.show_prefix)
             v_layout.addWidget(item)
@@ -700,13 +695,7 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             item = self.items[self.selected_index]
             directory_id = item.directory_id
             add_directory_tag(self.conn, directory_id, self.parent_uuid)
-            rebuild_state_directory_tags(self.conn)
-            rebuild_state_jd_directories(self.conn)
-            self._load_directories()
-            for i, it in enumerate(self.items):
-                if it.directory_id == directory_id:
-                    self.set_selection(i)
-                    break
+            self._load_directories(partial(self._select_directory, directory_id))
             return
         cursor = self.conn.cursor()
         cursor.execute("SELECT MAX([order]) FROM state_jd_directories")
@@ -720,12 +709,14 @@ class JdDirectoryListPage(QtWidgets.QWidget):
 
         if os.path.exists(folder_path):
             pattern = re.compile(r"^\d{4}_\d{4}_\d{4}_\d{4}$")
+            snapshot = list_directory(
+                self.conn, self.repository_path, self.repository_path
+            ) or DirectorySnapshot.scan(self.repository_path)
             highest = max(
                 (
                     int(name.replace("_", ""))
-                    for name in os.listdir(self.repository_path)
-                    if os.path.isdir(os.path.join(self.repository_path, name))
-                    and pattern.fullmatch(name)
+                    for name, is_dir in snapshot.entries
+                    if is_dir and pattern.fullmatch(name)
                 ),
                 default=0,
             )
@@ -737,14 +728,11 @@ class JdDirectoryListPage(QtWidgets.QWidget):
 
         os.makedirs(folder_path, exist_ok=True)
 
-        directory_id = create_jd_directory(self.conn, new_order, "")
-        if directory_id:
-            add_directory_tag(self.conn, directory_id, self.parent_uuid)
-        rebuild_state_jd_directories(self.conn)
-        rebuild_state_directory_tags(self.conn)
-        self._load_directories()
-        if self.items:
-            self.set_selection(self.main_count - 1)
+        with unit_of_work(self.conn):
+            directory_id = create_jd_directory(self.conn, new_order, "")
+            if directory_id:
+                add_directory_tag(self.conn, directory_id, self.parent_uuid)
+        self._load_directories(lambda: self._restore_selection(self.main_count - 1))
 
     def _rename_tag_label(self):
         """Edit the current directory's label with a simple dialog."""
@@ -764,19 +752,9 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         dialog = SimpleEditTagDialog(current_label, self)
         if dialog.exec() == QtWidgets.QDialog.Accepted:
             new_label = dialog.get_label()
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_label')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_directory_label (event_id, directory_id, new_label) VALUES (?, ?, ?)",
-                (event_id, directory_id, new_label),
-            )
-            self.conn.commit()
-            rebuild_state_jd_directories(self.conn)
-            self._load_directories()
-            for i, item in enumerate(self.items):
-                if item.directory_id == directory_id:
-                    self.set_selection(i)
-                    break
+            with unit_of_work(self.conn) as uow:
+                uow.append('set_jd_directory_label', directory_id=directory_id, new_label=new_label)
+            self._load_directories(partial(self._select_directory, directory_id))
 
     def _edit_tag_label_with_icon(self):
         if self.selected_index is None or not (0 <= self.selected_index < len(self.items)):
@@ -793,17 +771,20 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             return
         order, current_label = row
         cursor.execute(
-            "SELECT icon FROM state_jd_directory_icons WHERE directory_id = ?",
+            "SELECT b.data FROM state_jd_directory_icons i JOIN blobs b ON b.hash = i.icon_hash "
+            "WHERE i.directory_id = ?",
             (directory_id,),
         )
         icon_row = cursor.fetchone()
         icon_data = icon_row[0] if icon_row else None
+        icon_source_hash = None
         while True:
             dialog = EditTagDialog(current_label, icon_data, 3, order, self)
             if dialog.exec() == QtWidgets.QDialog.Accepted:
                 new_order = dialog.get_order()
                 new_label = dialog.get_label()
                 new_icon_data = dialog.get_icon_data()
+                new_icon_source_hash = dialog.get_icon_source_hash() or icon_source_hash
                 cursor.execute(
                     "SELECT directory_id FROM state_jd_directories WHERE [order] = ? AND directory_id != ?",
                     (new_order, directory_id),
@@ -814,35 +795,29 @@ class JdDirectoryListPage(QtWidgets.QWidget):
                         f"Order {new_order} is already in use.",
                     )
                     current_label, icon_data, order = new_label, new_icon_data, new_order
+                    icon_source_hash = new_icon_source_hash
                     continue
-                if new_order != order:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_order')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_order (event_id, directory_id, [order]) VALUES (?, ?, ?)",
-                        (event_id, directory_id, new_order),
-                    )
-                if new_label != current_label:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_label')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_label (event_id, directory_id, new_label) VALUES (?, ?, ?)",
-                        (event_id, directory_id, new_label),
-                    )
-                if new_icon_data:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_icon')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_icon (event_id, directory_id, icon) VALUES (?, ?, ?)",
-                        (event_id, directory_id, new_icon_data),
-                    )
-                self.conn.commit()
-                rebuild_state_jd_directories(self.conn)
-                self._load_directories()
-                for i, item in enumerate(self.items):
-                    if item.directory_id == directory_id:
-                        self.set_selection(i)
-                        break
+                with unit_of_work(self.conn) as uow:
+                    if new_order != order:
+                        uow.append(
+                            'set_jd_directory_order',
+                            directory_id=directory_id,
+                            order=new_order,
+                        )
+                    if new_label != current_label:
+                        uow.append(
+                            'set_jd_directory_label',
+                            directory_id=directory_id,
+                            new_label=new_label,
+                        )
+                    if new_icon_source_hash:
+                        uow.append(
+                            'set_jd_directory_icon',
+                            directory_id=directory_id,
+                            icon_hash=uow.put_blob(new_icon_data),
+                            source_hash=new_icon_source_hash,
+                        )
+                self._load_directories(partial(self._select_directory, directory_id))
                 break
             else:
                 break
@@ -860,15 +835,8 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         dialog = RemoveDirectoryTagDialog(current_item.label_text, self.ext_label, self)
         if dialog.exec() == QtWidgets.QDialog.Accepted:
             remove_directory_tag(self.conn, directory_id, self.parent_uuid)
-            rebuild_state_directory_tags(self.conn)
             idx = self.selected_index
-            self._load_directories()
-            if self.items:
-                if idx is None or idx >= len(self.items):
-                    idx = len(self.items) - 1
-                self.set_selection(idx)
-            else:
-                self.selected_index = None
+            self._load_directories(partial(self._restore_selection, idx))
 
     def enter_search_mode(self):
         if not self.in_search_mode:
@@ -977,6 +945,8 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             self.ext_tag_overlay.reposition()
         if self.directory_overlay and self.directory_overlay.isVisible():
             self.directory_overlay.reposition()
+        if self.global_search_overlay and self.global_search_overlay.isVisible():
+            self.global_search_overlay.reposition()
         self._update_recent_width()
         super().resizeEvent(event)
 
@@ -1013,11 +983,8 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         if cursor.fetchone():
             return
         add_directory_tag(self.conn, current_item.directory_id, tag_uuid)
-        rebuild_state_directory_tags(self.conn)
         idx = self.selected_index
-        self._load_directories()
-        if idx is not None and idx < len(self.items):
-            self.set_selection(idx)
+        self._load_directories(partial(self._restore_selection, idx))
 
     def open_remove_tag_search(self):
         if self.selected_index is None or not (0 <= self.selected_index < len(self.items)):
@@ -1055,11 +1022,8 @@ class JdDirectoryListPage(QtWidgets.QWidget):
             return
         current_item = self.items[self.selected_index]
         remove_directory_tag(self.conn, current_item.directory_id, tag_uuid)
-        rebuild_state_directory_tags(self.conn)
         idx = self.selected_index
-        self._load_directories()
-        if idx is not None and idx < len(self.items):
-            self.set_selection(idx)
+        self._load_directories(partial(self._restore_selection, idx))
 
     def open_directory_search(self):
         if not self.directory_overlay:
@@ -1074,6 +1038,21 @@ class JdDirectoryListPage(QtWidgets.QWidget):
         for s in self.shortcuts:
             s.setEnabled(True)
 
+    def open_global_search(self):
+        if not self.global_search_overlay:
+            self.global_search_overlay = GlobalSearchOverlay(self, self.conn)
+            self.global_search_overlay.resultSelected.connect(
+                lambda kind, ref, path: open_search_result(self.conn, kind, ref, path)
+            )
+            self.global_search_overlay.closed.connect(self._global_search_closed)
+        for s in self.shortcuts:
+            s.setEnabled(False)
+        self.global_search_overlay.open()
+
+    def _global_search_closed(self):
+        for s in self.shortcuts:
+            s.setEnabled(True)
+
     def _navigate_to_directory(self, directory_id):
         from .jd_directory_page import JdDirectoryPage
 
@@ -1149,6 +1128,13 @@ class JdDirectoryListPage(QtWidgets.QWidget):
                 None,
                 QtCore.Qt.KeyboardModifier.ShiftModifier,
             ),
+            (
+                QtCore.Qt.Key_F,
+                self.open_global_search,
+                None,
+                QtCore.Qt.KeyboardModifier.ControlModifier
+                | QtCore.Qt.KeyboardModifier.ShiftModifier,
+            ),
             (QtCore.Qt.Key_Tab, self.toggle_label_prefix, None),
             (QtCore.Qt.Key_Slash, self.enter_search_mode, None),
             (
@@ -1,13 +1,9 @@
 import os
 import re
-import weakref
-import contextlib
-import tempfile
-import hashlib
-from collections import deque
+import traceback
 from datetime import datetime, timezone
 from functools import partial
-from PySide6 import QtWidgets, QtCore, QtGui, QtMultimedia
+from PySide6 import QtWidgets, QtCore, QtGui
 from shiboken6 import isValid
 import markdown
 import jdbrowser
@@ -16,51 +12,32 @@ from .database import (
     setup_database,
     add_directory_tag,
     remove_directory_tag,
-    rebuild_state_directory_tags,
-    rebuild_state_jd_directories,
+    unit_of_work,
+    load_directory_tags,
+    set_jd_directory_icon,
 )
+from .database_worker import database_worker
+from .file_index import (
+    DirectorySnapshot,
+    list_directory,
+    relative_path,
+    scan_repository,
+)
+from .icons import ingest_icon, ingest_icon_file
 from .dialogs import EditTagDialog, SimpleEditTagDialog, CreateFileDialog
 from .directory_item import DirectoryItem
 from .tag_search_overlay import TagSearchOverlay
 from .ext_tag_search_overlay import ExtTagSearchOverlay
 from .directory_search_overlay import DirectorySearchOverlay
+from .global_search_overlay import GlobalSearchOverlay, open_search_result
 from .search_line_edit import SearchLineEdit
+from .file_list import FileListView, ICON_HEIGHT, ICON_WIDTH, THUMBNAIL_RADIUS
+from .renditions import encode_tile, icon_tile, read_image, render_tile
+from .thumbnail_cache import cache_key, thumbnail_cache
+from .thumbnail_scheduler import ThumbnailScheduler
+from .video_frame_worker import video_frame_pool
 from .config import read_config
 
-# Mapping of common file extensions to FiraCode Nerd Font icons
-FILE_TYPE_ICONS = {
-    ".txt": "\uf15c",  # nf-fa-file_text_o
-    ".md": "\ue73e",  # nf-oct-markdown
-    ".csv": "\uf1c3",  # nf-fa-file_excel_o
-    ".json": "\ufb25",  # nf-mdi-json
-    ".py": "\ue606",  # nf-dev-python
-    ".sh": "\uf489",  # nf-oct-terminal
-    ".pdf": "\uf1c1",  # nf-fa-file_pdf_o
-    ".zip": "\uf1c6",  # nf-fa-file_archive_o
-    ".mp3": "\uf001",  # nf-fa-music
-    ".wav": "\uf1c7",  # nf-fa-file_audio_o
-    ".html": "\uf13b",  # nf-fa-html5
-    ".css": "\uf13c",  # nf-fa-css3
-    ".js": "\uf3b8",  # nf-dev-javascript
-    ".svg": "\uf1c9",  # nf-fa-file_image_o
-}
-DEFAULT_FILE_ICON = "\uf15b"  # nf-fa-file_o
-
-
-THUMBNAIL_EXTS = {
-    ".png",
-    ".jpg",
-    ".jpeg",
-    ".bmp",
-    ".gif",
-    ".webp",
-    ".mp4",
-    ".mkv",
-    ".avi",
-    ".mov",
-    ".webm",
-}
-
 # File extensions treated as images for previewing
 IMAGE_EXTS = {
     ".png",
@@ -73,66 +50,70 @@ IMAGE_EXTS = {
 
 ARCHIVE_DIR_NAME = "[0-META 0000-00-00 00.00.01] archive"
 
+# Quiet period after the last filesystem change before the list is diffed,
+# so a burst of changes (an editor save, a copy) costs one refresh.
+REFRESH_DEBOUNCE_MS = 200
 
-@contextlib.contextmanager
-def _capture_ffmpeg_output():
-    with tempfile.TemporaryFile() as tmp:
-        stdout_fd = os.dup(1)
-        stderr_fd = os.dup(2)
-        try:
-            os.dup2(tmp.fileno(), 1)
-            os.dup2(tmp.fileno(), 2)
-            yield tmp
-        finally:
-            os.dup2(stdout_fd, 1)
-            os.dup2(stderr_fd, 2)
-            os.close(stdout_fd)
-            os.close(stderr_fd)
-
-
-class ThumbnailLoader(QtCore.QRunnable):
-    def __init__(self, page, label, path):
+
+_selection_icons = None
+
+
+class _SelectionIconJob(QtCore.QRunnable):
+    def __init__(self, icons, directory_id, path, is_image):
         super().__init__()
-        self.page_ref = weakref.ref(page)
-        self.label_ref = weakref.ref(label)
+        self.icons = icons
+        self.directory_id = directory_id
         self.path = path
+        self.is_image = is_image
 
     def run(self):
-        page = self.page_ref()
-        label = self.label_ref()
-        if not page or not label or not isValid(page) or not isValid(label):
-            return
-        pixmap = page._thumbnail_for_path(self.path)
-        if pixmap and isValid(label):
-            QtCore.QMetaObject.invokeMethod(
-                label,
-                "setPixmap",
-                QtCore.Qt.QueuedConnection,
-                QtCore.Q_ARG(QtGui.QPixmap, pixmap),
-            )
+        if self.is_image:
+            icon = ingest_icon_file(self.path)
+        else:
+            data = video_frame_pool().grab(self.path)
+            icon = ingest_icon(data) if data else None
+        if icon:
+            # The relay lives as long as the application, so it is safe to
+            # emit on from here; the write happens on its thread.
+            self.icons._ingested.emit(self.directory_id, icon)
 
 
-class FileListWidget(QtWidgets.QListWidget):
-    def startDrag(self, actions: QtCore.Qt.DropActions) -> None:
-        items = self.selectedItems()
-        if not items:
-            return
-        item = items[0]
-        path = item.data(QtCore.Qt.UserRole + 1)
-        if not path:
-            super().startDrag(actions)
-            return
-        drag = QtGui.QDrag(self)
-        mime = QtCore.QMimeData()
-        mime.setText(path)
-        mime.setUrls([QtCore.QUrl.fromLocalFile(path)])
-        drag.setMimeData(mime)
-        widget = self.itemWidget(item)
-        if widget:
-            pixmap = widget.grab()
-            if not pixmap.isNull():
-                drag.setPixmap(pixmap)
-        drag.exec(QtCore.Qt.CopyAction)
+class _SelectionIcons(QtCore.QObject):
+    """Sets directory icons from selected files, off the GUI thread.
+
+    Video frames come from a helper process that may take up to its
+    timeout to answer. The icon is ingested on the global thread pool and
+    written through the database worker whether or not the page that asked
+    for it is still open; applied tells open pages to refresh.
+    """
+
+    applied = QtCore.Signal(str)
+
+    _ingested = QtCore.Signal(str, object)
+
+    def __init__(self):
+        super().__init__()
+        self._ingested.connect(self._write)
+
+    def set_from_file(self, directory_id, path, is_image):
+        QtCore.QThreadPool.globalInstance().start(
+            _SelectionIconJob(self, directory_id, path, is_image)
+        )
+
+    def _write(self, directory_id, icon):
+        icon_data, source_hash = icon
+        database_worker().write(
+            set_jd_directory_icon, directory_id, icon_data, source_hash
+        ).then(lambda _result: self.applied.emit(directory_id))
+
+
+def selection_icons():
+    """Return the application's _SelectionIcons, creating it on first use."""
+    global _selection_icons
+    if _selection_icons is None:
+        _selection_icons = _SelectionIcons()
+    return _selection_icons
+
 
 class JdDirectoryPage(QtWidgets.QWidget):
     def __init__(
@@ -173,16 +154,16 @@ class JdDirectoryPage(QtWidgets.QWidget):
         self.remove_tag_overlay = None
         self.ext_tag_overlay = None
         self.directory_overlay = None
-
-        self._pending_thumbnails: deque[
-            tuple[weakref.ReferenceType[QtWidgets.QLabel], str]
-        ] = deque()
-        self._thumb_pool = QtCore.QThreadPool()
-        self._thumb_pool.setMaxThreadCount(1)
-
-        xdg_cache_home = os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
-        self.thumb_cache_dir = os.path.join(xdg_cache_home, "jdbrowser")
-        os.makedirs(self.thumb_cache_dir, exist_ok=True)
+        self.global_search_overlay = None
+        self._item_future = None
+
+        self.thumbnails = ThumbnailScheduler(
+            self._thumbnail_for_path,
+            probe=self._cached_thumbnails,
+            visible=self._visible_thumbnail_paths,
+            parent=self,
+        )
+        selection_icons().applied.connect(self._selection_icon_applied)
 
         self.in_search_mode = False
         self.prev_selected_is_directory = False
@@ -193,11 +174,28 @@ class JdDirectoryPage(QtWidgets.QWidget):
 
         self.section_bounds: list[tuple[int, int]] = []
 
-        self._editing_markdown_item: QtWidgets.QListWidgetItem | None = None
+        self._editing_markdown_item: QtCore.QPersistentModelIndex | None = None
 
-        self._thumbs_started = False
         self._consume_list_events = False
 
+        # Watch the listed folder so changes made outside the page show up
+        # too. Changes are debounced and applied as a row diff.
+        self._listed_path: str | None = None
+        self._snapshot: DirectorySnapshot | None = None
+        # True until control returns to the event loop after the snapshot
+        # was taken; see _directory_snapshot().
+        self._snapshot_current = False
+        # Folders with a scan queued on the database worker.
+        self._pending_scans: set[str] = set()
+        self._fs_watcher = QtCore.QFileSystemWatcher(self)
+        self._fs_watcher.directoryChanged.connect(self._directory_changed)
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(REFRESH_DEBOUNCE_MS)
+        self._refresh_timer.timeout.connect(self._refresh_after_change)
+        # Set when a change arrived while the list could not be refreshed.
+        self._refresh_pending = False
+
         self._setup_ui()
         self._setup_shortcuts()
         self.set_selection(0)
@@ -233,15 +231,13 @@ class JdDirectoryPage(QtWidgets.QWidget):
 
     def showEvent(self, event):
         super().showEvent(event)
-        if not self._thumbs_started:
-            self._thumbs_started = True
-            QtCore.QTimer.singleShot(0, self._start_pending_thumbnails)
+        self.thumbnails.start()
 
     # DirectoryItem expects a set_selection method on its page
     def set_selection(self, index):
         if index == 0:
             # Deselect any file items so only the directory entry is selected
-            self.file_list.setCurrentItem(None)
+            self.file_list.setCurrentRow(-1)
             self.file_list.clearSelection()
         self.item.isSelected = index == 0
         self.item.updateStyle()
@@ -350,6 +346,9 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if row:
             folder = self._format_order(order)
             crumb = folder
+            # Bring the file index, and with it the search index's file and
+            # note rows, up to date for this folder.
+            self._queue_scan(folder)
         else:
             folder = self.directory_id
             crumb = folder
@@ -359,7 +358,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
         layout.addWidget(self.breadcrumb_bar)
 
         cursor.execute(
-            "SELECT icon FROM state_jd_directory_icons WHERE directory_id = ?",
+            "SELECT b.data FROM state_jd_directory_icons i JOIN blobs b ON b.hash = i.icon_hash "
+            "WHERE i.directory_id = ?",
             (self.directory_id,),
         )
         row = cursor.fetchone()
@@ -367,23 +367,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if icon_data is None:
             icon_data = self._fallback_icon(order)
 
-        cursor.execute(
-            """
-            SELECT dt.tag_id,
-                   COALESCE(ext.label, id.label, area.label) AS label,
-                   COALESCE(ext.[order], id.[order], area.[order]) AS [order],
-                   COALESCE(ext.parent_uuid, id.parent_uuid) AS parent_uuid
-            FROM state_jd_directory_tags dt
-            LEFT JOIN state_jd_ext_tags ext ON dt.tag_id = ext.tag_id
-            LEFT JOIN state_jd_id_tags id ON dt.tag_id = id.tag_id
-            LEFT JOIN state_jd_area_tags area ON dt.tag_id = area.tag_id
-            WHERE dt.directory_id = ?
-            ORDER BY [order]
-            """,
-            (self.directory_id,),
-        )
-        tag_rows = cursor.fetchall()
-        tags = [tuple(t) for t in tag_rows]
+        tags = load_directory_tags(self.conn, [self.directory_id])[self.directory_id]
 
         self.item = DirectoryItem(
             self.directory_id, label, order, icon_data, self, 0, tags
@@ -416,16 +400,19 @@ class JdDirectoryPage(QtWidgets.QWidget):
         layout.addWidget(self.item)
 
         # List of files within the directory
-        self.file_list = FileListWidget()
+        self.file_list = FileListView()
+        self.file_model = self.file_list.file_model
+        self.file_model.thumbnailRequested.connect(self.thumbnails.request)
+        self.thumbnails.loaded.connect(self.file_model.set_thumbnail)
         self.file_list.setDragEnabled(True)
         self.file_list.setIconSize(QtCore.QSize(120, 75))
         self.file_list.setMouseTracking(True)
         self.file_list.setStyleSheet(
-            "QListWidget{background-color: transparent; border: none;}"
-            "QListWidget::item{background-color: transparent; border: none; border-radius: 5px;}"
-            f"QListWidget::item:hover{{background-color: {HOVER_COLOR};}}"
-            f"QListWidget::item:selected{{background-color: {HIGHLIGHT_COLOR};}}"
-            f"QListWidget::item:selected:hover{{background-color: {HIGHLIGHT_COLOR};}}"
+            "QListView{background-color: transparent; border: none;}"
+            "QListView::item{background-color: transparent; border: none; border-radius: 5px;}"
+            f"QListView::item:hover{{background-color: {HOVER_COLOR};}}"
+            f"QListView::item:selected{{background-color: {HIGHLIGHT_COLOR};}}"
+            f"QListView::item:selected:hover{{background-color: {HIGHLIGHT_COLOR};}}"
         )
         self.file_list.setSpacing(2)
         self.file_list.setVerticalScrollMode(
@@ -434,9 +421,11 @@ class JdDirectoryPage(QtWidgets.QWidget):
         self.file_list.setSelectionMode(
             QtWidgets.QAbstractItemView.SingleSelection
         )
-        self.file_list.currentItemChanged.connect(self._file_selection_changed)
+        self.file_list.selectionModel().currentChanged.connect(
+            self._file_selection_changed
+        )
         # Double-click behaves like Enter on the selected item
-        self.file_list.itemDoubleClicked.connect(lambda _item: self._enter_selected())
+        self.file_list.doubleClicked.connect(lambda _index: self._enter_selected())
         layout.addWidget(self.file_list)
 
         self.base_path = os.path.join(self.repository_path, folder)
@@ -462,99 +451,149 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return
         event.ignore()
 
-    def _strip_prefix(self, text: str) -> str:
-        return re.sub(r"^\[[^\]]*\]\s*", "", text).strip()
+    def _directory_snapshot(self) -> DirectorySnapshot:
+        """Return the listing of the current folder.
 
-    def _populate_files(self) -> None:
+        Every method that needs the folder's contents shares one snapshot
+        until the folder's mtime changes. A new snapshot comes from the file
+        index when the folder is unchanged since it was last scanned;
+        otherwise it is read from disk and the folder is rescanned in the
+        background.
+
+        Right after a change the snapshot is stale for RACY_NS whatever the
+        mtime says, so within that window it is still shared by the calls
+        of one event-loop turn rather than taken again for each.
+        """
         path = self.current_path
-        if not os.path.isdir(path):
-            return
-        entries = sorted(os.listdir(path), key=lambda x: x.lower())
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and snapshot.path == path
+            and (self._snapshot_current or not snapshot.is_stale())
+        ):
+            return snapshot
+        snapshot = list_directory(self.conn, self.repository_path, path)
+        if snapshot is None:
+            snapshot = DirectorySnapshot.scan(path)
+            rel = relative_path(self.repository_path, path)
+            if rel is not None and snapshot.mtime_ns is not None:
+                self._queue_scan(rel)
+        self._snapshot = snapshot
+        if not self._snapshot_current:
+            self._snapshot_current = True
+            QtCore.QTimer.singleShot(0, self._end_snapshot_turn)
+        return snapshot
+
+    def _end_snapshot_turn(self) -> None:
+        self._snapshot_current = False
+
+    def _queue_scan(self, rel: str) -> None:
+        """Rescan rel in the background unless a scan of it is already queued."""
+        if rel in self._pending_scans:
+            return
+        self._pending_scans.add(rel)
+
+        def failed(error):
+            self._pending_scans.discard(rel)
+            traceback.print_exception(error)
+
+        database_worker().write(scan_repository, self.repository_path, rel).then(
+            lambda _result: self._pending_scans.discard(rel), failed
+        )
+
+    def _row_keys(self, snapshot: DirectorySnapshot) -> list[tuple]:
+        """Return the keys of the rows listing snapshot, in display order."""
+        keys = []
+        for name, is_dir in snapshot.entries:
+            if is_dir:
+                keys.append(("dir", name))
+            elif name.lower().endswith(".2do"):
+                keys.append(("header", name))
+            else:
+                keys.append(("file", name))
+                base_name, ext = os.path.splitext(name)
+                if ext.lower() == ".md" and "#inline" in base_name.lower():
+                    # The mtime is part of the key so an edited note is
+                    # re-rendered.
+                    st = snapshot.stat(name)
+                    keys.append(("markdown", name, st.st_mtime_ns if st else None))
+        return keys
+
+    def _add_row_widgets(self, rows) -> None:
+        """Create the inline markdown previews among rows."""
+        for row in rows:
+            key = self.file_model.key(row)
+            if key is not None and key[0] == "markdown":
+                widget = self._create_markdown_widget(self.file_model.full_path(key[1]))
+                self.file_list.set_row_widget(row, widget)
+
+    def _update_section_bounds(self) -> None:
         self.section_bounds = []
         current_start = None
         last_file_index = None
-        for name in entries:
-            full_path = os.path.abspath(os.path.join(path, name))
-            if os.path.isdir(full_path):
-                widget = self._create_file_row(full_path, name, is_dir=True)
-                item = QtWidgets.QListWidgetItem(self.file_list)
-                item.setSizeHint(widget.sizeHint())
-                item.setData(QtCore.Qt.UserRole, name)
-                item.setData(QtCore.Qt.UserRole + 1, full_path)
-                item.setData(QtCore.Qt.UserRole + 2, "dir")
-                item.setFlags(item.flags() | QtCore.Qt.ItemIsDragEnabled)
-                self.file_list.addItem(item)
-                self.file_list.setItemWidget(item, widget)
-                if current_start is None:
-                    current_start = self.file_list.count() - 1
-                last_file_index = self.file_list.count() - 1
-                continue
-            if os.path.isfile(full_path) and name.lower().endswith(".2do"):
+        for row in range(self.file_list.count()):
+            if self._is_header_row(row):
                 if current_start is not None and last_file_index is not None:
                     self.section_bounds.append((current_start, last_file_index))
                     current_start = None
                     last_file_index = None
-                label = self._strip_prefix(os.path.splitext(name)[0])
-                header = QtWidgets.QLabel(label)
-                header.setAlignment(
-                    QtCore.Qt.AlignmentFlag.AlignLeft
-                    | QtCore.Qt.AlignmentFlag.AlignVCenter
-                )
-                font = header.font()
-                font.setPointSize(int(font.pointSize() * 0.75))
-                font.setBold(True)
-                header.setFont(font)
-                header.setStyleSheet(
-                    f"background-color: {BUTTON_COLOR}; color: black; padding-left:5px; padding-right:5px;"
-                )
-                header.setSizePolicy(
-                    QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed
-                )
-                item = QtWidgets.QListWidgetItem(self.file_list)
-                item.setSizeHint(header.sizeHint())
-                item.setFlags(QtCore.Qt.ItemIsEnabled)
-                item.setData(QtCore.Qt.UserRole, "header")
-                self.file_list.addItem(item)
-                self.file_list.setItemWidget(item, header)
-                continue
-            if not os.path.isfile(full_path):
                 continue
-            widget = self._create_file_row(full_path, name)
-            item = QtWidgets.QListWidgetItem(self.file_list)
-            item.setSizeHint(widget.sizeHint())
-            item.setData(QtCore.Qt.UserRole, name)
-            item.setData(QtCore.Qt.UserRole + 1, full_path)
-            item.setData(QtCore.Qt.UserRole + 2, "file")
-            item.setFlags(item.flags() | QtCore.Qt.ItemIsDragEnabled)
-            self.file_list.addItem(item)
-            self.file_list.setItemWidget(item, widget)
             if current_start is None:
-                current_start = self.file_list.count() - 1
-            last_file_index = self.file_list.count() - 1
-            base_name, ext = os.path.splitext(name)
-            if ext.lower() == ".md" and "#inline" in base_name.lower():
-                md_widget = self._create_markdown_widget(full_path)
-                md_item = QtWidgets.QListWidgetItem(self.file_list)
-                md_item.setSizeHint(md_widget.sizeHint())
-                md_item.setFlags(
-                    QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
-                )
-                md_item.setData(QtCore.Qt.UserRole, "markdown")
-                md_item.setData(QtCore.Qt.UserRole + 1, full_path)
-                self.file_list.addItem(md_item)
-                self.file_list.setItemWidget(md_item, md_widget)
-                last_file_index = self.file_list.count() - 1
+                current_start = row
+            last_file_index = row
         if current_start is not None and last_file_index is not None:
             self.section_bounds.append((current_start, last_file_index))
 
+    def _watch_directory(self, path: str | None) -> None:
+        watched = self._fs_watcher.directories()
+        if watched == ([path] if path else []):
+            return
+        if watched:
+            self._fs_watcher.removePaths(watched)
+        if path:
+            self._fs_watcher.addPath(path)
+
+    def _directory_changed(self, _path: str) -> None:
+        # Restarting the timer on every change is the debounce.
+        self._refresh_timer.start()
+
+    def _refresh_after_change(self) -> None:
+        # Row numbers must not move under an open editor or search matches;
+        # the refresh is left for when those are done.
+        if self._editing_markdown_item is not None or self.in_search_mode:
+            self._refresh_pending = True
+            return
+        self.refresh_file_list()
+
+    def _refresh_if_pending(self) -> None:
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self.refresh_file_list()
+
+    def _populate_files(self) -> None:
+        path = self.current_path
+        snapshot = self._directory_snapshot()
+        if snapshot.mtime_ns is None:
+            return
+        self.file_model.set_rows(path, self._row_keys(snapshot))
+        self._add_row_widgets(range(self.file_list.count()))
+        self._update_section_bounds()
+        self._listed_path = path
+        self._watch_directory(path)
+
     def refresh_file_list(self, keep_scroll: bool = True) -> None:
+        """Bring the list up to date with the current folder.
+
+        Within the same folder only the rows that changed are replaced, so
+        the selection and scroll position carry over. After navigating to
+        another folder the list is rebuilt.
+        """
         scrollbar = self.file_list.verticalScrollBar()
         scroll_pos = scrollbar.value() if keep_scroll else None
 
         current_name = None
-        current_item = self.file_list.currentItem()
-        if current_item is not None:
-            # Prefer the stored item data when available
+        current_item = self.file_list.currentIndex()
+        if current_item.isValid():
             role0 = current_item.data(QtCore.Qt.UserRole)
             if (
                 role0
@@ -562,30 +601,33 @@ class JdDirectoryPage(QtWidgets.QWidget):
                 and role0 not in {"header", "markdown"}
             ):
                 current_name = role0
-            else:
-                # Fall back to reading from the row widget defensively
-                widget = self.file_list.itemWidget(current_item)
-                if widget is not None and widget.layout() is not None:
-                    item1 = widget.layout().itemAt(1)
-                    if item1 is not None:
-                        w = item1.widget()
-                        if isinstance(w, QtWidgets.QLabel):
-                            current_name = w.text()
 
         path = self.current_path
-        if not os.path.isdir(path):
-            self.file_list.clear()
+        snapshot = self._directory_snapshot()
+        if snapshot.mtime_ns is None:
+            self.thumbnails.clear()
+            self.file_model.set_rows(path, [])
+            self.section_bounds = []
+            self._listed_path = None
+            self._watch_directory(None)
             return
 
-        entries = sorted(os.listdir(path), key=lambda x: x.lower())
+        keys = self._row_keys(snapshot)
 
-        self.file_list.clear()
-        self.section_bounds = []
-        self._pending_thumbnails = deque()
-        self._thumb_pool.clear()
-        current_start = None
-        last_file_index = None
-        non_header_names = [n for n in entries if not n.lower().endswith('.2do')]
+        if path == self._listed_path:
+            self._add_row_widgets(self.file_model.apply_keys(keys))
+            self.thumbnails.retain(
+                self.file_model.full_path(key[1]) for key in keys if key[0] == "file"
+            )
+        else:
+            self.thumbnails.clear()
+            self.file_model.set_rows(path, keys)
+            self._add_row_widgets(range(self.file_list.count()))
+            self._listed_path = path
+            self._watch_directory(path)
+        self._update_section_bounds()
+
+        non_header_names = [key[1] for key in keys if key[0] in ("dir", "file")]
         target_name = None
         if current_name:
             if current_name in non_header_names:
@@ -597,96 +639,23 @@ class JdDirectoryPage(QtWidgets.QWidget):
                     else:
                         break
         target_row = None
-        for name in entries:
-            full_path = os.path.abspath(os.path.join(path, name))
-            if os.path.isdir(full_path):
-                widget = self._create_file_row(full_path, name, is_dir=True)
-                item = QtWidgets.QListWidgetItem(self.file_list)
-                item.setSizeHint(widget.sizeHint())
-                item.setData(QtCore.Qt.UserRole, name)
-                item.setData(QtCore.Qt.UserRole + 1, full_path)
-                item.setData(QtCore.Qt.UserRole + 2, "dir")
-                item.setFlags(item.flags() | QtCore.Qt.ItemIsDragEnabled)
-                self.file_list.addItem(item)
-                self.file_list.setItemWidget(item, widget)
-                if current_start is None:
-                    current_start = self.file_list.count() - 1
-                last_file_index = self.file_list.count() - 1
-                if target_name is not None and name == target_name:
-                    target_row = self.file_list.count() - 1
-                continue
-            if os.path.isfile(full_path) and name.lower().endswith('.2do'):
-                if current_start is not None and last_file_index is not None:
-                    self.section_bounds.append((current_start, last_file_index))
-                    current_start = None
-                    last_file_index = None
-                label = self._strip_prefix(os.path.splitext(name)[0])
-                header = QtWidgets.QLabel(label)
-                header.setAlignment(
-                    QtCore.Qt.AlignmentFlag.AlignLeft
-                    | QtCore.Qt.AlignmentFlag.AlignVCenter
-                )
-                font = header.font()
-                font.setPointSize(int(font.pointSize() * 0.75))
-                font.setBold(True)
-                header.setFont(font)
-                header.setStyleSheet(
-                    f"background-color: {BUTTON_COLOR}; color: black; padding-left:5px; padding-right:5px;"
-                )
-                header.setSizePolicy(
-                    QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed
-                )
-                item = QtWidgets.QListWidgetItem(self.file_list)
-                item.setSizeHint(header.sizeHint())
-                item.setFlags(QtCore.Qt.ItemIsEnabled)
-                item.setData(QtCore.Qt.UserRole, 'header')
-                self.file_list.addItem(item)
-                self.file_list.setItemWidget(item, header)
-                continue
-            if not os.path.isfile(full_path):
-                continue
-            widget = self._create_file_row(full_path, name)
-            item = QtWidgets.QListWidgetItem(self.file_list)
-            item.setSizeHint(widget.sizeHint())
-            item.setData(QtCore.Qt.UserRole, name)
-            item.setData(QtCore.Qt.UserRole + 1, full_path)
-            item.setData(QtCore.Qt.UserRole + 2, "file")
-            item.setFlags(item.flags() | QtCore.Qt.ItemIsDragEnabled)
-            self.file_list.addItem(item)
-            self.file_list.setItemWidget(item, widget)
-            if current_start is None:
-                current_start = self.file_list.count() - 1
-            last_file_index = self.file_list.count() - 1
-            if target_name is not None and name == target_name:
-                target_row = self.file_list.count() - 1
-            base_name, ext = os.path.splitext(name)
-            if ext.lower() == '.md' and '#inline' in base_name.lower():
-                md_widget = self._create_markdown_widget(full_path)
-                md_item = QtWidgets.QListWidgetItem(self.file_list)
-                md_item.setSizeHint(md_widget.sizeHint())
-                md_item.setFlags(
-                    QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
-                )
-                md_item.setData(QtCore.Qt.UserRole, 'markdown')
-                md_item.setData(QtCore.Qt.UserRole + 1, full_path)
-                self.file_list.addItem(md_item)
-                self.file_list.setItemWidget(md_item, md_widget)
-                last_file_index = self.file_list.count() - 1
-        if current_start is not None and last_file_index is not None:
-            self.section_bounds.append((current_start, last_file_index))
+        if target_name is not None:
+            for row, key in enumerate(self.file_model.keys()):
+                if key[:2] in (("dir", target_name), ("file", target_name)):
+                    target_row = row
+                    break
 
         if target_row is not None:
             self.file_list.setCurrentRow(target_row)
         else:
-            self.file_list.setCurrentItem(None)
+            self.file_list.setCurrentRow(-1)
 
         if keep_scroll and scroll_pos is not None:
             QtCore.QTimer.singleShot(0, lambda: scrollbar.setValue(scroll_pos))
-        QtCore.QTimer.singleShot(0, self._start_pending_thumbnails)
 
     def _is_header_row(self, row: int) -> bool:
-        item = self.file_list.item(row)
-        return bool(item and item.data(QtCore.Qt.UserRole) == "header")
+        key = self.file_model.key(row)
+        return bool(key and key[0] == "header")
 
     def _next_non_header_index(self, start: int, step: int) -> int | None:
         count = self.file_list.count()
@@ -697,55 +666,6 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return idx
         return None
 
-    def _create_file_row(
-        self, path: str, name: str, is_dir: bool = False
-    ) -> QtWidgets.QWidget:
-        row = QtWidgets.QWidget()
-        row.setSizePolicy(
-            QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed
-        )
-        row.setStyleSheet("background-color: transparent;")
-        layout = QtWidgets.QHBoxLayout(row)
-        layout.setContentsMargins(0, 2, 0, 2)
-        layout.setSpacing(10)
-
-        icon_label = QtWidgets.QLabel()
-        icon_label.setFixedSize(120, 75)
-        icon_label.setStyleSheet("border: none; border-radius: 10px;")
-        ext = os.path.splitext(name)[1].lower() if not is_dir else ""
-        if not is_dir and ext in THUMBNAIL_EXTS:
-            placeholder = QtGui.QPixmap(120, 75)
-            placeholder.fill(QtGui.QColor(SLATE_COLOR))
-            icon_label.setPixmap(placeholder)
-            self._pending_thumbnails.append((weakref.ref(icon_label), path))
-        else:
-            char = "\uf07b" if is_dir else self._icon_for_extension(ext)
-            pixmap = QtGui.QPixmap(120, 75)
-            pixmap.fill(QtGui.QColor(SLATE_COLOR))
-            painter = QtGui.QPainter(pixmap)
-            painter.setRenderHint(QtGui.QPainter.Antialiasing)
-            font = QtGui.QFont("FiraCode Nerd Font", 48)
-            painter.setFont(font)
-            painter.setPen(QtGui.QColor(TEXT_COLOR))
-            painter.drawText(pixmap.rect(), QtCore.Qt.AlignmentFlag.AlignCenter, char)
-            painter.end()
-            icon_label.setPixmap(self._rounded_pixmap(pixmap))
-        layout.addWidget(icon_label)
-
-        label = QtWidgets.QLabel(name)
-        label.setAlignment(
-            QtCore.Qt.AlignmentFlag.AlignVCenter | QtCore.Qt.AlignmentFlag.AlignLeft
-        )
-        color = TAG_COLOR if is_dir else TEXT_COLOR
-        if self._parse_prefix(name)[0] is None:
-            color = DELETE_BUTTON_COLOR
-        label.setStyleSheet(f"color: {color};")
-        label.setSizePolicy(
-            QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred
-        )
-        layout.addWidget(label, 1)
-        return row
-
     def _create_markdown_widget(self, path: str) -> QtWidgets.QWidget:
         text = ""
         try:
@@ -761,32 +681,13 @@ class JdDirectoryPage(QtWidgets.QWidget):
         def repl(m):
             code = f"{m.group(1)}.{m.group(2)}+{m.group(3)}"
             explicit_label = m.group(4).strip() if m.group(4) else None
-            jd_area = int(m.group(1))
-            jd_id = int(m.group(2))
-            jd_ext = int(m.group(3))
             cursor = self.conn.cursor()
-            label = None
             cursor.execute(
-                "SELECT tag_id FROM state_jd_area_tags WHERE [order] = ?",
-                (jd_area,),
+                "SELECT label FROM state_jd_tag_paths WHERE code = ?",
+                (code,),
             )
             row = cursor.fetchone()
-            if row:
-                area_tag = row[0]
-                cursor.execute(
-                    "SELECT tag_id FROM state_jd_id_tags WHERE parent_uuid IS ? AND [order] = ?",
-                    (area_tag, jd_id),
-                )
-                row = cursor.fetchone()
-                if row:
-                    id_tag = row[0]
-                    cursor.execute(
-                        "SELECT label FROM state_jd_ext_tags WHERE parent_uuid IS ? AND [order] = ?",
-                        (id_tag, jd_ext),
-                    )
-                    row = cursor.fetchone()
-                    if row and row[0]:
-                        label = row[0]
+            label = row[0] if row and row[0] else None
             link_text = explicit_label if explicit_label else (label if label else code)
             # Escape closing bracket in markdown link text if present
             link_text = link_text.replace(']', r'\]')
@@ -896,29 +797,13 @@ class JdDirectoryPage(QtWidgets.QWidget):
         jd_ext = int(m.group(3))
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT tag_id FROM state_jd_area_tags WHERE [order] = ?",
-            (jd_area,),
+            "SELECT tag_id, id_uuid, area_uuid FROM state_jd_tag_paths WHERE code = ?",
+            (f"{jd_area:02d}.{jd_id:02d}+{jd_ext:04d}",),
         )
         row = cursor.fetchone()
         if not row:
             return
-        area_tag = row[0]
-        cursor.execute(
-            "SELECT tag_id FROM state_jd_id_tags WHERE parent_uuid IS ? AND [order] = ?",
-            (area_tag, jd_id),
-        )
-        row = cursor.fetchone()
-        if not row:
-            return
-        id_tag = row[0]
-        cursor.execute(
-            "SELECT tag_id FROM state_jd_ext_tags WHERE parent_uuid IS ? AND [order] = ?",
-            (id_tag, jd_ext),
-        )
-        row = cursor.fetchone()
-        if not row:
-            return
-        ext_tag = row[0]
+        ext_tag, id_tag, area_tag = row
         from .jd_directory_list_page import JdDirectoryListPage
         new_page = JdDirectoryListPage(
             parent_uuid=ext_tag,
@@ -955,130 +840,64 @@ class JdDirectoryPage(QtWidgets.QWidget):
         new_page = JdDirectoryPage(directory_id)
         jdbrowser.navigate_to(new_page)
 
-    def _icon_for_extension(self, ext: str) -> str:
-        return FILE_TYPE_ICONS.get(ext, DEFAULT_FILE_ICON)
-
-    def _rounded_pixmap(self, pixmap: QtGui.QPixmap) -> QtGui.QPixmap:
-        if pixmap.isNull():
-            return pixmap
-        scaled = pixmap.scaled(
-            120,
-            75,
-            QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-            QtCore.Qt.TransformationMode.SmoothTransformation,
-        )
-        rounded = QtGui.QPixmap(120, 75)
-        rounded.fill(QtCore.Qt.transparent)
-        painter = QtGui.QPainter(rounded)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
-        path = QtGui.QPainterPath()
-        path.addRoundedRect(0, 0, 120, 75, 10, 10)
-        painter.setClipPath(path)
-        painter.drawPixmap(
-            (120 - scaled.width()) // 2,
-            (75 - scaled.height()) // 2,
-            scaled,
-        )
-        painter.end()
-        return rounded
-
-    def _scale_crop_pixmap(
-        self, pixmap: QtGui.QPixmap, width: int = 480, height: int = 300
-    ) -> QtGui.QPixmap:
-        if pixmap.isNull():
-            return pixmap
-        scaled = pixmap.scaled(
-            width,
-            height,
-            QtCore.Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-            QtCore.Qt.TransformationMode.SmoothTransformation,
-        )
-        x = (scaled.width() - width) // 2
-        y = (scaled.height() - height) // 2
-        return scaled.copy(x, y, width, height)
-
-    def _video_thumbnail(
-        self, path: str, rounded: bool = True
-    ) -> QtGui.QPixmap | None:
-        player = QtMultimedia.QMediaPlayer()
-        sink = QtMultimedia.QVideoSink()
-        player.setVideoSink(sink)
-        thumb = {"pixmap": None}
-
-        def handle_frame(frame: QtMultimedia.QVideoFrame):
-            if frame.isValid() and thumb["pixmap"] is None:
-                image = frame.toImage()
-                pix = QtGui.QPixmap.fromImage(image)
-                thumb["pixmap"] = (
-                    self._rounded_pixmap(pix) if rounded else pix
-                )
-                player.stop()
-
-        sink.videoFrameChanged.connect(handle_frame)
-        with _capture_ffmpeg_output() as cap:
-            player.setSource(QtCore.QUrl.fromLocalFile(path))
-            player.play()
-
-            loop = QtCore.QEventLoop()
-            sink.videoFrameChanged.connect(loop.quit)
-            QtCore.QTimer.singleShot(1000, loop.quit)
-            loop.exec()
-            player.stop()
-            if player.error() != QtMultimedia.QMediaPlayer.NoError:
-                cap.seek(0)
-                msg = cap.read().decode(errors="ignore")
-                if msg:
-                    print(msg)
-                print(
-                    f"Error generating thumbnail for {path}: {player.errorString()}"
-                )
-                return None
-        return thumb["pixmap"]
-
-    def _thumbnail_for_path(self, path: str) -> QtGui.QPixmap | None:
+    def _video_thumbnail(self, path: str) -> QtGui.QImage | None:
+        # Grabbed in a helper process; see video_frame_worker.
+        data = video_frame_pool().grab(path)
+        if data is None:
+            return None
+        image = QtGui.QImage.fromData(data)
+        if image.isNull():
+            return None
+        return image
+
+    def _cached_thumbnails(self, paths: list[str]) -> dict[str, QtGui.QImage]:
+        """Return the thumbnails of paths found in the cache, in one lookup."""
+        keys = {}
+        for path in paths:
+            key = cache_key(path)
+            if key is not None:
+                keys[key] = path
+        images = {}
+        cached = thumbnail_cache().get_many(keys, ICON_WIDTH, ICON_HEIGHT)
+        for key, data in cached.items():
+            # Stored as the finished tile, so it is drawn as decoded.
+            image = QtGui.QImage.fromData(data)
+            if not image.isNull():
+                images[keys[key]] = image
+        return images
+
+    def _thumbnail_for_path(self, path: str) -> QtGui.QImage | None:
+        """Make the thumbnail of path and add it to the cache."""
         ext = os.path.splitext(path)[1].lower()
         if ext not in THUMBNAIL_EXTS:
             return None
-        try:
-            mtime = os.path.getmtime(path)
-        except OSError:
+        # Taken before reading the file, so a change made meanwhile leaves
+        # the entry under a key that no longer matches.
+        key = cache_key(path)
+        if key is None:
             return None
-        key = f"{os.path.abspath(path)}:{mtime}"
-        digest = hashlib.sha256(key.encode()).hexdigest()
-        cache_path = os.path.join(self.thumb_cache_dir, f"{digest}.png")
-        cached = QtGui.QPixmap(cache_path)
-        if not cached.isNull():
-            return self._rounded_pixmap(cached)
         if ext in {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}:
-            pixmap = QtGui.QPixmap(path)
-            if pixmap.isNull():
+            image = read_image(path, ICON_WIDTH, ICON_HEIGHT, crop=True)
+            if image.isNull():
                 if ext == ".webp":
-                    pixmap = self._video_thumbnail(path, rounded=False)
+                    image = self._video_thumbnail(path)
                 else:
                     return None
         else:
-            pixmap = self._video_thumbnail(path, rounded=False)
-            if pixmap is None:
-                return None
-        pixmap = self._scale_crop_pixmap(pixmap)
-        pixmap.save(cache_path, "PNG")
-        return self._rounded_pixmap(pixmap)
-
-    def _load_thumbnail_async(
-        self, label: QtWidgets.QLabel, path: str
-    ) -> None:
-        runnable = ThumbnailLoader(self, label, path)
-        self._thumb_pool.start(runnable)
-
-    def _start_pending_thumbnails(self) -> None:
-        if not self._pending_thumbnails:
-            return
-        label_ref, path = self._pending_thumbnails.popleft()
-        label = label_ref()
-        if label and isValid(label):
-            self._load_thumbnail_async(label, path)
-        if self._pending_thumbnails:
-            QtCore.QTimer.singleShot(0, self._start_pending_thumbnails)
+            image = self._video_thumbnail(path)
+        if image is None:
+            return None
+        tile = render_tile(image, ICON_WIDTH, ICON_HEIGHT, THUMBNAIL_RADIUS, crop=True)
+        thumbnail_cache().put(key, ICON_WIDTH, ICON_HEIGHT, path, encode_tile(tile))
+        return tile
+
+    def _visible_thumbnail_paths(self) -> list[str]:
+        paths = []
+        for row in self.file_list.visible_rows():
+            key = self.file_model.key(row)
+            if key is not None and key[0] == "file":
+                paths.append(self.file_model.full_path(key[1]))
+        return paths
 
     def _open_terminal(self) -> None:
         path = self.current_path
@@ -1091,8 +910,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
             QtCore.QProcess.startDetached("thunar", [path])
 
     def _enter_selected(self) -> None:
-        item = self.file_list.currentItem()
-        if not item:
+        item = self.file_list.currentIndex()
+        if not item.isValid():
             return
         if self._current_item_is_directory():
             name = item.data(QtCore.Qt.UserRole)
@@ -1113,8 +932,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
             path = self.current_path
             QtCore.QProcess.startDetached("prev", [path])
             return
-        item = self.file_list.currentItem()
-        if not item:
+        item = self.file_list.currentIndex()
+        if not item.isValid():
             return
         path = item.data(QtCore.Qt.UserRole + 1)
         if not path:
@@ -1147,8 +966,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
     def _toggle_archive_file(self) -> None:
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item or self._current_item_is_directory():
+        item = self.file_list.currentIndex()
+        if not item.isValid() or self._current_item_is_directory():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -1177,8 +996,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
     def _set_thumbnail_from_selection(self) -> None:
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item or self._current_item_is_directory():
+        item = self.file_list.currentIndex()
+        if not item.isValid() or self._current_item_is_directory():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -1187,30 +1006,11 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if ext not in THUMBNAIL_EXTS:
             return
         path = os.path.join(self.current_path, name)
-        icon_data = None
-        if ext in {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}:
-            try:
-                with open(path, "rb") as f:
-                    icon_data = f.read()
-            except OSError:
-                return
-        else:
-            pixmap = self._video_thumbnail(path, rounded=False)
-            if pixmap and not pixmap.isNull():
-                buffer = QtCore.QBuffer()
-                buffer.open(QtCore.QIODevice.WriteOnly)
-                pixmap.save(buffer, "PNG")
-                icon_data = bytes(buffer.data())
-        if icon_data:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_icon')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_directory_icon (event_id, directory_id, icon) VALUES (?, ?, ?)",
-                (event_id, self.directory_id, icon_data),
-            )
-            self.conn.commit()
-            rebuild_state_jd_directories(self.conn)
+        is_image = ext in {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
+        selection_icons().set_from_file(self.directory_id, path, is_image)
+
+    def _selection_icon_applied(self, directory_id: str) -> None:
+        if directory_id == self.directory_id:
             self._refresh_item()
 
     def move_selection(self, direction: int) -> None:
@@ -1231,18 +1031,16 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if index < 0 or index >= count:
             self._scroll_with_header(current, direction)
             if index < 0:
-                self.file_list.setCurrentItem(None)
+                self.file_list.setCurrentRow(-1)
             return
         index = self._next_non_header_index(index, 1 if direction > 0 else -1)
         if index is None or index == current:
             if index is None and direction < 0:
-                self.file_list.setCurrentItem(None)
+                self.file_list.setCurrentRow(-1)
             self._scroll_with_header(current, direction)
             return
         self.file_list.setCurrentRow(index)
-        item = self.file_list.item(index)
-        if item:
-            self.file_list.scrollToItem(item)
+        self.file_list.scrollTo(self.file_model.index(index))
 
     def move_selection_multiple(self, count: int) -> None:
         if self.in_search_mode or self.file_list.count() == 0:
@@ -1275,9 +1073,9 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if self._is_directory_selected():
             self.file_list.scrollToTop()
         else:
-            item = self.file_list.currentItem()
-            if item:
-                self.file_list.scrollToItem(
+            item = self.file_list.currentIndex()
+            if item.isValid():
+                self.file_list.scrollTo(
                     item, QtWidgets.QAbstractItemView.PositionAtCenter
                 )
 
@@ -1299,7 +1097,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
                         self.file_list.setCurrentRow(target)
                         self._scroll_with_header(target, -1)
                     else:
-                        self.file_list.setCurrentItem(None)
+                        self.file_list.setCurrentRow(-1)
                         self.file_list.scrollToTop()
                 break
 
@@ -1327,18 +1125,14 @@ class JdDirectoryPage(QtWidgets.QWidget):
         def _is_row_visible(r: int) -> bool:
             if r < 0 or r >= self.file_list.count():
                 return False
-            it = self.file_list.item(r)
-            if it is None:
-                return False
-            rect = self.file_list.visualItemRect(it)
+            rect = self.file_list.visualRect(self.file_model.index(r))
             return rect.isValid() and rect.intersects(self.file_list.viewport().rect())
 
         header_row = row + direction
         last_header = None
         count = self.file_list.count()
         while 0 <= header_row < count:
-            header_item = self.file_list.item(header_row)
-            if header_item and header_item.data(QtCore.Qt.UserRole) == "header":
+            if self._is_header_row(header_row):
                 last_header = header_row
                 header_row += direction
                 continue
@@ -1350,22 +1144,22 @@ class JdDirectoryPage(QtWidgets.QWidget):
                     if direction < 0
                     else QtWidgets.QAbstractItemView.PositionAtBottom
                 )
-                self.file_list.scrollToItem(self.file_list.item(last_header), position)
+                self.file_list.scrollTo(self.file_model.index(last_header), position)
         else:
             if not _is_row_visible(row):
-                self.file_list.scrollToItem(self.file_list.item(row))
+                self.file_list.scrollTo(self.file_model.index(row))
 
     def _file_selection_changed(
-        self, current: QtWidgets.QListWidgetItem | None, _prev
+        self, current: QtCore.QModelIndex, _prev: QtCore.QModelIndex
     ) -> None:
         # While editing markdown, do not allow any selection changes
         if self._editing_markdown_item is not None:
-            if current is not self._editing_markdown_item:
+            if self._editing_markdown_item != current:
                 # Restore selection to the editing item
-                self.file_list.setCurrentItem(self._editing_markdown_item)
+                self.file_list.setCurrentRow(self._editing_markdown_item.row())
             return
         if not self.in_search_mode:
-            self.item.isSelected = current is None
+            self.item.isSelected = not current.isValid()
             self.item.updateStyle()
 
     def eventFilter(self, obj: QtCore.QObject, event: QtCore.QEvent) -> bool:
@@ -1386,11 +1180,11 @@ class JdDirectoryPage(QtWidgets.QWidget):
         return super().eventFilter(obj, event)
 
     def _is_directory_selected(self) -> bool:
-        return self.file_list.currentItem() is None
+        return not self.file_list.currentIndex().isValid()
 
     def _current_item_is_directory(self) -> bool:
-        item = self.file_list.currentItem()
-        return bool(item and item.data(QtCore.Qt.UserRole + 2) == "dir")
+        item = self.file_list.currentIndex()
+        return item.isValid() and item.data(QtCore.Qt.UserRole + 2) == "dir"
 
     def _setup_search_shortcuts(self):
         for s in self.search_shortcut_instances:
@@ -1474,10 +1268,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
             self.search_input.hide()
             self.item.isDimmed = False
             self.item.updateStyle()
-            for i in range(self.file_list.count()):
-                widget = self.file_list.itemWidget(self.file_list.item(i))
-                if widget:
-                    widget.setGraphicsEffect(None)
+            self.file_model.set_dimmed(())
             if self.prev_selected_is_directory:
                 self.set_selection(0)
             elif self.prev_row >= 0:
@@ -1489,6 +1280,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
             for s in self.search_shortcut_instances:
                 s.setEnabled(False)
             self.setFocus()
+            self._refresh_if_pending()
 
     def exit_search_mode_select(self):
         if self.in_search_mode:
@@ -1496,14 +1288,11 @@ class JdDirectoryPage(QtWidgets.QWidget):
             self.search_input.hide()
             self.item.isDimmed = False
             self.item.updateStyle()
-            for i in range(self.file_list.count()):
-                widget = self.file_list.itemWidget(self.file_list.item(i))
-                if widget:
-                    widget.setGraphicsEffect(None)
+            self.file_model.set_dimmed(())
             if self.search_matches and self.current_match_idx >= 0:
                 idx = self.search_matches[self.current_match_idx]
                 self.file_list.setCurrentRow(idx)
-                self.file_list.scrollToItem(self.file_list.item(idx))
+                self.file_list.scrollTo(self.file_model.index(idx))
             elif self.prev_selected_is_directory:
                 self.set_selection(0)
             elif self.prev_row >= 0:
@@ -1515,50 +1304,46 @@ class JdDirectoryPage(QtWidgets.QWidget):
             for s in self.search_shortcut_instances:
                 s.setEnabled(False)
             self.setFocus()
+            self._refresh_if_pending()
 
     def perform_search(self, query):
         query = query.lower()
         self.search_matches = []
         self.item.isDimmed = bool(query)
         self.item.updateStyle()
-        for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            widget = self.file_list.itemWidget(item)
-            if widget:
-                widget.setGraphicsEffect(None)
-            data = item.data(QtCore.Qt.UserRole)
-            if data in {"header", "markdown"}:
+        dimmed = []
+        for i, key in enumerate(self.file_model.keys()):
+            if key[0] in {"header", "markdown"}:
                 continue
-            name = str(data).lower()
+            name = key[1].lower()
             if query and query in name:
                 self.search_matches.append(i)
-            elif query and widget:
-                effect = QtWidgets.QGraphicsOpacityEffect(widget)
-                effect.setOpacity(0.4)
-                widget.setGraphicsEffect(effect)
+            elif query:
+                dimmed.append(key[1])
+        self.file_model.set_dimmed(dimmed)
         if self.search_matches:
             self.current_match_idx = 0
             idx = self.search_matches[0]
             self.file_list.setCurrentRow(idx)
-            self.file_list.scrollToItem(self.file_list.item(idx))
+            self.file_list.scrollTo(self.file_model.index(idx))
         else:
             self.current_match_idx = -1
             if query:
-                self.file_list.setCurrentItem(None)
+                self.file_list.setCurrentRow(-1)
 
     def next_match(self):
         if self.in_search_mode and self.current_match_idx < len(self.search_matches) - 1:
             self.current_match_idx += 1
             idx = self.search_matches[self.current_match_idx]
             self.file_list.setCurrentRow(idx)
-            self.file_list.scrollToItem(self.file_list.item(idx))
+            self.file_list.scrollTo(self.file_model.index(idx))
 
     def prev_match(self):
         if self.in_search_mode and self.current_match_idx > 0:
             self.current_match_idx -= 1
             idx = self.search_matches[self.current_match_idx]
             self.file_list.setCurrentRow(idx)
-            self.file_list.scrollToItem(self.file_list.item(idx))
+            self.file_list.scrollTo(self.file_model.index(idx))
 
     def _setup_shortcuts(self):
         self.shortcuts = []
@@ -1622,6 +1407,13 @@ class JdDirectoryPage(QtWidgets.QWidget):
                 None,
                 QtCore.Qt.KeyboardModifier.ShiftModifier,
             ),
+            (
+                QtCore.Qt.Key_F,
+                self.open_global_search,
+                None,
+                QtCore.Qt.KeyboardModifier.ControlModifier
+                | QtCore.Qt.KeyboardModifier.ShiftModifier,
+            ),
             (QtCore.Qt.Key_D, self._toggle_archive_file, None),
             (QtCore.Qt.Key_Equal, self._apply_unra_prefix, (True, False)),
             (
@@ -1759,7 +1551,14 @@ class JdDirectoryPage(QtWidgets.QWidget):
         box.exec()
 
     def _refresh_item(self):
-        cursor = self.conn.cursor()
+        """Reload the directory row on the database worker and redraw it."""
+        if self._item_future is not None:
+            self._item_future.cancel()
+        self._item_future = database_worker().query(self._fetch_item)
+        self._item_future.then(self._item_loaded)
+
+    def _fetch_item(self, conn):
+        cursor = conn.cursor()
         cursor.execute(
             "SELECT label, [order] FROM state_jd_directories WHERE directory_id = ?",
             (self.directory_id,),
@@ -1768,36 +1567,27 @@ class JdDirectoryPage(QtWidgets.QWidget):
         label = row[0] if row else ""
         order = row[1] if row else 0
         cursor.execute(
-            "SELECT icon FROM state_jd_directory_icons WHERE directory_id = ?",
+            "SELECT b.data FROM state_jd_directory_icons i JOIN blobs b ON b.hash = i.icon_hash "
+            "WHERE i.directory_id = ?",
             (self.directory_id,),
         )
         row = cursor.fetchone()
         icon_data = row[0] if row else None
-        cursor.execute(
-            """
-            SELECT dt.tag_id,
-                   COALESCE(ext.label, id.label, area.label) AS label,
-                   COALESCE(ext.[order], id.[order], area.[order]) AS [order],
-                   COALESCE(ext.parent_uuid, id.parent_uuid) AS parent_uuid
-            FROM state_jd_directory_tags dt
-            LEFT JOIN state_jd_ext_tags ext ON dt.tag_id = ext.tag_id
-            LEFT JOIN state_jd_id_tags id ON dt.tag_id = id.tag_id
-            LEFT JOIN state_jd_area_tags area ON dt.tag_id = area.tag_id
-            WHERE dt.directory_id = ?
-            ORDER BY [order]
-            """,
-            (self.directory_id,),
-        )
-        tag_rows = cursor.fetchall()
-        tags = [tuple(t) for t in tag_rows]
+        tags = load_directory_tags(conn, [self.directory_id])[self.directory_id]
+        return label, order, icon_data, tags
+
+    def _item_loaded(self, row):
+        if not isValid(self) or not isValid(self.item):
+            return
+        self._item_future = None
+        label, order, icon_data, tags = row
         self.item.label_text = label
         self.item.order = order
         self.item.tags = tags
         self.item._build_tag_pills()
         self.item.updateLabel(self.show_prefix)
         if icon_data:
-            pixmap = QtGui.QPixmap()
-            pixmap.loadFromData(icon_data)
+            pixmap = icon_tile(icon_data, 240, 150, 5)
             if not pixmap.isNull():
                 if not isinstance(self.item.icon, QtWidgets.QLabel):
                     layout = self.item.layout()
@@ -1807,22 +1597,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
                     self.item.icon.mousePressEvent = self.item.mousePressEvent  # type: ignore[attr-defined]
                     self.item.icon.installEventFilter(self.item)
                     layout.insertWidget(0, self.item.icon)
-                rounded = QtGui.QPixmap(240, 150)
-                rounded.fill(QtCore.Qt.transparent)
-                painter = QtGui.QPainter(rounded)
-                painter.setRenderHint(QtGui.QPainter.Antialiasing)
-                path = QtGui.QPainterPath()
-                path.addRoundedRect(0, 0, 240, 150, 5, 5)
-                painter.setClipPath(path)
-                scaled = pixmap.scaled(
-                    240,
-                    150,
-                    QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                    QtCore.Qt.TransformationMode.SmoothTransformation,
-                )
-                painter.drawPixmap(0, 0, scaled)
-                painter.end()
-                self.item.icon.setPixmap(rounded)
+                self.item.icon.setPixmap(pixmap)
                 self.item.icon.setFixedSize(240, 150)
                 self.item.icon.setStyleSheet("background-color: transparent;")
         else:
@@ -1924,10 +1699,12 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return
         self.refresh_file_list(keep_scroll=False)
         for i in range(self.file_list.count()):
-            it = self.file_list.item(i)
+            it = self.file_model.index(i)
             if it.data(QtCore.Qt.UserRole) == name:
                 self.file_list.setCurrentRow(i)
-                QtCore.QTimer.singleShot(0, lambda it=it: self.file_list.scrollToItem(it))
+                QtCore.QTimer.singleShot(
+                    0, lambda i=i: self.file_list.scrollTo(self.file_model.index(i))
+                )
                 break
 
     def _current_section_index(self) -> int | None:
@@ -1936,8 +1713,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         row = self.file_list.currentRow()
         if row == -1:
             return None
-        item = self.file_list.item(row)
-        if item and item.data(QtCore.Qt.UserRole) == "header":
+        if self._is_header_row(row):
             for idx, (start, _end) in enumerate(self.section_bounds):
                 if start > row:
                     return idx
@@ -1948,18 +1724,9 @@ class JdDirectoryPage(QtWidgets.QWidget):
         return None
 
     def _header_for_section(self, section_idx: int) -> str | None:
-        dir_path = self.current_path
-        entries = sorted(os.listdir(dir_path), key=lambda x: x.lower())
-        headers = [e for e in entries if e.lower().endswith(".2do")]
         start = self.section_bounds[section_idx][0]
-        start_name = self.file_list.item(start).data(QtCore.Qt.UserRole)
-        header = None
-        for h in headers:
-            if h.lower() < start_name.lower():
-                header = h
-            else:
-                break
-        return header
+        start_name = self.file_model.index(start).data(QtCore.Qt.UserRole)
+        return self._directory_snapshot().header_before(start_name)
 
     def _category_for_section(self, section_idx: int) -> tuple[str | None, str | None]:
         header = self._header_for_section(section_idx)
@@ -1968,14 +1735,14 @@ class JdDirectoryPage(QtWidgets.QWidget):
             if cat and name:
                 return cat, name
         start = self.section_bounds[section_idx][0]
-        item_name = self.file_list.item(start).data(QtCore.Qt.UserRole)
+        item_name = self.file_model.index(start).data(QtCore.Qt.UserRole)
         return self._parse_prefix(item_name)[:2]
 
     def _create_file_after(self) -> None:
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item:
+        item = self.file_list.currentIndex()
+        if not item.isValid():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -1990,8 +1757,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
     def _create_file_before(self) -> None:
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item:
+        item = self.file_list.currentIndex()
+        if not item.isValid():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -2011,7 +1778,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if not (cat and cat_name):
             return
         end = self.section_bounds[sec][1]
-        last_name = self.file_list.item(end).data(QtCore.Qt.UserRole)
+        last_name = self.file_model.index(end).data(QtCore.Qt.UserRole)
         _c, _n, ts = self._parse_prefix(last_name)
         if ts:
             new_ts = self._adjust_timestamp(ts, 1)
@@ -2026,7 +1793,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if sec is None:
             return
         start = self.section_bounds[sec][0]
-        first_name = self.file_list.item(start).data(QtCore.Qt.UserRole)
+        first_name = self.file_model.index(start).data(QtCore.Qt.UserRole)
         cat, cat_name, ts = self._parse_prefix(first_name)
         if not (cat and cat_name and ts):
             return
@@ -2040,8 +1807,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
         self._create_file_with_prefix(prefix)
 
     def _rename_file(self) -> None:
-        item = self.file_list.currentItem()
-        if not item:
+        item = self.file_list.currentIndex()
+        if not item.isValid():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -2065,18 +1832,18 @@ class JdDirectoryPage(QtWidgets.QWidget):
                 return
             self.refresh_file_list()
             for i in range(self.file_list.count()):
-                it = self.file_list.item(i)
+                it = self.file_model.index(i)
                 if it.data(QtCore.Qt.UserRole) == new_name:
                     self.file_list.setCurrentRow(i)
-                    self.file_list.scrollToItem(it)
+                    self.file_list.scrollTo(it)
                     break
 
     def _apply_unra_prefix(self, opts: tuple[bool, bool]) -> None:
         use_file_time, replace_entire = opts
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item or self._current_item_is_directory():
+        item = self.file_list.currentIndex()
+        if not item.isValid() or self._current_item_is_directory():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
@@ -2132,26 +1899,24 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return
         self.refresh_file_list()
         for i in range(self.file_list.count()):
-            it = self.file_list.item(i)
+            it = self.file_model.index(i)
             if it.data(QtCore.Qt.UserRole) == new_name:
                 self.file_list.setCurrentRow(i)
-                self.file_list.scrollToItem(it)
+                self.file_list.scrollTo(it)
                 break
 
     def _apply_header_number(self, number: int) -> None:
         if self._is_directory_selected():
             return
-        item = self.file_list.currentItem()
-        if not item or self._current_item_is_directory():
+        item = self.file_list.currentIndex()
+        if not item.isValid() or self._current_item_is_directory():
             return
         name = item.data(QtCore.Qt.UserRole)
         if not name or name in {"header", "markdown"}:
             return
         dir_path = self.current_path
-        files = [f for f in os.listdir(dir_path) if f.lower().endswith(".2do")]
-        files.sort(key=lambda x: x.lower())
         header_prefix = None
-        for fname in files:
+        for fname in self._directory_snapshot().header_names():
             if fname.startswith(f"[{number}"):
                 match = re.match(r"\[(\d-[^ \]]+)", fname)
                 if match:
@@ -2174,7 +1939,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
             rest_name = name
             timestamp = None
         if not timestamp:
-            stat = os.stat(old_path)
+            stat = self._directory_snapshot().stat(name) or os.stat(old_path)
             ts = getattr(stat, "st_birthtime", stat.st_mtime)
             dt = datetime.fromtimestamp(ts, tz=timezone.utc)
             timestamp = dt.strftime("%Y-%m-%d %H.%M.%S")
@@ -2197,18 +1962,18 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return
         self.refresh_file_list()
         for i in range(self.file_list.count()):
-            it = self.file_list.item(i)
+            it = self.file_model.index(i)
             if it.data(QtCore.Qt.UserRole) == new_name:
                 self.file_list.setCurrentRow(i)
-                self.file_list.scrollToItem(it)
+                self.file_list.scrollTo(it)
                 break
 
     def _handle_c(self) -> None:
         if self._editing_markdown_item is not None:
             return
-        item = self.file_list.currentItem()
+        item = self.file_list.currentIndex()
         # If a markdown preview row is selected, open the underlying file in nvim
-        if item and item.data(QtCore.Qt.UserRole) == "markdown":
+        if item.isValid() and item.data(QtCore.Qt.UserRole) == "markdown":
             path = item.data(QtCore.Qt.UserRole + 1)
             if path:
                 self._open_in_nvim(path)
@@ -2217,7 +1982,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
             self._edit_tag_label_with_icon()
         else:
             # Otherwise, if a file row is selected, open it in nvim
-            if not item or self._current_item_is_directory():
+            if not item.isValid() or self._current_item_is_directory():
                 return
             path = item.data(QtCore.Qt.UserRole + 1)
             if path:
@@ -2235,16 +2000,16 @@ class JdDirectoryPage(QtWidgets.QWidget):
             name = os.path.basename(path)
             self.refresh_file_list()
             for i in range(self.file_list.count()):
-                it = self.file_list.item(i)
-                if it and it.data(QtCore.Qt.UserRole) == name:
+                it = self.file_model.index(i)
+                if it.data(QtCore.Qt.UserRole) == name:
                     self.file_list.setCurrentRow(i)
-                    self.file_list.scrollToItem(it)
+                    self.file_list.scrollTo(it)
                     break
             proc.deleteLater()
         proc.finished.connect(_after_edit)
         proc.start()
 
-    def _edit_markdown(self, item: QtWidgets.QListWidgetItem) -> None:
+    def _edit_markdown(self, item: QtCore.QModelIndex) -> None:
         path = item.data(QtCore.Qt.UserRole + 1)
         if not path:
             return
@@ -2269,9 +2034,9 @@ class JdDirectoryPage(QtWidgets.QWidget):
         edit.setFrameShape(QtWidgets.QFrame.Shape.NoFrame)
         layout.addWidget(edit)
 
-        item.setSizeHint(container.sizeHint())
-        self.file_list.setItemWidget(item, container)
-        self.file_list.setCurrentItem(item)
+        self.file_list.set_row_widget(item.row(), container)
+        self.file_list.setCurrentRow(item.row())
+        editing = QtCore.QPersistentModelIndex(item)
         edit.setFocus()
         # Consume interactions on the list while editing so selection can't change
         self._consume_list_events = True
@@ -2286,10 +2051,11 @@ class JdDirectoryPage(QtWidgets.QWidget):
                         f.write(new_text)
                 except OSError:
                     pass
-            new_widget = self._create_markdown_widget(path)
-            item.setSizeHint(new_widget.sizeHint())
-            self.file_list.setItemWidget(item, new_widget)
-            self.file_list.setCurrentItem(item)
+            # The row may have moved while editing; follow it.
+            row = editing.row()
+            if row >= 0:
+                self.file_list.set_row_widget(row, self._create_markdown_widget(path))
+                self.file_list.setCurrentRow(row)
             for s in self.shortcuts:
                 s.setEnabled(True)
             for s in self.search_shortcut_instances:
@@ -2302,6 +2068,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
                 self.file_list.viewport().removeEventFilter(self)
             except Exception:
                 pass
+            self._refresh_if_pending()
 
         esc = QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_Escape), edit)
         esc.activated.connect(lambda: finish(False))
@@ -2342,7 +2109,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
                 key_str.lower() == seq.lower() for seq in self.quit_sequences
             ):
                 s.setEnabled(False)
-        self._editing_markdown_item = item
+        self._editing_markdown_item = editing
         
     def _rename_selected(self) -> None:
         if self._is_directory_selected():
@@ -2365,14 +2132,12 @@ class JdDirectoryPage(QtWidgets.QWidget):
         dialog = SimpleEditTagDialog(current_label, self)
         if dialog.exec() == QtWidgets.QDialog.Accepted:
             new_label = dialog.get_label()
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_label')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_directory_label (event_id, directory_id, new_label) VALUES (?, ?, ?)",
-                (event_id, self.directory_id, new_label),
-            )
-            self.conn.commit()
-            rebuild_state_jd_directories(self.conn)
+            with unit_of_work(self.conn) as uow:
+                uow.append(
+                    'set_jd_directory_label',
+                    directory_id=self.directory_id,
+                    new_label=new_label,
+                )
             self._refresh_item()
             # Ensure the directory entry remains selected after closing the dialog
             self.set_selection(0)
@@ -2390,17 +2155,20 @@ class JdDirectoryPage(QtWidgets.QWidget):
             return
         order, current_label = row
         cursor.execute(
-            "SELECT icon FROM state_jd_directory_icons WHERE directory_id = ?",
+            "SELECT b.data FROM state_jd_directory_icons i JOIN blobs b ON b.hash = i.icon_hash "
+            "WHERE i.directory_id = ?",
             (self.directory_id,),
         )
         icon_row = cursor.fetchone()
         icon_data = icon_row[0] if icon_row else None
+        icon_source_hash = None
         while True:
             dialog = EditTagDialog(current_label, icon_data, 3, order, self)
             if dialog.exec() == QtWidgets.QDialog.Accepted:
                 new_order = dialog.get_order()
                 new_label = dialog.get_label()
                 new_icon_data = dialog.get_icon_data()
+                new_icon_source_hash = dialog.get_icon_source_hash() or icon_source_hash
                 cursor.execute(
                     "SELECT directory_id FROM state_jd_directories WHERE [order] = ? AND directory_id != ?",
                     (new_order, self.directory_id),
@@ -2411,30 +2179,28 @@ class JdDirectoryPage(QtWidgets.QWidget):
                         f"Order {new_order} is already in use.",
                     )
                     current_label, icon_data, order = new_label, new_icon_data, new_order
+                    icon_source_hash = new_icon_source_hash
                     continue
-                if new_order != order:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_order')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_order (event_id, directory_id, [order]) VALUES (?, ?, ?)",
-                        (event_id, self.directory_id, new_order),
-                    )
-                if new_label != current_label:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_label')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_label (event_id, directory_id, new_label) VALUES (?, ?, ?)",
-                        (event_id, self.directory_id, new_label),
-                    )
-                if new_icon_data:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_directory_icon')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_directory_icon (event_id, directory_id, icon) VALUES (?, ?, ?)",
-                        (event_id, self.directory_id, new_icon_data),
-                    )
-                self.conn.commit()
-                rebuild_state_jd_directories(self.conn)
+                with unit_of_work(self.conn) as uow:
+                    if new_order != order:
+                        uow.append(
+                            'set_jd_directory_order',
+                            directory_id=self.directory_id,
+                            order=new_order,
+                        )
+                    if new_label != current_label:
+                        uow.append(
+                            'set_jd_directory_label',
+                            directory_id=self.directory_id,
+                            new_label=new_label,
+                        )
+                    if new_icon_source_hash:
+                        uow.append(
+                            'set_jd_directory_icon',
+                            directory_id=self.directory_id,
+                            icon_hash=uow.put_blob(new_icon_data),
+                            source_hash=new_icon_source_hash,
+                        )
                 self._refresh_item()
                 break
             else:
@@ -2452,6 +2218,8 @@ class JdDirectoryPage(QtWidgets.QWidget):
             self.ext_tag_overlay.reposition()
         if self.directory_overlay and self.directory_overlay.isVisible():
             self.directory_overlay.reposition()
+        if self.global_search_overlay and self.global_search_overlay.isVisible():
+            self.global_search_overlay.reposition()
         super().resizeEvent(event)
 
     def mousePressEvent(self, event):
@@ -2489,7 +2257,6 @@ class JdDirectoryPage(QtWidgets.QWidget):
         if cursor.fetchone():
             return
         add_directory_tag(self.conn, self.directory_id, tag_uuid)
-        rebuild_state_directory_tags(self.conn)
         self._refresh_item()
 
     def open_remove_tag_search(self):
@@ -2524,7 +2291,6 @@ class JdDirectoryPage(QtWidgets.QWidget):
 
     def _remove_selected_tag_from_directory(self, tag_uuid):
         remove_directory_tag(self.conn, self.directory_id, tag_uuid)
-        rebuild_state_directory_tags(self.conn)
         self._refresh_item()
 
     def open_directory_search(self):
@@ -2542,6 +2308,21 @@ class JdDirectoryPage(QtWidgets.QWidget):
         for s in self.shortcuts:
             s.setEnabled(True)
 
+    def open_global_search(self):
+        if not self.global_search_overlay:
+            self.global_search_overlay = GlobalSearchOverlay(self, self.conn)
+            self.global_search_overlay.resultSelected.connect(
+                lambda kind, ref, path: open_search_result(self.conn, kind, ref, path)
+            )
+            self.global_search_overlay.closed.connect(self._global_search_closed)
+        for s in self.shortcuts:
+            s.setEnabled(False)
+        self.global_search_overlay.open()
+
+    def _global_search_closed(self):
+        for s in self.shortcuts:
+            s.setEnabled(True)
+
     def _navigate_to_directory(self, directory_id):
         from .jd_directory_page import JdDirectoryPage
 
@@ -2580,18 +2361,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         from .jd_area_page import JdAreaPage
 
         new_page = JdAreaPage()
-        target_tag_id = self.great_grandparent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.great_grandparent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def _navigate_to_subdir(self, level: int) -> None:
@@ -2610,7 +2380,7 @@ class JdDirectoryPage(QtWidgets.QWidget):
         self._update_breadcrumb()
         if target_name:
             for i in range(self.file_list.count()):
-                it = self.file_list.item(i)
+                it = self.file_model.index(i)
                 if it.data(QtCore.Qt.UserRole) == target_name:
                     self.file_list.setCurrentRow(i)
                     break
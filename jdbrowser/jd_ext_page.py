@@ -6,22 +6,24 @@ import shiboken6
 import jdbrowser
 from .dialogs import EditTagDialog, SimpleEditTagDialog, InputTagDialog, DeleteTagDialog
 from .dialogs.header_dialog import HeaderDialog
-from .file_item import FileItem
-from .header_item import HeaderItem
 from .search_line_edit import SearchLineEdit
+from .tag_grid import TagGridView, TagHeader, TagSection
 from .database import (
     create_jd_ext_tag,
     delete_jd_ext_tag,
-    rebuild_state_jd_ext_tags,
+    unit_of_work,
     setup_database,
+    load_blobs,
     create_jd_ext_header,
     update_jd_ext_header,
     delete_jd_ext_header,
-    rebuild_state_jd_ext_headers,
 )
+from .database_worker import database_worker
+from .icons import ingest_icon_file
 from .constants import *
 from .ext_tag_search_overlay import ExtTagSearchOverlay
 from .directory_search_overlay import DirectorySearchOverlay
+from .global_search_overlay import GlobalSearchOverlay, open_search_result
 
 class JdExtPage(QtWidgets.QWidget):
     def __init__(self, parent_uuid, jd_area, jd_id, grandparent_uuid):
@@ -50,6 +52,7 @@ class JdExtPage(QtWidgets.QWidget):
         self.search_shortcut_instances = []
         self.ext_tag_overlay = None
         self.directory_overlay = None
+        self.global_search_overlay = None
         self.show_prefix = False
         # Load show_prefix and show_hidden state from QSettings
         settings = QtCore.QSettings("xAI", "jdbrowser")
@@ -106,6 +109,10 @@ class JdExtPage(QtWidgets.QWidget):
                 """
             )
 
+        self.icon_blobs = {}
+        self._sections_future = None
+        # Tag to select once the sections being loaded arrive.
+        self._target_tag_id = None
         self._setup_ui()
         self._setup_shortcuts()
         self.updateSelection()
@@ -250,19 +257,16 @@ class JdExtPage(QtWidgets.QWidget):
         if file_dialog.exec():
             file_path = file_dialog.selectedFiles()[0]
             settings.setValue("last_thumbnail_dir", os.path.dirname(file_path))
-            pixmap = QtGui.QPixmap(file_path)
-            if not pixmap.isNull():
-                with open(file_path, 'rb') as f:
-                    icon_data = f.read()
-                cursor = self.conn.cursor()
-                cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_icon')")
-                event_id = cursor.lastrowid
-                cursor.execute(
-                    "INSERT INTO event_set_jd_ext_tag_icon (event_id, tag_id, icon) VALUES (?, ?, ?)",
-                    (event_id, tag_id, icon_data),
-                )
-                self.conn.commit()
-                rebuild_state_jd_ext_tags(self.conn)
+            icon = ingest_icon_file(file_path)
+            if icon:
+                icon_data, source_hash = icon
+                with unit_of_work(self.conn) as uow:
+                    uow.append(
+                        'set_jd_ext_tag_icon',
+                        tag_id=tag_id,
+                        icon_hash=uow.put_blob(icon_data),
+                        source_hash=source_hash,
+                    )
                 self._rebuild_ui()
 
     def _create_header(self):
@@ -284,7 +288,6 @@ class JdExtPage(QtWidgets.QWidget):
                 self.conn, self.parent_uuid, order, label
             )
             if header_id:
-                rebuild_state_jd_ext_headers(self.conn)
                 self._rebuild_ui()
             else:
                 self._warn(
@@ -306,7 +309,6 @@ class JdExtPage(QtWidgets.QWidget):
         new_order = max_order + 1 if max_order is not None else base
         new_tag_id = create_jd_ext_tag(self.conn, self.parent_uuid, new_order, label)
         if new_tag_id:
-            rebuild_state_jd_ext_tags(self.conn)
             self._rebuild_ui(new_tag_id=new_tag_id)
 
     def _input_tag_dialog(self):
@@ -343,7 +345,6 @@ class JdExtPage(QtWidgets.QWidget):
                     continue
                 new_tag_id = create_jd_ext_tag(self.conn, self.parent_uuid, order, label)
                 if new_tag_id:
-                    rebuild_state_jd_ext_tags(self.conn)
                     self._rebuild_ui(new_tag_id=new_tag_id)
                     break
                 else:
@@ -359,36 +360,14 @@ class JdExtPage(QtWidgets.QWidget):
 
         new_page = JdIdPage(parent_uuid=self.grandparent_uuid, jd_area=self.current_jd_area)
         # Select the item we came from in the parent page
-        target_tag_id = self.parent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.parent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def ascend_to_area(self):
         from .jd_area_page import JdAreaPage
 
         new_page = JdAreaPage()
-        target_tag_id = self.grandparent_uuid
-        found = False
-        for s, sec in enumerate(new_page.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id == target_tag_id:
-                    new_page.sec_idx = s
-                    new_page.idx_in_sec = i
-                    found = True
-                    break
-            if found:
-                break
-        new_page.updateSelection()
+        new_page.select_tag(self.grandparent_uuid)
         jdbrowser.navigate_to(new_page)
 
     def _edit_tag_label_with_icon(self):
@@ -411,7 +390,6 @@ class JdExtPage(QtWidgets.QWidget):
                         continue
                     new_tag_id = create_jd_ext_tag(self.conn, self.parent_uuid, order, label)
                     if new_tag_id:
-                        rebuild_state_jd_ext_tags(self.conn)
                         self._rebuild_ui(new_tag_id=new_tag_id)
                         break
                     else:
@@ -430,17 +408,20 @@ class JdExtPage(QtWidgets.QWidget):
         )
         jd_ext, current_label = cursor.fetchone()
         cursor.execute(
-            "SELECT icon FROM state_jd_ext_tag_icons WHERE tag_id = ?",
+            "SELECT b.data FROM state_jd_ext_tag_icons i JOIN blobs b ON b.hash = i.icon_hash "
+            "WHERE i.tag_id = ?",
             (tag_id,),
         )
         icon_data = cursor.fetchone()
         icon_data = icon_data[0] if icon_data else None
+        icon_source_hash = None
         while True:
             dialog = EditTagDialog(current_label, icon_data, 2, jd_ext, self)
             if dialog.exec() == QtWidgets.QDialog.Accepted:
                 new_jd_ext = dialog.get_order()
                 new_label = dialog.get_label()
                 new_icon_data = dialog.get_icon_data()
+                new_icon_source_hash = dialog.get_icon_source_hash() or icon_source_hash
                 cursor.execute(
                     "SELECT tag_id FROM state_jd_ext_tags WHERE parent_uuid IS ? AND [order] = ? AND tag_id != ?",
                     (self.parent_uuid, new_jd_ext, tag_id),
@@ -451,30 +432,25 @@ class JdExtPage(QtWidgets.QWidget):
                         f"Order {new_jd_ext:04d} is already in use.",
                     )
                     current_label, icon_data, jd_ext = new_label, new_icon_data, new_jd_ext
+                    icon_source_hash = new_icon_source_hash
                     continue
-                if new_jd_ext != jd_ext:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)",
-                        (event_id, tag_id, self.parent_uuid, new_jd_ext),
-                    )
-                if new_label != current_label:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_label')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_ext_tag_label (event_id, tag_id, new_label) VALUES (?, ?, ?)",
-                        (event_id, tag_id, new_label),
-                    )
-                if new_icon_data:
-                    cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_icon')")
-                    event_id = cursor.lastrowid
-                    cursor.execute(
-                        "INSERT INTO event_set_jd_ext_tag_icon (event_id, tag_id, icon) VALUES (?, ?, ?)",
-                        (event_id, tag_id, new_icon_data),
-                    )
-                self.conn.commit()
-                rebuild_state_jd_ext_tags(self.conn)
+                with unit_of_work(self.conn) as uow:
+                    if new_jd_ext != jd_ext:
+                        uow.append(
+                            'set_jd_ext_tag_order',
+                            tag_id=tag_id,
+                            parent_uuid=self.parent_uuid,
+                            order=new_jd_ext,
+                        )
+                    if new_label != current_label:
+                        uow.append('set_jd_ext_tag_label', tag_id=tag_id, new_label=new_label)
+                    if new_icon_source_hash:
+                        uow.append(
+                            'set_jd_ext_tag_icon',
+                            tag_id=tag_id,
+                            icon_hash=uow.put_blob(new_icon_data),
+                            source_hash=new_icon_source_hash,
+                        )
                 self._rebuild_ui()
                 break
             else:
@@ -497,14 +473,8 @@ class JdExtPage(QtWidgets.QWidget):
         dialog = SimpleEditTagDialog(current_label, self)
         if dialog.exec() == QtWidgets.QDialog.Accepted:
             new_label = dialog.get_label()
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_label')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_ext_tag_label (event_id, tag_id, new_label) VALUES (?, ?, ?)",
-                (event_id, tag_id, new_label),
-            )
-            self.conn.commit()
-            rebuild_state_jd_ext_tags(self.conn)
+            with unit_of_work(self.conn) as uow:
+                uow.append('set_jd_ext_tag_label', tag_id=tag_id, new_label=new_label)
             self._rebuild_ui()
 
     def _delete_tag(self):
@@ -526,7 +496,6 @@ class JdExtPage(QtWidgets.QWidget):
         dialog = DeleteTagDialog(display_name, self)
         if dialog.exec() == QtWidgets.QDialog.Accepted:
             delete_jd_ext_tag(self.conn, tag_id)
-            rebuild_state_jd_ext_tags(self.conn)
             # Preserve current indices; selection will land on placeholder
             current_item.tag_id = None
             self._rebuild_ui()
@@ -542,43 +511,36 @@ class JdExtPage(QtWidgets.QWidget):
         if not row:
             return
         s_ext = row[0]
-        if target_item.tag_id is None:
-            new_ext = target_item.jd_ext
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)",
-                (event_id, source_tag_id, self.parent_uuid, new_ext),
-            )
-        else:
-            target_tag_id = target_item.tag_id
-            if target_tag_id == source_tag_id:
-                return
-            cursor.execute(
-                "SELECT [order] FROM state_jd_ext_tags WHERE tag_id = ?",
-                (target_tag_id,),
-            )
-            t_ext = cursor.fetchone()[0]
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)",
-                (event_id, target_tag_id, self.parent_uuid, -1),
-            )
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)",
-                (event_id, source_tag_id, self.parent_uuid, t_ext),
-            )
-            cursor.execute("INSERT INTO events (event_type) VALUES ('set_jd_ext_tag_order')")
-            event_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO event_set_jd_ext_tag_order (event_id, tag_id, parent_uuid, [order]) VALUES (?, ?, ?, ?)",
-                (event_id, target_tag_id, self.parent_uuid, s_ext),
-            )
-        self.conn.commit()
-        rebuild_state_jd_ext_tags(self.conn)
+        if target_item.tag_id == source_tag_id:
+            return
+        with unit_of_work(self.conn) as uow:
+            if target_item.tag_id is None:
+                new_ext = target_item.jd_ext
+                uow.append(
+                    'set_jd_ext_tag_order',
+                    tag_id=source_tag_id,
+                    parent_uuid=self.parent_uuid,
+                    order=new_ext,
+                )
+            else:
+                target_tag_id = target_item.tag_id
+                cursor.execute(
+                    "SELECT [order] FROM state_jd_ext_tags WHERE tag_id = ?",
+                    (target_tag_id,),
+                )
+                t_ext = cursor.fetchone()[0]
+                uow.append(
+                    'set_jd_ext_tag_order',
+                    tag_id=source_tag_id,
+                    parent_uuid=self.parent_uuid,
+                    order=t_ext,
+                )
+                uow.append(
+                    'set_jd_ext_tag_order',
+                    tag_id=target_tag_id,
+                    parent_uuid=self.parent_uuid,
+                    order=s_ext,
+                )
         self._rebuild_ui(new_tag_id=source_tag_id)
 
     def _edit_header(self, header_item):
@@ -601,7 +563,6 @@ class JdExtPage(QtWidgets.QWidget):
                 ):
                     self._warn("Invalid Input", "Header order conflicts or invalid.")
                     return
-            rebuild_state_jd_ext_headers(self.conn)
             self._rebuild_ui()
 
     def _setup_search_shortcuts(self):
@@ -672,23 +633,30 @@ class JdExtPage(QtWidgets.QWidget):
         return bar
 
     def _setup_ui(self):
-        if not hasattr(self, "scroll_area"):
-            self.scroll_area = QtWidgets.QScrollArea()
-            self.scroll_area.setWidgetResizable(True)
-            self.scroll_area.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-            self.scroll_area.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-            self.scroll_area.setStyleSheet("border: none; background-color: #000000;")
-            scroll_area = self.scroll_area
+        if not hasattr(self, "tag_grid"):
+            self.tag_grid = TagGridView(self.cols)
+            self.tag_grid.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+            self.tag_grid.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+            self.tag_grid.setStyleSheet("border: none; background-color: #000000;")
+            tag_grid = self.tag_grid
             QtCore.QTimer.singleShot(
                 100,
-                lambda sa=scroll_area: shiboken6.isValid(sa)
+                lambda sa=tag_grid: shiboken6.isValid(sa)
                 and sa.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded),
             )
             QtCore.QTimer.singleShot(
                 100,
-                lambda sa=scroll_area: shiboken6.isValid(sa)
+                lambda sa=tag_grid: shiboken6.isValid(sa)
                 and sa.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded),
             )
+            self.tag_model = self.tag_grid.tag_model
+            self.tag_grid.slotPressed.connect(self.set_selection)
+            self.tag_grid.slotContextRequested.connect(
+                lambda _sec, _idx: self._edit_tag_label_with_icon()
+            )
+            self.tag_grid.slotActivated.connect(lambda _sec, _idx: self.descend_level())
+            self.tag_grid.headerContextRequested.connect(self._edit_header)
+            self.tag_grid.tagDropped.connect(self.handle_item_drop)
             layout = QtWidgets.QVBoxLayout(self)
             layout.setContentsMargins(0, 0, 0, 0)
             layout.setSpacing(0)
@@ -698,7 +666,7 @@ class JdExtPage(QtWidgets.QWidget):
                 [("Home", self.ascend_to_area), (crumb_area, self.ascend_level), (crumb_id, None)]
             )
             layout.addWidget(self.breadcrumb_bar)
-            layout.addWidget(self.scroll_area)
+            layout.addWidget(self.tag_grid)
 
             # Search input box
             self.search_input = SearchLineEdit(self)
@@ -707,36 +675,78 @@ class JdExtPage(QtWidgets.QWidget):
             self.search_input.hide()
             self.search_input.textChanged.connect(self.perform_search)
             self._setup_search_shortcuts()
-        else:
-            old = self.scroll_area.takeWidget()
-            if old:
-                old.deleteLater()
 
-        container = QtWidgets.QWidget()
-        container.setStyleSheet("background-color: #000000;")
-        mainLayout = QtWidgets.QVBoxLayout(container)
-        mainLayout.setSpacing(10)
-        mainLayout.setContentsMargins(5, 15, 5, 5)
+            style = f'''
+            * {{ font-family: 'FiraCode Nerd Font'; }}
+            QWidget {{ background-color: #000000; }}
+            QMainWindow {{ background-color: #000000; }}
+            QScrollArea {{ border: none; background-color: #000000; }}
+            QScrollBar:vertical {{
+                width: 8px;
+                background: #000000;
+            }}
+            QScrollBar::handle:vertical {{
+                background: {BORDER_COLOR};
+                min-height: 20px;
+                border-radius: 4px;
+            }}
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{ height: 0; }}
+            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{ background: none; }}
+            QScrollBar:horizontal {{
+                height: 8px;
+                background: #000000;
+            }}
+            QScrollBar::handle:horizontal {{
+                background: {BORDER_COLOR};
+                min-width: 20px;
+                border-radius: 4px;
+            }}
+            QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {{ width: 0; }}
+            QScrollBar::add-page:horizontal, QScrollBar::sub-page:horizontal {{ background: none; }}
+            '''
+            self.setStyleSheet(style)
 
-        self.sections = []
-        self.section_paths = []
-        self.section_filenames = []
-        current_section = None
-        section_index = 0
-        cursor = self.conn.cursor()
+        self._rebuild_ui()
+
+    def _fetch_sections(self, conn, cached):
+        """Return the headers, tags and icons of the grid; runs on the worker.
+
+        cached is the icon_blobs of the last load, whose blobs are reused.
+        """
+        cursor = conn.cursor()
         cursor.execute(
             "SELECT header_id, [order], label FROM state_jd_ext_headers WHERE parent_uuid IS ? ORDER BY [order]",
             (self.parent_uuid,),
         )
         headers = cursor.fetchall()
-        self.header_orders = sorted({0, *(order for _, order, _ in headers)})
         cursor.execute(
             "SELECT tag_id, [order], label FROM state_jd_ext_tags WHERE parent_uuid IS ? ORDER BY [order]",
             (self.parent_uuid,),
         )
         tags = cursor.fetchall()
-        cursor.execute("SELECT tag_id, icon FROM state_jd_ext_tag_icons")
-        icons = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.execute(
+            """
+            SELECT i.tag_id, i.icon_hash
+            FROM state_jd_ext_tags t
+            JOIN state_jd_ext_tag_icons i ON i.tag_id = t.tag_id
+            WHERE t.parent_uuid IS ?
+            """,
+            (self.parent_uuid,),
+        )
+        icon_hashes = dict(cursor.fetchall())
+        # Only icons not shown before are read from the blob table.
+        return headers, tags, icon_hashes, load_blobs(conn, icon_hashes.values(), cached)
+
+    def _sections_loaded(self, rows):
+        if not shiboken6.isValid(self):
+            return
+        self._sections_future = None
+        headers, tags, icon_hashes, self.icon_blobs = rows
+        self.sections = []
+        self.section_paths = []
+        self.section_filenames = []
+        section_index = 0
+        self.header_orders = sorted({0, *(order for _, order, _ in headers)})
 
         def construct_prefix(order):
             return f"[{self.current_jd_area:02d}.{self.current_jd_id:02d}+{order:04d}]"
@@ -748,174 +758,93 @@ class JdExtPage(QtWidgets.QWidget):
             headers_by_order[order].append((header_id, order, label, prefix))
         tags = sorted(tags, key=lambda x: x[1])
 
-        # Build sections and placeholders
-        def placeholder_item(val, sec_idx, item_idx):
-            pa, pi, pe = self.current_jd_area, self.current_jd_id, val
-            item = FileItem(None, None, pa, pi, pe, None, self, sec_idx, item_idx)
-            item.updateLabel(self.show_prefix)
-            return item
-
-        section_index = 0
-        current_section = None
-        section_base = None
-        next_index = 0
-
-        def add_section(section):
-            sectionWidget = QtWidgets.QWidget()
-            sectionLayout = QtWidgets.QVBoxLayout(sectionWidget)
-            sectionLayout.setSpacing(5)
-            sectionLayout.setContentsMargins(0, 0, 0, 0)
-            sectionLayout.setAlignment(QtCore.Qt.AlignmentFlag.AlignLeft)
-            rowLayout = None
-            for i, item in enumerate(section):
-                if i % self.cols == 0:
-                    if rowLayout:
-                        sectionLayout.addLayout(rowLayout)
-                    rowLayout = QtWidgets.QHBoxLayout()
-                    rowLayout.setSpacing(2)
-                    rowLayout.setContentsMargins(0, 0, 0, 0)
-                    rowLayout.setAlignment(QtCore.Qt.AlignmentFlag.AlignLeft)
-                rowLayout.addWidget(item)
-            if rowLayout:
-                sectionLayout.addLayout(rowLayout)
-            sectionWidget.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
-            mainLayout.addWidget(sectionWidget)
-            mainLayout.setAlignment(sectionWidget, QtCore.Qt.AlignmentFlag.AlignLeft)
-            self.sections.append(section)
-
-        def start_section(base, base_path, filename_id):
-            nonlocal current_section, section_base, next_index
-            current_section = []
-            self.section_paths.append(base_path)
-            self.section_filenames.append(filename_id)
-            section_base = base
-            next_index = 0
-
-        def add_placeholders_until(end_index):
-            nonlocal next_index
-            for i in range(next_index, end_index):
-                val = section_base + i
-                current_section.append(placeholder_item(val, section_index, i))
-            next_index = end_index
-
-        def flush_section():
-            nonlocal current_section, section_index, section_base, next_index
-            if current_section is None:
-                return
-            if not current_section:
-                val = section_base
-                current_section.append(placeholder_item(val, section_index, 0))
-            else:
-                add_placeholders_until(next_index + 1)
-            add_section(current_section)
-            section_index += 1
-            current_section = None
-            section_base = None
-            next_index = 0
+        # Build sections. Each runs from its header to one placeholder past
+        # its last tag; TagSection makes the placeholders on demand.
+        # header_rows[s] holds the headers shown above section s.
+        header_rows = []
         section_starts = sorted({0, *headers_by_order.keys()})
         tag_idx = 0
         for i, base in enumerate(section_starts):
             next_start = section_starts[i + 1] if i + 1 < len(section_starts) else None
+            section_headers = []
             last_header_id = None
             for obj_id, order, label, prefix in headers_by_order.get(base, []):
                 display = f"{prefix} {label}" if prefix else (label or "")
-                header_item = HeaderItem(
-                    obj_id,
-                    self.current_jd_area,
-                    self.current_jd_id,
-                    order,
-                    label,
-                    self,
-                    section_index,
-                    display,
+                section_headers.append(
+                    TagHeader(
+                        obj_id,
+                        self.current_jd_area,
+                        self.current_jd_id,
+                        order,
+                        label,
+                        section_index,
+                        display,
+                    )
                 )
-                header_item.setMinimumWidth(self.scroll_area.viewport().width() - 10)
-                mainLayout.addWidget(header_item)
-                mainLayout.addSpacing(10)
                 last_header_id = obj_id
-            start_section(base, (self.current_jd_area, self.current_jd_id, base), last_header_id)
+            section = TagSection(
+                section_index, (self.current_jd_area, self.current_jd_id, base), 1
+            )
             while tag_idx < len(tags) and (next_start is None or tags[tag_idx][1] < next_start):
                 obj_id, order, label = tags[tag_idx]
                 index = order - base
-                add_placeholders_until(index)
-                icon_data = icons.get(obj_id)
-                item = FileItem(
-                    obj_id,
-                    label,
-                    self.current_jd_area,
-                    self.current_jd_id,
-                    order,
-                    icon_data,
-                    self,
-                    section_index,
-                    index,
+                icon_hash = icon_hashes.get(obj_id)
+                section.add_tag(
+                    index, obj_id, label, icon_hash, self.icon_blobs.get(icon_hash)
                 )
-                item.updateLabel(self.show_prefix)
-                current_section.append(item)
-                next_index = index + 1
+                section.length = index + 2
                 tag_idx += 1
-            flush_section()
+            header_rows.append(section_headers)
+            self.sections.append(section)
+            self.section_paths.append(section.path)
+            self.section_filenames.append(last_header_id)
+            section_index += 1
 
-        mainLayout.addStretch()
-        container.setStyleSheet(f'background-color: #000000;')
-        container.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
-        self.scroll_area.setWidget(container)
+        self.tag_model.set_show_prefix(self.show_prefix)
+        self.tag_model.apply_sections(self.sections, header_rows)
 
         self.search_input.move(self.width() - 310, self.height() - 40)
 
-        style = f'''
-        * {{ font-family: 'FiraCode Nerd Font'; }}
-        QWidget {{ background-color: #000000; }}
-        QMainWindow {{ background-color: #000000; }}
-        QScrollArea {{ border: none; background-color: #000000; }}
-        QScrollBar:vertical {{
-            width: 8px;
-            background: #000000;
-        }}
-        QScrollBar::handle:vertical {{
-            background: {BORDER_COLOR};
-            min-height: 20px;
-            border-radius: 4px;
-        }}
-        QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{ height: 0; }}
-        QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{ background: none; }}
-        QScrollBar:horizontal {{
-            height: 8px;
-            background: #000000;
-        }}
-        QScrollBar::handle:horizontal {{
-            background: {BORDER_COLOR};
-            min-width: 20px;
-            border-radius: 4px;
-        }}
-        QScrollBar::add-line:horizontal, QScrollBar::sub-line:horizontal {{ width: 0; }}
-        QScrollBar::add-page:horizontal, QScrollBar::sub-page:horizontal {{ background: none; }}
-        '''
-        self.setStyleSheet(style)
+        tag_id, self._target_tag_id = self._target_tag_id, None
+        self.select_tag(tag_id)
 
     def _rebuild_ui(self, new_tag_id=None):
-        """Rebuild the UI to reflect the current state, selecting new_tag_id or current_tag_id."""
-        current_tag_id = None
-        if self.sections and 0 <= self.sec_idx < len(self.sections) and 0 <= self.idx_in_sec < len(self.sections[self.sec_idx]):
-            current_tag_id = self.sections[self.sec_idx][self.idx_in_sec].tag_id
-        old_widget = self.scroll_area.takeWidget()
-        if old_widget:
-            old_widget.deleteLater()
-        self.sections = []
-        self.section_paths = []
-        self.section_filenames = []
-        self._setup_ui()
-        if new_tag_id or current_tag_id:
-            target_tag_id = new_tag_id or current_tag_id
-            found = False
+        """Reload the grid on the database worker, then select new_tag_id.
+
+        Without new_tag_id the current tag stays selected. The grid keeps
+        what it shows, at first nothing, until the sections arrive; the
+        model then changes only the rows that differ.
+        """
+        if self._sections_future is not None:
+            # A load in flight already knows which tag to select.
+            self._sections_future.cancel()
+            if new_tag_id:
+                self._target_tag_id = new_tag_id
+        else:
+            current_tag_id = None
+            if self.sections and 0 <= self.sec_idx < len(self.sections) and 0 <= self.idx_in_sec < len(self.sections[self.sec_idx]):
+                current_tag_id = self.sections[self.sec_idx][self.idx_in_sec].tag_id
+            self._target_tag_id = new_tag_id or current_tag_id
+        self._sections_future = database_worker().query(
+            self._fetch_sections, self.icon_blobs
+        )
+        self._sections_future.then(self._sections_loaded)
+
+    def select_tag(self, tag_id):
+        """Select tag_id, or while the sections load, once they arrive.
+
+        Without tag_id, or if it is not shown, the selection is only kept
+        within bounds.
+        """
+        if self._sections_future is not None:
+            self._target_tag_id = tag_id
+            return
+        if tag_id:
             for s, sec in enumerate(self.sections):
-                for i, item in enumerate(sec):
-                    if item.tag_id == target_tag_id:
-                        self.sec_idx = s
-                        self.idx_in_sec = i
-                        found = True
-                        break
-                if found:
+                i = sec.index_of(tag_id)
+                if i is not None:
+                    self.sec_idx = s
+                    self.idx_in_sec = i
                     break
         # Ensure indices remain within bounds
         if not self.sections:
@@ -937,9 +866,7 @@ class JdExtPage(QtWidgets.QWidget):
 
     def toggle_label_prefix(self):
         self.show_prefix = not self.show_prefix
-        for sec in self.sections:
-            for item in sec:
-                item.updateLabel(self.show_prefix)
+        self.tag_model.set_show_prefix(self.show_prefix)
         self.updateSelection()
         settings = QtCore.QSettings("xAI", "jdbrowser")
         settings.setValue("show_prefix", self.show_prefix)
@@ -975,6 +902,13 @@ class JdExtPage(QtWidgets.QWidget):
                 None,
                 QtCore.Qt.KeyboardModifier.ShiftModifier,
             ),
+            (
+                QtCore.Qt.Key_F,
+                self.open_global_search,
+                None,
+                QtCore.Qt.KeyboardModifier.ControlModifier
+                | QtCore.Qt.KeyboardModifier.ShiftModifier,
+            ),
             (QtCore.Qt.Key_0, self.firstInRow, None),
             (QtCore.Qt.Key_Dollar, self.lastInRow, None),
             (QtCore.Qt.Key_Home, self.firstInRow, None),
@@ -1052,10 +986,7 @@ class JdExtPage(QtWidgets.QWidget):
                 s.setEnabled(True)
             for s in self.search_shortcut_instances:
                 s.setEnabled(False)
-            for sec in self.sections:
-                for item in sec:
-                    item.isDimmed = False
-                    item.updateStyle()
+            self.tag_model.set_dimmed(None)
             self.updateSelection()
 
     def exit_search_mode_select(self):
@@ -1070,10 +1001,7 @@ class JdExtPage(QtWidgets.QWidget):
                 s.setEnabled(True)
             for s in self.search_shortcut_instances:
                 s.setEnabled(False)
-            for sec in self.sections:
-                for item in sec:
-                    item.isDimmed = False
-                    item.updateStyle()
+            self.tag_model.set_dimmed(None)
             self.updateSelection()
 
     def perform_search(self, query):
@@ -1082,11 +1010,10 @@ class JdExtPage(QtWidgets.QWidget):
         query = query.lower()
         self.search_matches = []
         for s, sec in enumerate(self.sections):
-            for i, item in enumerate(sec):
-                if item.tag_id and query in item.display_name.lower():  # Skip placeholders
-                    self.search_matches.append((s, i))
-                item.isDimmed = query and (not item.tag_id or not query in item.display_name.lower())
-                item.updateStyle()
+            for item in sec.tags():
+                if query in item.label(self.show_prefix).lower():
+                    self.search_matches.append((s, item.item_idx))
+        self.tag_model.set_dimmed(self.search_matches if query else None)
         if self.search_matches:
             self.current_match_idx = 0
             self.sec_idx, self.idx_in_sec = self.search_matches[0]
@@ -1221,15 +1148,10 @@ class JdExtPage(QtWidgets.QWidget):
 
     def centerSelectedItem(self):
         if not self.in_search_mode and self.sections:
-            current = self.sections[self.sec_idx][self.idx_in_sec]
-            self.scroll_area.ensureWidgetVisible(current)
-            viewport = self.scroll_area.viewport()
-            viewport_height = viewport.height()
-            widget_rect = current.rect()
-            widget_pos = current.mapTo(self.scroll_area.widget(), widget_rect.topLeft())
-            scroll_bar = self.scroll_area.verticalScrollBar()
-            target_pos = widget_pos.y() - (viewport_height - widget_rect.height()) // 2
-            scroll_bar.setValue(max(0, target_pos))
+            self.tag_grid.scrollTo(
+                self.tag_model.slot_index(self.sec_idx, self.idx_in_sec),
+                QtWidgets.QAbstractItemView.ScrollHint.PositionAtCenter,
+            )
             self.updateSelection()
 
     def copySelectedName(self):
@@ -1237,7 +1159,7 @@ class JdExtPage(QtWidgets.QWidget):
             current = self.sections[self.sec_idx][self.idx_in_sec]
             if current.tag_id:  # Skip placeholders
                 clipboard = QtWidgets.QApplication.clipboard()
-                clipboard.setText(current.display_name)
+                clipboard.setText(current.label(self.show_prefix))
 
     def firstInRow(self):
         if not self.in_search_mode and self.sections:
@@ -1270,6 +1192,21 @@ class JdExtPage(QtWidgets.QWidget):
         for s in self.shortcuts:
             s.setEnabled(True)
 
+    def open_global_search(self):
+        if not self.global_search_overlay:
+            self.global_search_overlay = GlobalSearchOverlay(self, self.conn)
+            self.global_search_overlay.resultSelected.connect(
+                lambda kind, ref, path: open_search_result(self.conn, kind, ref, path)
+            )
+            self.global_search_overlay.closed.connect(self._global_search_closed)
+        for s in self.shortcuts:
+            s.setEnabled(False)
+        self.global_search_overlay.open()
+
+    def _global_search_closed(self):
+        for s in self.shortcuts:
+            s.setEnabled(True)
+
     def _navigate_to_directory(self, directory_id):
         from .jd_directory_page import JdDirectoryPage
 
@@ -1328,12 +1265,7 @@ class JdExtPage(QtWidgets.QWidget):
 
     def updateSelection(self):
         if self.sections and 0 <= self.sec_idx < len(self.sections) and 0 <= self.idx_in_sec < len(self.sections[self.sec_idx]):
-            current = self.sections[self.sec_idx][self.idx_in_sec]
-            self.scroll_area.ensureWidgetVisible(current)
-            for s, sec in enumerate(self.sections):
-                for i, item in enumerate(sec):
-                    item.isSelected = (s == self.sec_idx and i == self.idx_in_sec)
-                    item.updateStyle()
+            self.tag_grid.set_current(self.sec_idx, self.idx_in_sec)
 
     def mousePressEvent(self, event):
         if self.in_search_mode:
@@ -1345,12 +1277,10 @@ class JdExtPage(QtWidgets.QWidget):
 
     def resizeEvent(self, event):
         self.search_input.move(self.width() - 310, self.height() - 40)
-        # Update header widths on resize
-        for widget in self.scroll_area.widget().findChildren(QtWidgets.QLabel):
-            if widget.styleSheet().startswith(f'background-color: {BUTTON_COLOR}'):
-                widget.setMinimumWidth(self.scroll_area.viewport().width() - 10)
         if self.ext_tag_overlay and self.ext_tag_overlay.isVisible():
             self.ext_tag_overlay.reposition()
         if self.directory_overlay and self.directory_overlay.isVisible():
             self.directory_overlay.reposition()
+        if self.global_search_overlay and self.global_search_overlay.isVisible():
+            self.global_search_overlay.reposition()
         super().resizeEvent(event)
@@ -0,0 +1,20 @@
+import sqlite3
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # One row per projection recording the last event_id folded into its
+    # state tables. A missing row forces a full replay of that projection.
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS projection_checkpoints (
+            projection TEXT PRIMARY KEY,
+            event_id INTEGER NOT NULL
+        );
+        """
+    )
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS projection_checkpoints")
+    conn.commit()
@@ -0,0 +1,75 @@
+import sqlite3
+
+
+def _indexes():
+    """Yield (name, table, columns) for every latest-event lookup index."""
+    for level in ("area", "id", "ext"):
+        parent = "" if level == "area" else "parent_uuid, "
+        for kind in ("tag", "header"):
+            entity = f"jd_{level}_{kind}"
+            key = f"{kind}_id"
+            yield (
+                f"idx_event_set_{entity}_order_{key}",
+                f"event_set_{entity}_order",
+                f"{key}, event_id, {parent}[order]",
+            )
+            yield (
+                f"idx_event_set_{entity}_label_{key}",
+                f"event_set_{entity}_label",
+                f"{key}, event_id, new_label",
+            )
+            if kind == "tag":
+                yield (
+                    f"idx_event_set_{entity}_icon_{key}",
+                    f"event_set_{entity}_icon",
+                    f"{key}, event_id",
+                )
+            yield (f"idx_event_delete_{entity}_{key}", f"event_delete_{entity}", key)
+    yield (
+        "idx_event_set_jd_directory_order_directory_id",
+        "event_set_jd_directory_order",
+        "directory_id, event_id, [order]",
+    )
+    yield (
+        "idx_event_set_jd_directory_label_directory_id",
+        "event_set_jd_directory_label",
+        "directory_id, event_id, new_label",
+    )
+    yield (
+        "idx_event_set_jd_directory_icon_directory_id",
+        "event_set_jd_directory_icon",
+        "directory_id, event_id",
+    )
+    yield (
+        "idx_event_delete_jd_directory_directory_id",
+        "event_delete_jd_directory",
+        "directory_id",
+    )
+    for action in ("add", "remove"):
+        yield (
+            f"idx_event_{action}_directory_tag_pair",
+            f"event_{action}_directory_tag",
+            "directory_id, tag_id, event_id",
+        )
+    yield (
+        "idx_state_jd_directory_tags_tag_id",
+        "state_jd_directory_tags",
+        "tag_id",
+    )
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # Every projection asks for the latest event per entity. Indexing
+    # (entity, event_id, payload) turns those lookups into index-only seeks
+    # and lets the full replay walk each table in partition order.
+    cursor = conn.cursor()
+    for name, table, columns in _indexes():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    for name, _table, _columns in _indexes():
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
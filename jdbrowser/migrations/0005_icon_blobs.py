@@ -0,0 +1,122 @@
+import hashlib
+import sqlite3
+
+ICON_ENTITIES = (
+    ("jd_area_tag", "tag_id"),
+    ("jd_id_tag", "tag_id"),
+    ("jd_ext_tag", "tag_id"),
+    ("jd_directory", "directory_id"),
+)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest() if data is not None else None
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # Icon bytes live once in blobs, keyed by their SHA-256. Icon events and
+    # the projected icon tables only carry the hash, so re-setting an icon
+    # or projecting it no longer copies the image around.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.create_function("sha256", 1, _sha256, deterministic=True)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        )
+        """
+    )
+    for entity, key in ICON_ENTITIES:
+        events = f"event_set_{entity}_icon"
+        state = f"state_{entity}_icons"
+        for table in (events, state):
+            conn.execute(
+                f"INSERT OR IGNORE INTO blobs (hash, data)\n"
+                f"SELECT sha256(icon), icon FROM {table} WHERE icon IS NOT NULL"
+            )
+
+        conn.execute(
+            f"""
+            CREATE TABLE {events}__new (
+                event_id INTEGER PRIMARY KEY,
+                {key} TEXT NOT NULL,
+                icon_hash TEXT REFERENCES blobs(hash),
+                FOREIGN KEY (event_id) REFERENCES events(event_id) ON DELETE CASCADE
+            )
+            """
+        )
+        conn.execute(
+            f"INSERT INTO {events}__new (event_id, {key}, icon_hash)\n"
+            f"SELECT event_id, {key}, sha256(icon) FROM {events}"
+        )
+        conn.execute(f"DROP TABLE {events}")
+        conn.execute(f"ALTER TABLE {events}__new RENAME TO {events}")
+        conn.execute(
+            f"CREATE INDEX idx_{events}_{key} ON {events}({key}, event_id, icon_hash)"
+        )
+        conn.execute(f"CREATE INDEX idx_{events}_icon_hash ON {events}(icon_hash)")
+
+        conn.execute(
+            f"""
+            CREATE TABLE {state}__new (
+                {key} TEXT PRIMARY KEY,
+                icon_hash TEXT
+            )
+            """
+        )
+        conn.execute(
+            f"INSERT INTO {state}__new ({key}, icon_hash)\n"
+            f"SELECT {key}, sha256(icon) FROM {state}"
+        )
+        conn.execute(f"DROP TABLE {state}")
+        conn.execute(f"ALTER TABLE {state}__new RENAME TO {state}")
+
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
+def down(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA foreign_keys = OFF")
+    for entity, key in ICON_ENTITIES:
+        events = f"event_set_{entity}_icon"
+        state = f"state_{entity}_icons"
+
+        conn.execute(
+            f"""
+            CREATE TABLE {events}__old (
+                event_id INTEGER PRIMARY KEY,
+                {key} TEXT NOT NULL,
+                icon BLOB,
+                FOREIGN KEY (event_id) REFERENCES events(event_id) ON DELETE CASCADE
+            )
+            """
+        )
+        conn.execute(
+            f"INSERT INTO {events}__old (event_id, {key}, icon)\n"
+            f"SELECT e.event_id, e.{key}, b.data FROM {events} e\n"
+            f"LEFT JOIN blobs b ON b.hash = e.icon_hash"
+        )
+        conn.execute(f"DROP TABLE {events}")
+        conn.execute(f"ALTER TABLE {events}__old RENAME TO {events}")
+        conn.execute(f"CREATE INDEX idx_{events}_{key} ON {events}({key}, event_id)")
+
+        conn.execute(
+            f"""
+            CREATE TABLE {state}__old (
+                {key} TEXT PRIMARY KEY,
+                icon BLOB
+            )
+            """
+        )
+        conn.execute(
+            f"INSERT INTO {state}__old ({key}, icon)\n"
+            f"SELECT s.{key}, b.data FROM {state} s\n"
+            f"LEFT JOIN blobs b ON b.hash = s.icon_hash"
+        )
+        conn.execute(f"DROP TABLE {state}")
+        conn.execute(f"ALTER TABLE {state}__old RENAME TO {state}")
+
+    conn.execute("DROP TABLE IF EXISTS blobs")
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = ON")
@@ -0,0 +1,23 @@
+import sqlite3
+
+ICON_EVENT_TABLES = (
+    "event_set_jd_area_tag_icon",
+    "event_set_jd_id_tag_icon",
+    "event_set_jd_ext_tag_icon",
+    "event_set_jd_directory_icon",
+)
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # Icons are stored as a downscaled rendition; source_hash records the
+    # SHA-256 of the file it was made from. NULL marks icons stored before
+    # ingest existed, which `db reencode-icons` still has to process.
+    for table in ICON_EVENT_TABLES:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN source_hash TEXT")
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    for table in ICON_EVENT_TABLES:
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN source_hash")
+    conn.commit()
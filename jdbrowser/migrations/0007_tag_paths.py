@@ -0,0 +1,32 @@
+import sqlite3
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # Every area, id and ext tag with its Johnny.Decimal code ("XX",
+    # "XX.YY" or "XX.YY+ZZZZ") and its ancestors, so resolving a code is a
+    # single lookup on idx_state_jd_tag_paths_code. The table is projected
+    # from the tag state tables; without a checkpoint it is filled by a full
+    # rebuild the next time events are projected.
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS state_jd_tag_paths (
+            tag_id TEXT PRIMARY KEY,
+            level TEXT NOT NULL,
+            code TEXT NOT NULL,
+            area_uuid TEXT,
+            id_uuid TEXT,
+            label TEXT NOT NULL,
+            full_label TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_state_jd_tag_paths_code
+            ON state_jd_tag_paths(code);
+        DELETE FROM projection_checkpoints WHERE projection = 'jd_tag_paths';
+        """
+    )
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS state_jd_tag_paths")
+    conn.execute("DELETE FROM projection_checkpoints WHERE projection = 'jd_tag_paths'")
+    conn.commit()
@@ -0,0 +1,68 @@
+import sqlite3
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # search_documents holds one row per searchable thing: a tag, a directory,
+    # or a file or markdown note inside a directory folder. search_index is an
+    # external-content FTS5 index over its title and body, kept in step by the
+    # triggers below. Tag and directory rows are projected from the state
+    # tables; file and note rows come from scanning the repository.
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS search_documents (
+            doc_id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            path TEXT NOT NULL DEFAULT '',
+            title TEXT NOT NULL,
+            body TEXT NOT NULL DEFAULT '',
+            UNIQUE(kind, ref, path)
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_documents_ref
+            ON search_documents(ref);
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title,
+            body,
+            content='search_documents',
+            content_rowid='doc_id',
+            prefix='2 3',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS search_documents_ai
+        AFTER INSERT ON search_documents BEGIN
+            INSERT INTO search_index (rowid, title, body)
+            VALUES (new.doc_id, new.title, new.body);
+        END;
+        CREATE TRIGGER IF NOT EXISTS search_documents_ad
+        AFTER DELETE ON search_documents BEGIN
+            INSERT INTO search_index (search_index, rowid, title, body)
+            VALUES ('delete', old.doc_id, old.title, old.body);
+        END;
+        CREATE TRIGGER IF NOT EXISTS search_documents_au
+        AFTER UPDATE ON search_documents BEGIN
+            INSERT INTO search_index (search_index, rowid, title, body)
+            VALUES ('delete', old.doc_id, old.title, old.body);
+            INSERT INTO search_index (rowid, title, body)
+            VALUES (new.doc_id, new.title, new.body);
+        END;
+
+        DELETE FROM projection_checkpoints WHERE projection = 'search_labels';
+        """
+    )
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        DROP TRIGGER IF EXISTS search_documents_ai;
+        DROP TRIGGER IF EXISTS search_documents_ad;
+        DROP TRIGGER IF EXISTS search_documents_au;
+        DROP TABLE IF EXISTS search_index;
+        DROP TABLE IF EXISTS search_documents;
+        DELETE FROM projection_checkpoints WHERE projection = 'search_labels';
+        """
+    )
+    conn.commit()
@@ -0,0 +1,41 @@
+import sqlite3
+
+
+def up(conn: sqlite3.Connection) -> None:
+    # An index of the files and folders under the repository root. Paths are
+    # relative to the root with "/" separators; parent is "" for the top
+    # level. repository_dirs records each folder's mtime when it was last
+    # listed, so a re-scan only lists folders whose entries changed since.
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS repository_files (
+            path TEXT PRIMARY KEY,
+            parent TEXT NOT NULL,
+            name TEXT NOT NULL,
+            is_dir INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            prefix_number TEXT,
+            prefix_code TEXT,
+            prefix_timestamp TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_repository_files_parent
+            ON repository_files(parent, name);
+        CREATE INDEX IF NOT EXISTS idx_repository_files_prefix_timestamp
+            ON repository_files(prefix_timestamp)
+            WHERE prefix_timestamp IS NOT NULL;
+
+        CREATE TABLE IF NOT EXISTS repository_dirs (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL
+        );
+        """
+    )
+    conn.commit()
+
+
+def down(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS repository_dirs")
+    conn.execute("DROP TABLE IF EXISTS repository_files")
+    conn.commit()
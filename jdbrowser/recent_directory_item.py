@@ -8,6 +8,7 @@ from .constants import (
     HOVER_COLOR,
 )
 from .flow_layout import FlowLayout
+from .renditions import icon_tile
 
 
 class RecentDirectoryItem(QtWidgets.QWidget):
@@ -29,26 +30,10 @@ class RecentDirectoryItem(QtWidgets.QWidget):
         layout.setSpacing(10)
 
         if icon_data:
-            pixmap = QtGui.QPixmap()
-            pixmap.loadFromData(icon_data)
+            pixmap = icon_tile(icon_data, 120, 75, 3)
             if not pixmap.isNull():
                 self.icon = QtWidgets.QLabel()
-                rounded_pixmap = QtGui.QPixmap(120, 75)
-                rounded_pixmap.fill(QtCore.Qt.transparent)
-                painter = QtGui.QPainter(rounded_pixmap)
-                painter.setRenderHint(QtGui.QPainter.Antialiasing)
-                path = QtGui.QPainterPath()
-                path.addRoundedRect(0, 0, 120, 75, 3, 3)
-                painter.setClipPath(path)
-                scaled = pixmap.scaled(
-                    120,
-                    75,
-                    QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                    QtCore.Qt.TransformationMode.SmoothTransformation,
-                )
-                painter.drawPixmap(0, 0, scaled)
-                painter.end()
-                self.icon.setPixmap(rounded_pixmap)
+                self.icon.setPixmap(pixmap)
                 self.icon.setFixedSize(120, 75)
                 self.icon.setContentsMargins(0, 0, 0, 0)
                 self.icon.setMargin(0)
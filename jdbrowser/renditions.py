@@ -0,0 +1,141 @@
+"""Ready-to-blit renditions of icons and thumbnails.
+
+Icons and thumbnails are drawn as fixed-size tiles with rounded corners.
+Making a tile takes a smooth rescale, a fresh image, a clip path and a
+paint, so each one is made once per source and size and then reused:
+icon blobs through icon_tile(), which keeps recent tiles in memory across
+pages, and file thumbnails through the thumbnail cache, which stores the
+encoded tile for each size it is shown at.
+
+Source pictures are read with read_image(), which has the decoder produce
+them at about the size they are needed at; a JPEG from a camera is decoded
+straight to a fraction of its resolution instead of in full and then
+scaled down.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from PySide6 import QtCore, QtGui
+
+# Icon tiles kept in memory; the least recently used are dropped first.
+ICON_TILE_CACHE_SIZE = 512
+
+_icon_tiles: OrderedDict[tuple, QtGui.QPixmap] = OrderedDict()
+
+
+def read_image(
+    source: str | bytes, width: int, height: int, crop: bool = False
+) -> QtGui.QImage:
+    """Return the image at path or in bytes source, shrunk for a width x height box.
+
+    The image is shrunk to fit the box, or with crop to cover it and cut to
+    it around its center, as it is decoded: JPEG and WebP are scaled by
+    their decoders, other formats right after decoding. Images smaller than
+    the box are returned as they are. The EXIF orientation is applied.
+    Returns a null image if source does not decode; works on QImage, so it
+    is safe on any thread.
+    """
+    if isinstance(source, bytes):
+        buffer = QtCore.QBuffer()
+        buffer.setData(source)
+        buffer.open(QtCore.QIODevice.ReadOnly)
+        reader = QtGui.QImageReader(buffer)
+    else:
+        reader = QtGui.QImageReader(source)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and not size.isEmpty():
+        # The scaled size and clip rect apply to the stored image, before
+        # the orientation is; a quarter turn swaps the box to match.
+        rotate90 = QtGui.QImageIOHandler.Transformation.TransformationRotate90
+        if reader.transformation() & rotate90:
+            width, height = height, width
+        fit = max if crop else min
+        factor = fit(width / size.width(), height / size.height())
+        if factor < 1:
+            scaled = QtCore.QSize(
+                max(1, round(size.width() * factor)),
+                max(1, round(size.height() * factor)),
+            )
+            reader.setScaledSize(scaled)
+            if crop:
+                clip = QtCore.QRect(
+                    0, 0, min(width, scaled.width()), min(height, scaled.height())
+                )
+                clip.moveCenter(QtCore.QRect(QtCore.QPoint(0, 0), scaled).center())
+                reader.setScaledClipRect(clip)
+    return reader.read()
+
+
+def render_tile(
+    image: QtGui.QImage,
+    width: int,
+    height: int,
+    radius: int,
+    centered: bool = False,
+    crop: bool = False,
+) -> QtGui.QImage:
+    """Return image drawn into a width x height tile with rounded corners.
+
+    The image is fitted into the tile, at its top left corner unless
+    centered, or with crop scaled to cover the tile and cut to it around
+    its center. Works on QImage, so it is safe on any thread.
+    """
+    scaled = image.scaled(
+        width,
+        height,
+        QtCore.Qt.AspectRatioMode.KeepAspectRatioByExpanding
+        if crop
+        else QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+        QtCore.Qt.TransformationMode.SmoothTransformation,
+    )
+    tile = QtGui.QImage(width, height, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+    tile.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(tile)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    path = QtGui.QPainterPath()
+    path.addRoundedRect(0, 0, width, height, radius, radius)
+    painter.setClipPath(path)
+    if centered or crop:
+        painter.drawImage(
+            (width - scaled.width()) // 2, (height - scaled.height()) // 2, scaled
+        )
+    else:
+        painter.drawImage(0, 0, scaled)
+    painter.end()
+    return tile
+
+
+def encode_tile(tile: QtGui.QImage) -> bytes:
+    """Return tile as PNG bytes, keeping its transparent corners."""
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    tile.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def icon_tile(
+    data: bytes, width: int, height: int, radius: int, digest: str | None = None
+) -> QtGui.QPixmap:
+    """Return the tile of icon blob data, or a null pixmap if it does not decode.
+
+    digest is the blob's hash when the caller already has it; otherwise
+    it is computed, as blobs are keyed by the SHA-256 of their bytes.
+    """
+    if digest is None:
+        digest = hashlib.sha256(data).hexdigest()
+    key = (digest, width, height, radius)
+    pixmap = _icon_tiles.get(key)
+    if pixmap is not None:
+        _icon_tiles.move_to_end(key)
+        return pixmap
+    image = QtGui.QImage.fromData(data)
+    if image.isNull():
+        pixmap = QtGui.QPixmap()
+    else:
+        pixmap = QtGui.QPixmap.fromImage(render_tile(image, width, height, radius))
+    _icon_tiles[key] = pixmap
+    while len(_icon_tiles) > ICON_TILE_CACHE_SIZE:
+        _icon_tiles.popitem(last=False)
+    return pixmap
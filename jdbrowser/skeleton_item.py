@@ -0,0 +1,33 @@
+from PySide6 import QtWidgets, QtCore
+from .constants import SLATE_COLOR, PLACEHOLDER_COLOR
+
+
+class SkeletonItem(QtWidgets.QWidget):
+    """Grey stand-in shaped like a DirectoryItem, shown while rows load."""
+
+    def __init__(self, icon_size=(240, 150), parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(
+            QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed
+        )
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.setSpacing(10)
+
+        icon = QtWidgets.QFrame()
+        icon.setFixedSize(*icon_size)
+        icon.setStyleSheet(f"background-color: {SLATE_COLOR}; border-radius: 5px;")
+        layout.addWidget(icon)
+
+        right_layout = QtWidgets.QVBoxLayout()
+        right_layout.setContentsMargins(0, 2, 0, 0)
+        right_layout.setSpacing(8)
+        for width in (260, 160):
+            bar = QtWidgets.QFrame()
+            bar.setFixedSize(width, 18)
+            bar.setStyleSheet(
+                f"background-color: {PLACEHOLDER_COLOR}; border-radius: 4px;"
+            )
+            right_layout.addWidget(bar, alignment=QtCore.Qt.AlignmentFlag.AlignLeft)
+        right_layout.addStretch(1)
+        layout.addLayout(right_layout, 1)
@@ -0,0 +1,850 @@
+"""Model, delegate and view behind the tag grids of the Area, Id and Ext pages.
+
+A page lays its tags out in sections of slots, wrapped into rows of cols
+slots, each section preceded by the headers that start it. A section
+stores only its tags; a slot without a tag is a placeholder, made when it
+is looked up. The view works out where rows go from the section sizes and
+the delegate paints the headers and slots in view, so a page costs no
+widgets per slot and nothing at all per empty slot until it is shown.
+
+Item data roles:
+
+- Qt.UserRole: the TagHeader or TagSlot of the row
+- Qt.DisplayRole: the header text, or the label under the slot
+- Qt.DecorationRole: the slot's icon, or None for a plain tile
+"""
+
+import bisect
+from difflib import SequenceMatcher
+
+from PySide6 import QtWidgets, QtCore, QtGui
+
+from .constants import (
+    BUTTON_COLOR,
+    HIGHLIGHT_COLOR,
+    HOVER_COLOR,
+    PLACEHOLDER_COLOR,
+    PLACEHOLDER_TEXT_COLOR,
+    SLATE_COLOR,
+    TEXT_COLOR,
+)
+from .file_list import ICON_HEIGHT, ICON_WIDTH
+from .renditions import icon_tile
+
+TILE_MARGIN = 2
+TILE_WIDTH = ICON_WIDTH + 2 * TILE_MARGIN
+LABEL_SPACING = 2
+TILE_SPACING = 2
+ROW_SPACING = 5
+HEADER_SPACING = 10
+SECTION_SPACING = 10
+# Left, top, right and bottom margins around the grid.
+GRID_MARGINS = (5, 15, 5, 5)
+# Rows scrolled into view are kept at least this far from the edges.
+SCROLL_MARGIN = 50
+
+
+class TagSlot:
+    """One slot of a section: a tag, or a placeholder when tag_id is None."""
+
+    __slots__ = (
+        "tag_id",
+        "name",
+        "jd_area",
+        "jd_id",
+        "jd_ext",
+        "icon_hash",
+        "icon_data",
+        "section_idx",
+        "item_idx",
+    )
+
+    def __init__(
+        self, tag_id, name, jd_area, jd_id, jd_ext, icon_hash, icon_data, section_idx, item_idx
+    ):
+        self.tag_id = tag_id
+        self.name = name if name is not None else ""
+        self.jd_area = jd_area
+        self.jd_id = jd_id
+        self.jd_ext = jd_ext
+        self.icon_hash = icon_hash
+        self.icon_data = icon_data
+        self.section_idx = section_idx
+        self.item_idx = item_idx
+
+    @property
+    def key(self) -> tuple:
+        """What the slot shows; slots with equal keys paint the same."""
+        return (self.tag_id, self.name, self.icon_hash)
+
+    @property
+    def prefix(self) -> str:
+        if self.jd_area is None:
+            return ""
+        if self.jd_id is None:
+            return f"[{self.jd_area:02d}]"
+        if self.jd_ext is None:
+            return f"[{self.jd_area:02d}.{self.jd_id:02d}]"
+        return f"[{self.jd_area:02d}.{self.jd_id:02d}+{self.jd_ext:04d}]"
+
+    def label(self, show_prefix: bool) -> str:
+        """Return the text shown under the slot."""
+        if show_prefix:
+            return self.prefix
+        return self.name if self.tag_id else ""
+
+
+class TagHeader:
+    """A header, shown above the section it starts."""
+
+    __slots__ = ("header_id", "jd_area", "jd_id", "jd_ext", "label", "section_idx", "text")
+
+    def __init__(self, header_id, jd_area, jd_id, jd_ext, label, section_idx, text):
+        self.header_id = header_id
+        self.jd_area = jd_area
+        self.jd_id = jd_id
+        self.jd_ext = jd_ext
+        self.label = label
+        self.section_idx = section_idx
+        self.text = text
+
+
+class TagSection:
+    """The slots of one section, indexed like a list.
+
+    path is the (jd_area, jd_id, jd_ext) of the first slot, as kept in a
+    page's section_paths; its last part that is set counts up along the
+    section.
+    """
+
+    def __init__(self, section_idx, path, length):
+        self.section_idx = section_idx
+        self.path = path
+        self.length = length
+        self._level = max(i for i, part in enumerate(path) if part is not None)
+        self._tags: dict[int, TagSlot] = {}
+
+    def _slot_path(self, item_idx):
+        path = list(self.path)
+        path[self._level] += item_idx
+        return path
+
+    def add_tag(self, item_idx, tag_id, name, icon_hash, icon_data) -> TagSlot:
+        slot = TagSlot(
+            tag_id,
+            name,
+            *self._slot_path(item_idx),
+            icon_hash,
+            icon_data,
+            self.section_idx,
+            item_idx,
+        )
+        self._tags[item_idx] = slot
+        return slot
+
+    def tags(self) -> list[TagSlot]:
+        """Return the slots holding a tag, in order."""
+        return [self._tags[item_idx] for item_idx in sorted(self._tags)]
+
+    def index_of(self, tag_id) -> int | None:
+        """Return the item index of tag_id's slot, or None."""
+        for item_idx, slot in self._tags.items():
+            if slot.tag_id == tag_id:
+                return item_idx
+        return None
+
+    def changed_slots(self, other: "TagSection") -> list[int]:
+        """Return the item indices, within both sections, whose slots differ in other."""
+        limit = min(self.length, other.length)
+        changed = []
+        for item_idx in self._tags.keys() | other._tags.keys():
+            if item_idx >= limit:
+                continue
+            mine = self._tags.get(item_idx)
+            theirs = other._tags.get(item_idx)
+            if (mine and mine.key) != (theirs and theirs.key):
+                changed.append(item_idx)
+        return sorted(changed)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, item_idx) -> TagSlot:
+        if item_idx < 0:
+            item_idx += self.length
+        if not 0 <= item_idx < self.length:
+            raise IndexError(item_idx)
+        slot = self._tags.get(item_idx)
+        if slot is None:
+            slot = TagSlot(
+                None, None, *self._slot_path(item_idx), None, None, self.section_idx, item_idx
+            )
+        return slot
+
+    def __iter__(self):
+        for item_idx in range(self.length):
+            yield self[item_idx]
+
+
+class TagGridModel(QtCore.QAbstractListModel):
+    """The headers and slots of a page, as one list of rows.
+
+    Each section contributes its headers, then its slots.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sections: list[TagSection] = []
+        self.headers: list[list[TagHeader]] = []
+        self.show_prefix = False
+        self._offsets = [0]
+        self._dimmed: set[tuple[int, int]] | None = None
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._offsets[-1]
+
+    def locate(self, row: int) -> tuple[int, int | None, int | None]:
+        """Return (section_idx, header_idx, item_idx) of row.
+
+        One of header_idx and item_idx is None.
+        """
+        section_idx = bisect.bisect_right(self._offsets, row) - 1
+        pos = row - self._offsets[section_idx]
+        count = len(self.headers[section_idx])
+        if pos < count:
+            return section_idx, pos, None
+        return section_idx, None, pos - count
+
+    def item(self, row: int) -> TagHeader | TagSlot | None:
+        if not 0 <= row < self._offsets[-1]:
+            return None
+        section_idx, header_idx, item_idx = self.locate(row)
+        if header_idx is not None:
+            return self.headers[section_idx][header_idx]
+        return self.sections[section_idx][item_idx]
+
+    def header_row(self, section_idx: int, header_idx: int) -> int:
+        return self._offsets[section_idx] + header_idx
+
+    def slot_row(self, section_idx: int, item_idx: int) -> int:
+        return self._offsets[section_idx] + len(self.headers[section_idx]) + item_idx
+
+    def slot_index(self, section_idx: int, item_idx: int) -> QtCore.QModelIndex:
+        return self.index(self.slot_row(section_idx, item_idx))
+
+    def flags(self, index):
+        item = self.item(index.row()) if index.isValid() else None
+        if item is None:
+            return QtCore.Qt.NoItemFlags
+        if isinstance(item, TagHeader):
+            return QtCore.Qt.ItemIsEnabled
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if item.tag_id is not None:
+            flags |= QtCore.Qt.ItemIsDragEnabled
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        item = self.item(index.row()) if index.isValid() else None
+        if item is None:
+            return None
+        if role == QtCore.Qt.UserRole:
+            return item
+        if isinstance(item, TagHeader):
+            return item.text if role == QtCore.Qt.DisplayRole else None
+        if role == QtCore.Qt.DisplayRole:
+            return item.label(self.show_prefix)
+        if role == QtCore.Qt.DecorationRole:
+            return self._icon(item)
+        return None
+
+    def _icon(self, slot: TagSlot) -> QtGui.QPixmap | None:
+        if not slot.icon_data:
+            return None
+        pixmap = icon_tile(slot.icon_data, ICON_WIDTH, ICON_HEIGHT, 5, slot.icon_hash)
+        return None if pixmap.isNull() else pixmap
+
+    def is_dimmed(self, row: int) -> bool:
+        if self._dimmed is None or not 0 <= row < self._offsets[-1]:
+            return False
+        section_idx, header_idx, item_idx = self.locate(row)
+        return header_idx is None and (section_idx, item_idx) not in self._dimmed
+
+    def set_dimmed(self, matches) -> None:
+        """Paint every slot but matches, (section_idx, item_idx) pairs, faded.
+
+        None paints every slot normally.
+        """
+        self._dimmed = None if matches is None else set(matches)
+        self._all_changed()
+
+    def set_show_prefix(self, show_prefix: bool) -> None:
+        self.show_prefix = show_prefix
+        self._all_changed()
+
+    def set_sections(self, sections: list[TagSection], headers: list[list[TagHeader]]) -> None:
+        """Show sections, with headers[s] above section s."""
+        self.beginResetModel()
+        self.sections = sections
+        self.headers = headers
+        self._dimmed = None
+        self._reoffset()
+        self.endResetModel()
+
+    def apply_sections(
+        self, sections: list[TagSection], headers: list[list[TagHeader]]
+    ) -> None:
+        """Turn the rows into those of sections, touching only rows that differ.
+
+        Sections are matched by path. A matched section keeps its rows:
+        slots whose key changed are repainted, slots past the end of the
+        shorter of the two are inserted or removed, and its headers are
+        diffed by id and text. Unmatched sections are removed or inserted
+        whole. An empty model is simply reset.
+        """
+        if not self.sections:
+            self.set_sections(sections, headers)
+            return
+        was_dimmed = self._dimmed is not None
+        self._dimmed = None
+        old_paths = [section.path for section in self.sections]
+        self.sections = list(self.sections)
+        self.headers = [list(section_headers) for section_headers in self.headers]
+        matcher = SequenceMatcher(
+            None, old_paths, [section.path for section in sections], autojunk=False
+        )
+        # Apply from the bottom up so earlier row numbers stay valid.
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                for offset in reversed(range(i2 - i1)):
+                    self._apply_section(i1 + offset, sections[j1 + offset], headers[j1 + offset])
+                continue
+            if i2 > i1:
+                first, last = self._offsets[i1], self._offsets[i2] - 1
+                self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+                del self.sections[i1:i2]
+                del self.headers[i1:i2]
+                self._reoffset()
+                self.endRemoveRows()
+            if j2 > j1:
+                first = self._offsets[i1]
+                count = sum(len(headers[j]) + len(sections[j]) for j in range(j1, j2))
+                self.beginInsertRows(QtCore.QModelIndex(), first, first + count - 1)
+                self.sections[i1:i1] = sections[j1:j2]
+                self.headers[i1:i1] = [list(section_headers) for section_headers in headers[j1:j2]]
+                self._reoffset()
+                self.endInsertRows()
+        self.sections = sections
+        self.headers = headers
+        if was_dimmed:
+            self._all_changed()
+
+    def _apply_section(
+        self, section_idx: int, section: TagSection, section_headers: list[TagHeader]
+    ) -> None:
+        """Turn the rows of section_idx into those of section and section_headers."""
+        old = self.sections[section_idx]
+        start = self._offsets[section_idx] + len(self.headers[section_idx])
+        changed = old.changed_slots(section)
+        if section.length > old.length:
+            self.beginInsertRows(
+                QtCore.QModelIndex(), start + old.length, start + section.length - 1
+            )
+            self.sections[section_idx] = section
+            self._reoffset()
+            self.endInsertRows()
+        elif section.length < old.length:
+            self.beginRemoveRows(
+                QtCore.QModelIndex(), start + section.length, start + old.length - 1
+            )
+            self.sections[section_idx] = section
+            self._reoffset()
+            self.endRemoveRows()
+        else:
+            self.sections[section_idx] = section
+        for item_idx in changed:
+            index = self.index(start + item_idx)
+            self.dataChanged.emit(index, index)
+
+        current = self.headers[section_idx]
+        matcher = SequenceMatcher(
+            None,
+            [(header.header_id, header.text) for header in current],
+            [(header.header_id, header.text) for header in section_headers],
+            autojunk=False,
+        )
+        first = self._offsets[section_idx]
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            reused = min(i2 - i1, j2 - j1)
+            if reused:
+                current[i1:i1 + reused] = section_headers[j1:j1 + reused]
+                self.dataChanged.emit(
+                    self.index(first + i1), self.index(first + i1 + reused - 1)
+                )
+            start = i1 + reused
+            if i2 > start:
+                self.beginRemoveRows(QtCore.QModelIndex(), first + start, first + i2 - 1)
+                del current[start:i2]
+                self._reoffset()
+                self.endRemoveRows()
+            if j2 > j1 + reused:
+                self.beginInsertRows(
+                    QtCore.QModelIndex(), first + start, first + start + j2 - j1 - reused - 1
+                )
+                current[start:start] = section_headers[j1 + reused:j2]
+                self._reoffset()
+                self.endInsertRows()
+        self.headers[section_idx] = list(section_headers)
+
+    def _reoffset(self) -> None:
+        self._offsets = [0]
+        for section, section_headers in zip(self.sections, self.headers):
+            self._offsets.append(self._offsets[-1] + len(section_headers) + len(section))
+
+    def _all_changed(self) -> None:
+        if self._offsets[-1]:
+            self.dataChanged.emit(self.index(0), self.index(self._offsets[-1] - 1))
+
+
+class TagGridDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints the headers and slots of a TagGridModel."""
+
+    def _label_font(self, font: QtGui.QFont) -> QtGui.QFont:
+        font = QtGui.QFont(font)
+        font.setPointSize(int(font.pointSize() * 0.9))
+        return font
+
+    def _header_font(self, font: QtGui.QFont) -> QtGui.QFont:
+        font = QtGui.QFont(font)
+        font.setPointSize(int(font.pointSize() * 0.75))
+        font.setBold(True)
+        return font
+
+    def tile_size(self, font: QtGui.QFont) -> QtCore.QSize:
+        label_height = QtGui.QFontMetrics(self._label_font(font)).height()
+        return QtCore.QSize(
+            TILE_WIDTH, 2 * TILE_MARGIN + ICON_HEIGHT + LABEL_SPACING + label_height
+        )
+
+    def header_height(self, font: QtGui.QFont) -> int:
+        return QtGui.QFontMetrics(self._header_font(font)).height() + 3
+
+    def sizeHint(self, option, index):
+        if isinstance(index.data(QtCore.Qt.UserRole), TagHeader):
+            return QtCore.QSize(option.rect.width(), self.header_height(option.font))
+        return self.tile_size(option.font)
+
+    def paint(self, painter, option, index):
+        item = index.data(QtCore.Qt.UserRole)
+        if item is None:
+            return
+        painter.save()
+        rect = option.rect
+        if isinstance(item, TagHeader):
+            painter.fillRect(rect, QtGui.QColor(BUTTON_COLOR))
+            font = self._header_font(option.font)
+            painter.setFont(font)
+            painter.setPen(QtGui.QColor("black"))
+            text_rect = rect.adjusted(5, 0, -5, 0)
+            text = QtGui.QFontMetrics(font).elidedText(
+                index.data(QtCore.Qt.DisplayRole),
+                QtCore.Qt.TextElideMode.ElideRight,
+                text_rect.width(),
+            )
+            painter.drawText(
+                text_rect,
+                QtCore.Qt.AlignmentFlag.AlignLeft | QtCore.Qt.AlignmentFlag.AlignVCenter,
+                text,
+            )
+            painter.restore()
+            return
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtCore.Qt.NoPen)
+        if option.state & QtWidgets.QStyle.StateFlag.State_Selected:
+            painter.setBrush(QtGui.QColor(HIGHLIGHT_COLOR))
+            painter.drawRoundedRect(rect, 5, 5)
+        elif option.state & QtWidgets.QStyle.StateFlag.State_MouseOver:
+            painter.setBrush(QtGui.QColor(HOVER_COLOR))
+            painter.drawRoundedRect(rect, 5, 5)
+        if index.model().is_dimmed(index.row()):
+            painter.setOpacity(0.4)
+        icon_rect = QtCore.QRect(
+            rect.left() + TILE_MARGIN, rect.top() + TILE_MARGIN, ICON_WIDTH, ICON_HEIGHT
+        )
+        pixmap = index.data(QtCore.Qt.DecorationRole)
+        if pixmap is not None:
+            painter.drawPixmap(icon_rect.topLeft(), pixmap)
+        else:
+            color = PLACEHOLDER_COLOR if item.tag_id is None else SLATE_COLOR
+            painter.setBrush(QtGui.QColor(color))
+            painter.drawRoundedRect(icon_rect, 5, 5)
+        label_top = icon_rect.bottom() + 1 + LABEL_SPACING
+        label_rect = QtCore.QRect(
+            icon_rect.left(), label_top, ICON_WIDTH, rect.bottom() - TILE_MARGIN - label_top + 1
+        )
+        font = self._label_font(option.font)
+        painter.setFont(font)
+        color = PLACEHOLDER_TEXT_COLOR if item.tag_id is None else TEXT_COLOR
+        painter.setPen(QtGui.QColor(color))
+        text = QtGui.QFontMetrics(font).elidedText(
+            index.data(QtCore.Qt.DisplayRole),
+            QtCore.Qt.TextElideMode.ElideRight,
+            label_rect.width(),
+        )
+        painter.drawText(
+            label_rect,
+            QtCore.Qt.AlignmentFlag.AlignHCenter | QtCore.Qt.AlignmentFlag.AlignVCenter,
+            text,
+        )
+        painter.restore()
+
+
+class TagGridView(QtWidgets.QAbstractItemView):
+    """Lays the sections of a TagGridModel out in rows of cols slots.
+
+    Only headers and slots intersecting the viewport are painted. The page
+    keeps the selection itself and shows it with set_current(); presses,
+    double-clicks, context requests and drops are reported as signals.
+    Presses are also passed on to the page, as the slot widgets this
+    replaces did.
+    """
+
+    slotPressed = QtCore.Signal(int, int)
+    slotActivated = QtCore.Signal(int, int)
+    slotContextRequested = QtCore.Signal(int, int)
+    headerContextRequested = QtCore.Signal(object)
+    # The dragged tag_id and the TagSlot it was dropped on.
+    tagDropped = QtCore.Signal(str, object)
+
+    def __init__(self, cols, parent=None):
+        super().__init__(parent)
+        self.cols = cols
+        # Layout state comes first: Qt already calls indexAt() and the other
+        # overrides while the view is being configured below.
+        # (top, height, section_idx, header_idx) of each header and each
+        # block of slots, top to bottom; header_idx is None for slots.
+        self._bands: list[tuple[int, int, int, int | None]] = []
+        self._band_tops: list[int] = []
+        self._section_bands: list[int] = []
+        self._content_size = QtCore.QSize(0, 0)
+        self._tile_size = QtCore.QSize(TILE_WIDTH, ICON_HEIGHT)
+        self._header_height = 0
+        self._hover_row = -1
+        self._press_pos = None
+        self._press_row = -1
+        self.tag_model = TagGridModel(self)
+        self.setModel(self.tag_model)
+        self.setItemDelegate(TagGridDelegate(self))
+        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
+        self.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.viewport().setMouseTracking(True)
+        self.viewport().setAcceptDrops(True)
+        self.setAcceptDrops(True)
+        self.tag_model.modelReset.connect(self._relayout)
+        self.tag_model.rowsInserted.connect(self._relayout)
+        self.tag_model.rowsRemoved.connect(self._relayout)
+
+    def set_current(self, section_idx: int, item_idx: int) -> None:
+        """Show the slot as selected and scroll it into view."""
+        index = self.tag_model.slot_index(section_idx, item_idx)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
+
+    def _relayout(self, *_args) -> None:
+        delegate = self.itemDelegate()
+        self._tile_size = delegate.tile_size(self.font())
+        self._header_height = delegate.header_height(self.font())
+        self._hover_row = -1
+        model = self.tag_model
+        left, top, right, bottom = GRID_MARGINS
+        step = self._tile_size.height() + ROW_SPACING
+        bands = []
+        section_bands = []
+        y = top
+        for section_idx, section in enumerate(model.sections):
+            section_bands.append(len(bands))
+            for header_idx in range(len(model.headers[section_idx])):
+                bands.append((y, self._header_height, section_idx, header_idx))
+                y += self._header_height + HEADER_SPACING
+            rows = -(-len(section) // self.cols)
+            height = max(0, rows * step - ROW_SPACING)
+            bands.append((y, height, section_idx, None))
+            y += height + SECTION_SPACING
+        if bands:
+            y -= SECTION_SPACING
+        self._bands = bands
+        self._band_tops = [band[0] for band in bands]
+        self._section_bands = section_bands
+        width = left + self.cols * (TILE_WIDTH + TILE_SPACING) - TILE_SPACING + right
+        self._content_size = QtCore.QSize(width, y + bottom)
+        self.updateGeometries()
+        self.viewport().update()
+
+    def _content_width(self) -> int:
+        return max(self._content_size.width(), self.viewport().width())
+
+    def _content_rect(self, row: int) -> QtCore.QRect:
+        """Return the rect of row, in content coordinates."""
+        model = self.tag_model
+        if not 0 <= row < model.rowCount():
+            return QtCore.QRect()
+        section_idx, header_idx, item_idx = model.locate(row)
+        if section_idx >= len(self._section_bands):
+            return QtCore.QRect()
+        band = self._section_bands[section_idx]
+        left, _top, right, _bottom = GRID_MARGINS
+        if header_idx is not None:
+            top = self._bands[band + header_idx][0]
+            return QtCore.QRect(
+                left, top, self._content_width() - left - right, self._header_height
+            )
+        top = self._bands[band + len(model.headers[section_idx])][0]
+        row_idx, col = divmod(item_idx, self.cols)
+        return QtCore.QRect(
+            left + col * (TILE_WIDTH + TILE_SPACING),
+            top + row_idx * (self._tile_size.height() + ROW_SPACING),
+            TILE_WIDTH,
+            self._tile_size.height(),
+        )
+
+    def updateGeometries(self):
+        viewport = self.viewport().size()
+        vbar = self.verticalScrollBar()
+        vbar.setSingleStep(20)
+        vbar.setPageStep(viewport.height())
+        vbar.setRange(0, max(0, self._content_size.height() - viewport.height()))
+        hbar = self.horizontalScrollBar()
+        hbar.setSingleStep(20)
+        hbar.setPageStep(viewport.width())
+        hbar.setRange(0, max(0, self._content_size.width() - viewport.width()))
+        super().updateGeometries()
+
+    def visualRect(self, index):
+        if not index.isValid():
+            return QtCore.QRect()
+        rect = self._content_rect(index.row())
+        return rect.translated(-self.horizontalOffset(), -self.verticalOffset())
+
+    def indexAt(self, point):
+        model = self.tag_model
+        x = point.x() + self.horizontalOffset()
+        y = point.y() + self.verticalOffset()
+        band = bisect.bisect_right(self._band_tops, y) - 1
+        if band < 0:
+            return QtCore.QModelIndex()
+        top, height, section_idx, header_idx = self._bands[band]
+        left, _top, right, _bottom = GRID_MARGINS
+        if y >= top + height or x < left:
+            return QtCore.QModelIndex()
+        if header_idx is not None:
+            if x >= self._content_width() - right:
+                return QtCore.QModelIndex()
+            return model.index(model.header_row(section_idx, header_idx))
+        row_idx, dy = divmod(y - top, self._tile_size.height() + ROW_SPACING)
+        col, dx = divmod(x - left, TILE_WIDTH + TILE_SPACING)
+        if dy >= self._tile_size.height() or dx >= TILE_WIDTH or col >= self.cols:
+            return QtCore.QModelIndex()
+        item_idx = row_idx * self.cols + col
+        if item_idx >= len(model.sections[section_idx]):
+            return QtCore.QModelIndex()
+        return model.slot_index(section_idx, item_idx)
+
+    def scrollTo(self, index, hint=QtWidgets.QAbstractItemView.ScrollHint.EnsureVisible):
+        rect = self._content_rect(index.row()) if index.isValid() else QtCore.QRect()
+        if not rect.isValid():
+            return
+        vbar = self.verticalScrollBar()
+        height = self.viewport().height()
+        if hint == QtWidgets.QAbstractItemView.ScrollHint.PositionAtCenter:
+            vbar.setValue(rect.center().y() - height // 2)
+        elif hint == QtWidgets.QAbstractItemView.ScrollHint.PositionAtTop:
+            vbar.setValue(rect.top())
+        elif hint == QtWidgets.QAbstractItemView.ScrollHint.PositionAtBottom:
+            vbar.setValue(rect.bottom() + 1 - height)
+        else:
+            margin = min(SCROLL_MARGIN, max(0, (height - rect.height()) // 2))
+            if rect.top() - margin < vbar.value():
+                vbar.setValue(rect.top() - margin)
+            elif rect.bottom() + 1 + margin > vbar.value() + height:
+                vbar.setValue(rect.bottom() + 1 + margin - height)
+        hbar = self.horizontalScrollBar()
+        width = self.viewport().width()
+        margin = min(SCROLL_MARGIN, max(0, (width - rect.width()) // 2))
+        if rect.left() - margin < hbar.value():
+            hbar.setValue(rect.left() - margin)
+        elif rect.right() + 1 + margin > hbar.value() + width:
+            hbar.setValue(rect.right() + 1 + margin - width)
+
+    def moveCursor(self, cursorAction, modifiers):
+        # Keyboard navigation belongs to the page.
+        return self.currentIndex()
+
+    def horizontalOffset(self):
+        return self.horizontalScrollBar().value()
+
+    def verticalOffset(self):
+        return self.verticalScrollBar().value()
+
+    def isIndexHidden(self, index):
+        return False
+
+    def setSelection(self, rect, command):
+        pass
+
+    def visualRegionForSelection(self, selection):
+        return QtGui.QRegion()
+
+    def paintEvent(self, event):
+        model = self.tag_model
+        delegate = self.itemDelegate()
+        dx, dy = self.horizontalOffset(), self.verticalOffset()
+        area = event.rect().translated(dx, dy)
+        current = self.currentIndex()
+        current_row = current.row() if current.isValid() else -1
+        base = QtWidgets.QStyleOptionViewItem()
+        self.initViewItemOption(base)
+        step = self._tile_size.height() + ROW_SPACING
+        painter = QtGui.QPainter(self.viewport())
+        band = max(0, bisect.bisect_right(self._band_tops, area.top()) - 1)
+        while band < len(self._bands) and self._bands[band][0] <= area.bottom():
+            top, height, section_idx, header_idx = self._bands[band]
+            band += 1
+            if top + height <= area.top():
+                continue
+            if header_idx is not None:
+                rows = [model.header_row(section_idx, header_idx)]
+            else:
+                first = max(0, (area.top() - top) // step) * self.cols
+                last = min(
+                    len(model.sections[section_idx]),
+                    ((area.bottom() - top) // step + 1) * self.cols,
+                )
+                start = model.slot_row(section_idx, 0)
+                rows = range(start + first, start + last)
+            for row in rows:
+                option = QtWidgets.QStyleOptionViewItem(base)
+                option.rect = self._content_rect(row).translated(-dx, -dy)
+                if row == current_row:
+                    option.state |= QtWidgets.QStyle.StateFlag.State_Selected
+                if row == self._hover_row:
+                    option.state |= QtWidgets.QStyle.StateFlag.State_MouseOver
+                delegate.paint(painter, option, model.index(row))
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateGeometries()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QtCore.QEvent.Type.FontChange:
+            self._relayout()
+
+    def viewportEvent(self, event):
+        if event.type() == QtCore.QEvent.Type.Leave:
+            self._set_hover(QtCore.QModelIndex())
+        return super().viewportEvent(event)
+
+    def _set_hover(self, index: QtCore.QModelIndex) -> None:
+        item = index.data(QtCore.Qt.UserRole) if index.isValid() else None
+        row = index.row() if isinstance(item, TagSlot) else -1
+        if row == self._hover_row:
+            return
+        for old in (self._hover_row, row):
+            if old >= 0:
+                self.viewport().update(self.visualRect(self.tag_model.index(old)))
+        self._hover_row = row
+        if row >= 0:
+            self.viewport().setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.PointingHandCursor))
+        else:
+            self.viewport().setCursor(QtGui.QCursor(QtCore.Qt.CursorShape.ArrowCursor))
+
+    def _item_at(self, pos: QtCore.QPoint):
+        index = self.indexAt(pos)
+        return index, index.data(QtCore.Qt.UserRole) if index.isValid() else None
+
+    def mousePressEvent(self, event):
+        pos = event.position().toPoint()
+        index, item = self._item_at(pos)
+        self._press_pos = None
+        if isinstance(item, TagSlot):
+            if event.button() == QtCore.Qt.LeftButton:
+                if item.tag_id is not None:
+                    self._press_pos = pos
+                    self._press_row = index.row()
+                self.slotPressed.emit(item.section_idx, item.item_idx)
+            elif event.button() == QtCore.Qt.RightButton:
+                self.slotPressed.emit(item.section_idx, item.item_idx)
+                self.slotContextRequested.emit(item.section_idx, item.item_idx)
+        elif isinstance(item, TagHeader) and event.button() == QtCore.Qt.RightButton:
+            self.headerContextRequested.emit(item)
+        # Let the page see the press too; it ends search mode on any click.
+        event.ignore()
+
+    def mouseMoveEvent(self, event):
+        pos = event.position().toPoint()
+        if self._press_pos is not None and event.buttons() & QtCore.Qt.LeftButton:
+            if (
+                pos - self._press_pos
+            ).manhattanLength() >= QtWidgets.QApplication.startDragDistance():
+                press_pos, self._press_pos = self._press_pos, None
+                self._start_drag(self._press_row, press_pos)
+            return
+        self._set_hover(self.indexAt(pos))
+
+    def mouseReleaseEvent(self, event):
+        self._press_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        _index, item = self._item_at(event.position().toPoint())
+        if isinstance(item, TagSlot) and event.button() == QtCore.Qt.LeftButton:
+            self.slotPressed.emit(item.section_idx, item.item_idx)
+            self.slotActivated.emit(item.section_idx, item.item_idx)
+
+    def _start_drag(self, row: int, press_pos: QtCore.QPoint) -> None:
+        index = self.tag_model.index(row)
+        slot = index.data(QtCore.Qt.UserRole)
+        if not isinstance(slot, TagSlot) or slot.tag_id is None:
+            return
+        drag = QtGui.QDrag(self)
+        mime = QtCore.QMimeData()
+        mime.setText(slot.tag_id)
+        drag.setMimeData(mime)
+        rect = self.visualRect(index)
+        pixmap = self.viewport().grab(rect)
+        if not pixmap.isNull():
+            transparent = QtGui.QPixmap(pixmap.size())
+            transparent.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(transparent)
+            painter.setOpacity(0.6)
+            painter.drawPixmap(0, 0, pixmap)
+            painter.end()
+            drag.setPixmap(transparent)
+            drag.setHotSpot(press_pos - rect.topLeft())
+        drag.exec(QtCore.Qt.MoveAction)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasText():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        _index, item = self._item_at(event.position().toPoint())
+        if event.mimeData().hasText() and isinstance(item, TagSlot):
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        _index, item = self._item_at(event.position().toPoint())
+        if event.mimeData().hasText() and isinstance(item, TagSlot):
+            self.tagDropped.emit(event.mimeData().text(), item)
+            event.acceptProposedAction()
+        else:
+            event.ignore()
@@ -1,5 +1,6 @@
-from difflib import get_close_matches
 from PySide6 import QtWidgets, QtCore, QtGui
+from .database_worker import database_worker
+from .fuzzy import FuzzyMatcher
 from .constants import (
     TEXT_COLOR,
     TAG_COLOR,
@@ -86,8 +87,9 @@ class TagSearchOverlay(QtWidgets.QFrame):
         self.item_height = QtGui.QFontMetrics(QtGui.QFont("FiraCode Nerd Font", 18)).height() + 16
         self.max_results = 5
 
-        self.all_labels = []
         self.label_map = {}
+        self.matcher = FuzzyMatcher([])
+        self._labels_future = None
 
         self.input.textChanged.connect(self.update_results)
         self.input.installEventFilter(self)
@@ -96,6 +98,9 @@ class TagSearchOverlay(QtWidgets.QFrame):
         if label_rows is None:
             self._load_labels()
         else:
+            if self._labels_future is not None:
+                self._labels_future.cancel()
+                self._labels_future = None
             self._set_labels(label_rows)
         self.input.clear()
         self.update_results("")
@@ -111,23 +116,32 @@ class TagSearchOverlay(QtWidgets.QFrame):
             self.move(x, y)
 
     def _load_labels(self):
-        cursor = self.conn.cursor()
+        if self._labels_future is not None:
+            self._labels_future.cancel()
+        self._labels_future = database_worker().query(self._fetch_labels)
+        self._labels_future.then(self._labels_loaded)
+
+    @staticmethod
+    def _fetch_labels(conn):
+        cursor = conn.cursor()
         cursor.execute("SELECT tag_id, label FROM state_jd_ext_tags")
-        rows = [(r[0], r[1]) for r in cursor.fetchall() if r[1]]
+        return [(r[0], r[1]) for r in cursor.fetchall() if r[1]]
+
+    def _labels_loaded(self, rows):
+        self._labels_future = None
         self._set_labels(rows)
+        self.update_results(self.input.text())
 
     def _set_labels(self, rows):
         self.label_map = {
             lbl.lower(): (lbl, tag_id)
             for tag_id, lbl in sorted(rows, key=lambda s: s[1].lower())
         }
-        self.all_labels = list(self.label_map.keys())
+        self.matcher = FuzzyMatcher(self.label_map.keys())
 
     def update_results(self, text):
         if text:
-            matches_lower = get_close_matches(
-                text.lower(), self.all_labels, n=self.max_results, cutoff=0
-            )
+            matches_lower = self.matcher.match(text.lower(), self.max_results)
             results = [self.label_map[m] for m in matches_lower]
         else:
             results = list(self.label_map.values())[: self.max_results]
@@ -0,0 +1,239 @@
+"""Size-bounded cache of file thumbnails in a single SQLite file.
+
+Thumbnails used to be one PNG per file under $XDG_CACHE_HOME/jdbrowser,
+named after the path and mtime, which left an orphan behind on every
+rename or edit and was never trimmed. They are now rows of
+thumbnails.db in the same folder.
+
+A row is one rendition of a file: the finished tile at one display
+size, rounded corners included, so a hit is decoded and drawn as is.
+Rows are keyed by that size and by the file's device, inode, size and
+mtime, as returned by cache_key(), so a renamed or moved file keeps its
+thumbnails and an edited one gets new ones. The path is kept next to the
+key for cache-gc. get_many() fetches any number of thumbnails at one
+size with one query. Each hit refreshes the row's last_used, and put()
+evicts the least recently used rows once the stored bytes exceed the
+budget.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from .config import read_thumbnail_cache_bytes
+
+BUSY_TIMEOUT_MS = 5000
+
+# Bumped whenever the layout of the rows changes; a cache of another
+# version is emptied, as its rows can simply be made again.
+SCHEMA_VERSION = 2
+
+# Rows removed per statement while trimming the cache to its budget.
+EVICT_BATCH = 64
+
+_cache = None
+
+
+def cache_dir():
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(xdg_cache_home, "jdbrowser")
+
+
+def cache_key(path):
+    """Return the cache key of the file at path, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class ThumbnailCache:
+    """Encoded thumbnails keyed by cache_key(), shared by worker threads."""
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._idle = queue.LifoQueue()
+        with self._connection() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(
+                    """
+                    DROP TABLE IF EXISTS thumbnails;
+                    DROP TABLE IF EXISTS thumbnail_bytes;
+                    """
+                )
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    key TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (key, width, height)
+                );
+                CREATE INDEX IF NOT EXISTS idx_thumbnails_last_used
+                    ON thumbnails(last_used);
+
+                -- Running total of the stored bytes, so put() can tell
+                -- whether to evict without summing the table.
+                CREATE TABLE IF NOT EXISTS thumbnail_bytes (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO thumbnail_bytes VALUES (
+                    0, (SELECT COALESCE(SUM(size), 0) FROM thumbnails)
+                );
+                CREATE TRIGGER IF NOT EXISTS thumbnails_insert
+                AFTER INSERT ON thumbnails BEGIN
+                    UPDATE thumbnail_bytes SET total = total + NEW.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS thumbnails_update
+                AFTER UPDATE OF size ON thumbnails BEGIN
+                    UPDATE thumbnail_bytes SET total = total + NEW.size - OLD.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS thumbnails_delete
+                AFTER DELETE ON thumbnails BEGIN
+                    UPDATE thumbnail_bytes SET total = total - OLD.size;
+                END;
+                """
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def get_many(self, keys, width, height):
+        """Return {key: data} for the keys cached at width x height."""
+        keys = json.dumps(list(keys))
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT t.key, t.data FROM json_each(?) j JOIN thumbnails t "
+                "ON t.key = j.value AND t.width = ? AND t.height = ?",
+                (keys, width, height),
+            ).fetchall()
+            if rows:
+                conn.execute(
+                    "UPDATE thumbnails SET last_used = ? "
+                    "WHERE width = ? AND height = ? AND key IN "
+                    "(SELECT value FROM json_each(?))",
+                    (
+                        time.time_ns(),
+                        width,
+                        height,
+                        json.dumps([key for key, _data in rows]),
+                    ),
+                )
+        return dict(rows)
+
+    def put(self, key, width, height, path, data):
+        with self._connection() as conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit
+            # delete would not fire the byte-count trigger.
+            conn.execute(
+                "INSERT INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key, width, height) DO UPDATE SET "
+                "path = excluded.path, size = excluded.size, "
+                "last_used = excluded.last_used, data = excluded.data",
+                (key, width, height, path, len(data), time.time_ns(), data),
+            )
+            self._evict(conn, self.max_bytes)
+
+    def _evict(self, conn, max_bytes):
+        """Delete least recently used rows until at most max_bytes are stored."""
+        evicted = 0
+        while conn.execute("SELECT total FROM thumbnail_bytes").fetchone()[0] > max_bytes:
+            cursor = conn.execute(
+                "DELETE FROM thumbnails WHERE rowid IN "
+                "(SELECT rowid FROM thumbnails ORDER BY last_used LIMIT ?)",
+                (EVICT_BATCH,),
+            )
+            if not cursor.rowcount:
+                break
+            evicted += cursor.rowcount
+        return evicted
+
+    def stats(self):
+        with self._connection() as conn:
+            entries, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(last_used) FROM thumbnails"
+            ).fetchone()
+            total = conn.execute("SELECT total FROM thumbnail_bytes").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "file_bytes": os.path.getsize(self.db_path),
+            "oldest_use": oldest / 1e9 if oldest is not None else None,
+        }
+
+    def gc(self):
+        """Drop rows whose file is gone or changed, then trim to the budget.
+
+        Returns (stale, evicted), the number of rows removed for each
+        reason.
+        """
+        with self._connection() as conn:
+            rows = conn.execute("SELECT DISTINCT key, path FROM thumbnails").fetchall()
+            stale = [key for key, path in rows if cache_key(path) != key]
+            conn.execute(
+                "DELETE FROM thumbnails WHERE key IN (SELECT value FROM json_each(?))",
+                (json.dumps(stale),),
+            )
+            evicted = self._evict(conn, self.max_bytes)
+        with self._connection() as conn:
+            conn.execute("VACUUM")
+        return len(stale), evicted
+
+
+def remove_legacy_files(directory):
+    """Delete the per-file PNG thumbnails of older versions; return how many."""
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return 0
+    with entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext == ".png" and len(stem) == 64 and entry.is_file():
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+def thumbnail_cache():
+    """Return the application's ThumbnailCache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        directory = cache_dir()
+        os.makedirs(directory, exist_ok=True)
+        _cache = ThumbnailCache(
+            os.path.join(directory, "thumbnails.db"), read_thumbnail_cache_bytes()
+        )
+    return _cache
@@ -0,0 +1,246 @@
+"""Thumbnail loading for the directory page, on a pool of worker threads.
+
+Rows ask for a thumbnail the first time they are painted. The paths
+requested together, typically a screenful, are first looked up with one
+probe(paths) call on the pool, which returns the thumbnails that are
+already cached. The others wait in the scheduler rather than in the
+thread pool until load(path) makes them, so the next one to run
+is picked only when a worker frees up, against the viewport as it is at
+that moment: paths on screen first, top to bottom, then the most recently
+requested. Scrolling therefore re-prioritizes the queue without any
+bookkeeping on the page's side.
+
+Requests for rows that no longer exist are dropped with retain() or
+clear(). A load already running cannot be interrupted; it finishes on its
+worker and its result is discarded.
+
+probe() and load() run on worker threads, where QPixmap must not be
+used, so they return QImage; the scheduler turns each image into the
+pixmap it emits on its own thread.
+"""
+
+import time
+import weakref
+
+from PySide6 import QtCore, QtGui
+from shiboken6 import isValid
+
+
+class _ProbeJob(QtCore.QRunnable):
+    def __init__(self, scheduler, paths):
+        super().__init__()
+        self.scheduler_ref = weakref.ref(scheduler)
+        self.paths = paths
+
+    def run(self):
+        scheduler = self.scheduler_ref()
+        if not scheduler or not isValid(scheduler):
+            return
+        try:
+            hits = scheduler.probe(self.paths)
+        except Exception as exc:
+            print(f"Error reading cached thumbnails: {exc}")
+            hits = {}
+        if isValid(scheduler):
+            scheduler._probeDone.emit(self.paths, hits)
+
+
+class _ThumbnailJob(QtCore.QRunnable):
+    def __init__(self, scheduler, path):
+        super().__init__()
+        self.scheduler_ref = weakref.ref(scheduler)
+        self.path = path
+
+    def run(self):
+        scheduler = self.scheduler_ref()
+        if not scheduler or not isValid(scheduler):
+            return
+        try:
+            image = scheduler.load(self.path)
+        except Exception as exc:
+            print(f"Error generating thumbnail for {self.path}: {exc}")
+            image = None
+        if isValid(scheduler):
+            # Delivered to the scheduler's thread through a queued connection.
+            scheduler._jobDone.emit(self.path, image)
+
+
+class ThumbnailScheduler(QtCore.QObject):
+    """Runs load(path) for requested paths, visible ones first.
+
+    load(path) returns a QImage or None, and probe(paths), if given,
+    returns {path: image} for the paths that need no load. visible()
+    returns the paths currently on screen, top to bottom. Nothing runs
+    until start() is called, so a page can queue the requests of its first
+    paint before it is shown.
+    """
+
+    # Emitted on the scheduler's thread for each load that was not cancelled.
+    loaded = QtCore.Signal(str, QtGui.QPixmap)
+    # Emitted with stats() when the last queued load has finished.
+    drained = QtCore.Signal(object)
+
+    _jobDone = QtCore.Signal(str, object)
+    _probeDone = QtCore.Signal(object, object)
+
+    def __init__(self, load, probe=None, visible=None, parent=None):
+        super().__init__(parent)
+        self.load = load
+        self.probe = probe
+        self._visible = visible or (lambda: [])
+        self._pool = QtCore.QThreadPool()
+        self._pool.setMaxThreadCount(max(1, QtCore.QThread.idealThreadCount()))
+        self._started = False
+        self._dispatch_queued = False
+        # Pending paths in request order; _order may hold paths that were
+        # since dropped, which are skipped when reached.
+        self._pending: set[str] = set()
+        self._order: list[str] = []
+        # Paths not probed yet, in request order.
+        self._unprobed: dict[str, None] = {}
+        # Running and probing paths, mapped to True once their result is
+        # to be dropped.
+        self._running: dict[str, bool] = {}
+        self._probing: dict[str, bool] = {}
+        self._probe_jobs = 0
+        self._batch_start: float | None = None
+        self._loaded = 0
+        self._cancelled = 0
+        self._jobDone.connect(self._job_done)
+        self._probeDone.connect(self._probe_done)
+
+    def start(self) -> None:
+        self._started = True
+        self._queue_dispatch()
+
+    def request(self, path: str) -> None:
+        for in_flight in (self._running, self._probing):
+            if path in in_flight:
+                in_flight[path] = False
+                return
+        if path in self._pending or path in self._unprobed:
+            return
+        if self.probe is not None:
+            self._unprobed[path] = None
+        else:
+            self._pending.add(path)
+            self._order.append(path)
+        self._queue_dispatch()
+
+    def retain(self, paths) -> None:
+        """Drop the requests for every path not in paths."""
+        paths = set(paths)
+        dropped = self._pending - paths
+        if dropped:
+            self._cancelled += len(dropped)
+            self._pending -= dropped
+            self._order = [path for path in self._order if path in self._pending]
+        unprobed = {path: None for path in self._unprobed if path in paths}
+        self._cancelled += len(self._unprobed) - len(unprobed)
+        self._unprobed = unprobed
+        for in_flight in (self._running, self._probing):
+            for path in in_flight:
+                if path not in paths:
+                    in_flight[path] = True
+        self._check_drained()
+
+    def clear(self) -> None:
+        """Drop every request."""
+        self.retain(())
+
+    def stats(self) -> dict:
+        """Return the queue depth and the throughput of the current batch.
+
+        A batch runs from the first request after the queue was empty to
+        the moment it is empty again. May be called at any time; drained
+        carries the figures of a batch as it ends.
+        """
+        elapsed = time.monotonic() - self._batch_start if self._batch_start else 0.0
+        return {
+            "pending": len(self._pending) + len(self._unprobed),
+            "running": len(self._running) + len(self._probing),
+            "loaded": self._loaded,
+            "cancelled": self._cancelled,
+            "elapsed": elapsed,
+            "per_second": self._loaded / elapsed if elapsed else 0.0,
+        }
+
+    def _queue_dispatch(self) -> None:
+        # Requests arrive while the view paints; dispatching once control
+        # returns to the event loop lets a whole paint's requests compete.
+        if (
+            self._started
+            and (self._pending or self._unprobed)
+            and not self._dispatch_queued
+        ):
+            self._dispatch_queued = True
+            QtCore.QTimer.singleShot(0, self._dispatch)
+
+    def _dispatch(self) -> None:
+        self._dispatch_queued = False
+        free = self._pool.maxThreadCount() - len(self._running) - self._probe_jobs
+        if free <= 0 or not (self._pending or self._unprobed):
+            return
+        if self._batch_start is None:
+            self._batch_start = time.monotonic()
+            self._loaded = self._cancelled = 0
+        if self._unprobed:
+            paths = list(self._unprobed)
+            self._unprobed = {}
+            self._probing.update(dict.fromkeys(paths, False))
+            self._probe_jobs += 1
+            self._pool.start(_ProbeJob(self, paths))
+            free -= 1
+        visible = [path for path in self._visible() if path in self._pending]
+        while free > 0:
+            path = self._take(visible)
+            if path is None:
+                break
+            self._running[path] = False
+            self._pool.start(_ThumbnailJob(self, path))
+            free -= 1
+
+    def _take(self, visible: list[str]) -> str | None:
+        """Remove and return the most urgent pending path."""
+        for path in visible:
+            if path in self._pending:
+                self._pending.discard(path)
+                return path
+        while self._order:
+            path = self._order.pop()
+            if path in self._pending:
+                self._pending.discard(path)
+                return path
+        return None
+
+    def _probe_done(self, paths: list[str], hits: dict) -> None:
+        self._probe_jobs -= 1
+        for path in paths:
+            if self._probing.pop(path, True):
+                self._cancelled += 1
+            elif path in hits:
+                self._loaded += 1
+                self.loaded.emit(path, QtGui.QPixmap.fromImage(hits[path]))
+            else:
+                self._pending.add(path)
+                self._order.append(path)
+        self._dispatch()
+        self._check_drained()
+
+    def _job_done(self, path: str, image) -> None:
+        cancelled = self._running.pop(path, True)
+        if cancelled:
+            self._cancelled += 1
+        else:
+            self._loaded += 1
+            if image is not None:
+                self.loaded.emit(path, QtGui.QPixmap.fromImage(image))
+        self._dispatch()
+        self._check_drained()
+
+    def _check_drained(self) -> None:
+        busy = self._pending or self._unprobed or self._running or self._probing
+        if self._batch_start is not None and not busy:
+            self._order = []
+            self.drained.emit(self.stats())
+            self._batch_start = None
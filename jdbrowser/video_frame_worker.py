@@ -0,0 +1,235 @@
+"""Video frame grabs in helper processes.
+
+Grabbing a frame means running a QMediaPlayer until its first frame
+arrives, which can hang or crash inside the media backend and writes
+ffmpeg's chatter straight to fds 1 and 2. Each grab therefore runs in a
+helper process started with ``python -m jdbrowser.video_frame_worker``.
+A helper reads one JSON-encoded path per line on stdin and answers on
+stdout with the byte length of a PNG, a newline and the PNG itself; a
+length of 0 means no frame. The backend's output is kept in a temporary
+file and only printed when a grab fails.
+
+VideoFramePool hands grabs from any thread to idle helpers, starting
+them as needed. A helper that crashes or misses the deadline of a grab is
+killed and replaced on the next grab, so one bad file costs that file's
+thumbnail and nothing else.
+"""
+
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import tempfile
+import time
+
+from PySide6 import QtCore, QtGui, QtMultimedia
+
+# Frames are shrunk to cover this size before they are sent, which is
+# as large as any thumbnail or icon made from them.
+FRAME_WIDTH = 480
+FRAME_HEIGHT = 300
+
+# How long a helper waits for the first frame of a file.
+FRAME_WAIT_MS = 1000
+
+# How long the pool waits for a helper's answer, including its start-up.
+GRAB_TIMEOUT = 10.0
+
+_pool = None
+
+
+class _Helper:
+    """One helper process, used by one thread at a time."""
+
+    def __init__(self):
+        self.process = None
+        self._buffer = bytearray()
+
+    def _start(self):
+        env = dict(os.environ)
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [package_root, env.get("PYTHONPATH")])
+        )
+        # Helpers never show a window.
+        env["QT_QPA_PLATFORM"] = "offscreen"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "jdbrowser.video_frame_worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            bufsize=0,
+        )
+        self._buffer = bytearray()
+
+    def _read_until(self, size, deadline):
+        """Block until the buffer holds size bytes; False on EOF or timeout."""
+        fd = self.process.stdout.fileno()
+        while len(self._buffer) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return False
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return False
+            self._buffer += chunk
+        return True
+
+    def grab(self, path, timeout):
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        deadline = time.monotonic() + timeout
+        try:
+            self.process.stdin.write(json.dumps(path).encode() + b"\n")
+            while b"\n" not in self._buffer:
+                if not self._read_until(len(self._buffer) + 1, deadline):
+                    raise TimeoutError
+            header, _, rest = bytes(self._buffer).partition(b"\n")
+            size = int(header)
+            self._buffer = bytearray(rest)
+            if not self._read_until(size, deadline):
+                raise TimeoutError
+        except (OSError, ValueError, TimeoutError):
+            print(f"Error generating thumbnail for {path}: frame helper did not answer")
+            self.stop()
+            return None
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data or None
+
+    def kill(self):
+        """Kill the process; a grab waiting on it fails right away."""
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            pipe.close()
+        self.process = None
+
+
+class VideoFramePool:
+    """Grabs video frames on up to size helper processes at once."""
+
+    def __init__(self, size, timeout=GRAB_TIMEOUT):
+        self.timeout = timeout
+        self._helpers = [_Helper() for _ in range(size)]
+        self._idle = queue.LifoQueue()
+        # Last in, first out, so a few busy helpers are reused before
+        # more are started.
+        for helper in reversed(self._helpers):
+            self._idle.put(helper)
+        self._closed = False
+
+    def grab(self, path):
+        """Return PNG bytes of an early frame of path, or None.
+
+        Blocks until a helper is free and has answered; safe to call from
+        several threads.
+        """
+        helper = self._idle.get()
+        try:
+            if self._closed:
+                return None
+            return helper.grab(path, self.timeout)
+        finally:
+            self._idle.put(helper)
+
+    def close(self):
+        """Kill every helper; later grabs return None."""
+        self._closed = True
+        for helper in self._helpers:
+            helper.kill()
+
+
+def video_frame_pool():
+    """Return the application's VideoFramePool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = VideoFramePool(max(1, QtCore.QThread.idealThreadCount()))
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_pool.close)
+    return _pool
+
+
+def _grab_frame(path, log, err):
+    """Return the PNG of path's first frame, or b"" if there is none."""
+    log.seek(0)
+    log.truncate()
+    player = QtMultimedia.QMediaPlayer()
+    sink = QtMultimedia.QVideoSink()
+    player.setVideoSink(sink)
+    images = []
+
+    def handle_frame(frame):
+        if frame.isValid() and not images:
+            images.append(frame.toImage())
+            player.stop()
+
+    sink.videoFrameChanged.connect(handle_frame)
+    player.setSource(QtCore.QUrl.fromLocalFile(path))
+    player.play()
+
+    loop = QtCore.QEventLoop()
+    sink.videoFrameChanged.connect(loop.quit)
+    timer = QtCore.QTimer()
+    timer.setSingleShot(True)
+    timer.timeout.connect(loop.quit)
+    timer.start(FRAME_WAIT_MS)
+    loop.exec()
+    timer.stop()
+    player.stop()
+    if player.error() != QtMultimedia.QMediaPlayer.NoError:
+        log.seek(0)
+        msg = log.read().decode(errors="ignore")
+        if msg:
+            print(msg, file=err)
+        print(f"Error generating thumbnail for {path}: {player.errorString()}", file=err)
+        return b""
+    if not images or images[0].isNull():
+        return b""
+    image = images[0]
+    if image.width() > FRAME_WIDTH and image.height() > FRAME_HEIGHT:
+        image = image.scaled(
+            FRAME_WIDTH,
+            FRAME_HEIGHT,
+            QtCore.Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+            QtCore.Qt.TransformationMode.SmoothTransformation,
+        )
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def main():
+    # Answers go to the original stdout; fds 1 and 2 are pointed at a log
+    # file for the whole life of the helper, so the backend cannot write
+    # into the answers.
+    out = os.fdopen(os.dup(1), "wb")
+    err = os.fdopen(os.dup(2), "w", buffering=1)
+    log = tempfile.TemporaryFile()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    sys.stdout = sys.stderr = err
+
+    app = QtGui.QGuiApplication(sys.argv[:1])
+    for line in sys.stdin.buffer:
+        data = _grab_frame(json.loads(line), log, err)
+        out.write(b"%d\n" % len(data))
+        out.write(data)
+        out.flush()
+    del app
+
+
+if __name__ == "__main__":
+    main()